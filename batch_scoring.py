@@ -0,0 +1,334 @@
+# synonym-finder
+
+# This module contains functions to answer all the questions of a quiz at once.
+# The distinct target and choice words are gathered once and every
+# (target, choice) pair is scored in bulk with NumPy.
+
+# IMPORT MODULES
+import doctest
+import math
+import numpy as np
+from similarity_measures import get_cos_sim, get_euc_sim, get_norm_euc_sim
+
+
+
+# DEFINE FUNCTIONS
+def read_quiz(filename):
+    """ (str) -> list
+
+    The function takes as input the name of a quiz file where each line holds
+    a word, its synonym and the choices, separated by white spaces.
+    It returns a list of (word, answer, choices) tuples, one for each line.
+    """
+    # initialize variable
+    questions = []
+
+    # read every line/question
+    fobj = open(filename, "r", encoding="UTF-8")
+    for line in fobj:
+        words = line.split()
+        questions.append((words[0], words[1], words[2:]))
+    fobj.close()
+
+    # return the list of questions
+    return questions
+
+
+def get_local_rows(words, semantic_descriptors):
+    """ (list, dict) -> tuple
+
+    The function takes a list of distinct words and a dictionary of semantic descriptors.
+    It gives an id to every context word of their vectors and returns a tuple
+    (rows, num_contexts) where rows maps each word which has a vector to a pair
+    of NumPy arrays (context ids, counts).
+    Counts are 64-bit integers when they are all integers, so that dot products
+    and norms are computed exactly as with Python integers, as long as they do
+    not overflow: sums of squares or products of counts must stay below 2 ** 63.
+
+    >>> rows, n = get_local_rows(['a', 'b', 'z'], {'a': {'x': 2, 'y': 1}, 'b': {'y': 3}})
+    >>> n
+    2
+    >>> sorted(rows)
+    ['a', 'b']
+    >>> rows['b'][0].tolist(), rows['b'][1].tolist()
+    ([1], [3])
+    >>> rows, n = get_local_rows(['a', 'b'], {'a': {'x': 2}, 'b': {}})
+    >>> rows['a'][1].dtype, rows['b'][1].dtype
+    (dtype('int64'), dtype('int64'))
+    """
+    # initialize variables
+    context_ids = {}
+    rows = {}
+    use_integers = True
+
+    # give an id to every context word and turn every vector into arrays
+    get_id = lambda context_word: context_ids.setdefault(context_word, len(context_ids))
+    for word in words:
+        try:
+            vector = semantic_descriptors[word]
+        except KeyError:
+            continue
+        ids = np.fromiter(map(get_id, vector), dtype=np.int64, count=len(vector))
+        counts = np.array(list(vector.values()))
+        if len(counts) > 0 and counts.dtype.kind != 'i':
+            use_integers = False
+        rows[word] = (ids, counts)
+
+    # use the same type of counts for every vector
+    dtype = np.int64 if use_integers else np.float64
+    for word, (ids, counts) in rows.items():
+        rows[word] = (ids, counts.astype(dtype, copy=False))
+
+    # return the rows and the number of context words
+    return rows, len(context_ids)
+
+
+def get_sequential_sum(values):
+    """ (ndarray) -> number
+
+    The function returns the sum of the values added one after the other,
+    as a Python loop adds them. NumPy sums floats pairwise, which can round
+    differently, but its running sums are computed in order.
+
+    >>> get_sequential_sum(np.array([0.1, 0.2, 0.3])) == 0.1 + 0.2 + 0.3
+    True
+    >>> get_sequential_sum(np.array([], dtype=np.int64))
+    0
+    """
+    if len(values) == 0:
+        return 0
+    return np.add.accumulate(values)[-1].item()
+
+
+def get_squares(values):
+    """ (ndarray) -> ndarray
+
+    The function returns the squares of the values, computed with ** as the
+    pure Python functions compute them. For floats, ** calls the C pow function,
+    which does not always round as multiplying a value by itself does, so
+    float values are squared one by one.
+
+    >>> get_squares(np.array([3, -4])).tolist(), get_squares(np.array([0.5])).tolist()
+    ([9, 16], [0.25])
+    """
+    if values.dtype.kind == 'f':
+        return np.array([value ** 2 for value in values.tolist()], dtype=values.dtype)
+    return values * values
+
+
+def get_normalized_counts(counts):
+    """ (ndarray) -> ndarray
+
+    The function returns the counts divided by their norm, as normalize_vector
+    divides the values of a vector, or the counts themselves if their norm is 0.
+
+    >>> get_normalized_counts(np.array([3, 4])).tolist(), get_normalized_counts(np.array([0])).tolist()
+    ([0.6, 0.8], [0])
+    """
+    norm = math.sqrt(get_sequential_sum(get_squares(counts)))
+    if norm == 0:
+        return counts
+    return counts / norm
+
+
+def score_target(target_row, choice_rows, num_contexts, similarity_fn):
+    """ (tuple, list, int, function) -> list
+
+    The function takes the row of a target word, the rows of its choices,
+    the number of context ids and one of get_cos_sim, get_euc_sim and get_norm_euc_sim.
+    It returns the similarity between the target and each choice, scoring
+    each choice with a few NumPy operations. The similarity is float('-inf')
+    when it cannot be computed, as in most_sim_word.
+    The products and squares are added in the order the pure Python functions
+    add them, the entries of the target first, so floats are rounded the same way.
+    """
+    target_ids, target_counts = target_row
+
+    # normalize the vectors for the normalized euclidean similarity
+    if similarity_fn is get_norm_euc_sim:
+        target_counts = get_normalized_counts(target_counts)
+        choice_rows = [(choice_ids, get_normalized_counts(choice_counts)) for choice_ids, choice_counts in choice_rows]
+
+    # spread the target vector over all the context ids, and prepare room for each choice
+    dtype = np.result_type(target_counts, *[choice_counts for choice_ids, choice_counts in choice_rows])
+    in_target = np.zeros(num_contexts, dtype=bool)
+    in_target[target_ids] = True
+    dense_choice = np.zeros(num_contexts, dtype=dtype)
+    in_choice = np.zeros(num_contexts, dtype=bool)
+    target_norm = math.sqrt(get_sequential_sum(get_squares(target_counts)))
+
+    # score every choice
+    scores = []
+    for choice_ids, choice_counts in choice_rows:
+        dense_choice[choice_ids] = choice_counts
+        in_choice[choice_ids] = True
+
+        # in case of the cosine similarity, divide the dot product by the norms
+        if similarity_fn is get_cos_sim:
+            shared = in_choice[target_ids]
+            dot_product = get_sequential_sum(target_counts[shared] * dense_choice[target_ids[shared]])
+            choice_norm = math.sqrt(get_sequential_sum(get_squares(choice_counts)))
+            if target_norm * choice_norm == 0:
+                scores.append(float('-inf'))
+            else:
+                scores.append(dot_product / (target_norm * choice_norm))
+
+        # otherwise, add the squared differences over the entries of the target,
+        # then the squares of the entries found only in the choice, as sub_vectors orders them
+        else:
+            differences = target_counts - dense_choice[target_ids]
+            choice_only = choice_counts[~in_target[choice_ids]]
+            squares = np.concatenate((get_squares(differences), get_squares(choice_only)))
+            scores.append(-math.sqrt(get_sequential_sum(squares)))
+
+        # clear the room of the choice for the next one
+        dense_choice[choice_ids] = 0
+        in_choice[choice_ids] = False
+
+    # return the similarities
+    return scores
+
+
+def score_questions(questions, semantic_descriptors, similarity_fn):
+    """ (list, dict, function) -> tuple
+
+    The function takes a list of (word, choices) pairs, a dictionary of semantic
+    descriptors (or a SemanticSpace) and a similarity function.
+    It returns a tuple (answers, scores) where answers holds the choice
+    most_sim_word would return for each question and scores is a NumPy matrix
+    whose row i holds the similarity of each choice of question i.
+    Rows are padded with NaN when questions have fewer choices than others.
+
+    get_cos_sim, get_euc_sim and get_norm_euc_sim are scored in bulk with NumPy,
+    giving exactly the similarities of the pure Python functions on dictionaries,
+    for integer and float counts alike, so ties and near-ties are broken the
+    same way. Other similarity functions are called pair by pair.
+
+    >>> c = {'furry' : 3, 'grumpy' : 5, 'nimble' : 4}
+    >>> f = {'furry' : 2, 'nimble' : 5}
+    >>> d = {'furry' : 3, 'bark' : 5, 'loyal' : 8}
+    >>> h = {'race' : 4, 'queen' : 2}
+    >>> sem_descs = {'cat' : c, 'feline' : f, 'dog' : d, 'horse' : h, 'nothing' : {}}
+    >>> questions = [('feline', ['dog', 'cat', 'horse']), ('feline', ['unknown', 'nothing']), \
+    ('horse', ['horse', 'cat'])]
+    >>> answers, scores = score_questions(questions, sem_descs, get_cos_sim)
+    >>> answers
+    ['cat', '', 'horse']
+    >>> scores.shape
+    (3, 3)
+    >>> scores[1].tolist()
+    [-inf, -inf, nan]
+    >>> scores[0, 1].item() == get_cos_sim(f, c)
+    True
+    >>> answers, scores = score_questions(questions, sem_descs, get_euc_sim)
+    >>> answers
+    ['cat', 'nothing', 'horse']
+    >>> scores[0].tolist() == [get_euc_sim(f, v) for v in (d, c, h)]
+    True
+    >>> answers, scores = score_questions(questions, sem_descs, get_norm_euc_sim)
+    >>> answers
+    ['cat', 'nothing', 'horse']
+    >>> scores[0].tolist() == [get_norm_euc_sim(f, v) for v in (d, c, h)]
+    True
+
+    >>> import random
+    >>> random.seed(3)
+    >>> words = ['w%d' % index for index in range(6)]
+    >>> sem_descs = {word: {'c%d' % random.randrange(40): random.random() / 7 for index in range(25)} for word in words}
+    >>> questions = [(word, words) for word in words]
+    >>> all(score_questions(questions, sem_descs, fn)[1].tolist() == \
+    [[fn(sem_descs[word], sem_descs[choice]) for choice in words] for word in words] \
+    for fn in (get_cos_sim, get_euc_sim, get_norm_euc_sim))
+    True
+
+    >>> a = {'d': 1, 'e': 1}
+    >>> b = {'d': 1, 'f': 1}
+    >>> x = {'d': 1, 'e': 1, 'f' : 1}
+    >>> score_questions([('x', ['a', 'b'])], {'a': a, 'b': b, 'x': x}, get_cos_sim)[0] # tie
+    ['a']
+    """
+    # gather the distinct targets and the distinct choices of each target
+    targets = {}
+    for word, choices in questions:
+        targets.setdefault(word, {})
+        for choice in choices:
+            targets[word][choice] = None
+    distinct_words = set(targets)
+    for choices in targets.values():
+        distinct_words.update(choices)
+
+    # score every distinct (target, choice) pair
+    pair_scores = {}
+    bulk = similarity_fn in (get_cos_sim, get_euc_sim, get_norm_euc_sim)
+    if bulk:
+        rows, num_contexts = get_local_rows(sorted(distinct_words), semantic_descriptors)
+    for target, choices in targets.items():
+        # in case the pairs cannot be scored in bulk
+        if not bulk:
+            for choice in choices:
+                try:
+                    pair_scores[target, choice] = similarity_fn(semantic_descriptors[target],
+                                                                semantic_descriptors[choice])
+                except (ZeroDivisionError, KeyError):
+                    pair_scores[target, choice] = float('-inf')
+            continue
+
+        # missing words have a similarity of -inf
+        known_choices = [choice for choice in choices if choice in rows]
+        for choice in choices:
+            pair_scores[target, choice] = float('-inf')
+        if target not in rows or not known_choices:
+            continue
+
+        # score the known choices together
+        scores = score_target(rows[target], [rows[choice] for choice in known_choices],
+                              num_contexts, similarity_fn)
+        for choice, score in zip(known_choices, scores):
+            pair_scores[target, choice] = score
+
+    # fill the score matrix and pick the answers
+    width = max([len(choices) for word, choices in questions], default=0)
+    score_matrix = np.full((len(questions), width), np.nan)
+    answers = []
+    for index, (word, choices) in enumerate(questions):
+        all_sem_sim = [pair_scores[word, choice] for choice in choices]
+        score_matrix[index, :len(choices)] = all_sem_sim
+
+        # pick the first choice with the largest similarity, as in most_sim_word
+        max_sem_sim = max(all_sem_sim)
+        if max_sem_sim == float('-inf'):
+            answers.append("")
+        else:
+            answers.append(choices[all_sem_sim.index(max_sem_sim)])
+
+    # return the answers and the scores
+    return answers, score_matrix
+
+
+def run_sim_test_batch(filename, semantic_descriptors, similarity_fn):
+    """ (str, dict, function) -> tuple
+
+    The function answers all the questions of the quiz file at once with score_questions.
+    It returns a tuple (percentage, answers, scores) where percentage is the
+    same percentage of correct answers as run_sim_test gives.
+    """
+    # read and answer all the questions
+    questions = read_quiz(filename)
+    answers, scores = score_questions([(word, choices) for word, answer, choices in questions],
+                                      semantic_descriptors, similarity_fn)
+
+    # compute the percentage of correct answers
+    correct_answers = 0
+    for (word, answer, choices), guess in zip(questions, answers):
+        if guess == answer:
+            correct_answers += 1
+    percentage = (correct_answers / len(questions)) * 100
+
+    # return the percentage, the answers and the scores
+    return percentage, answers, scores
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
@@ -0,0 +1,720 @@
+# synonym-finder
+
+# This module contains functions to measure how long the different
+# stages of the program take on a given corpus.
+
+# IMPORT MODULES
+import argparse
+import gc
+import json
+import os
+import pickle
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from file_processing import *
+from semantic_space import SemanticSpace, get_descriptors_memory_size
+from descriptor_file import save_descriptor_file, open_descriptor_file
+from nearest_neighbours import ContextIndex, top_k_similar_brute_force
+from lsh_index import CosineLSHIndex, measure_recall
+from dense_embeddings import project_descriptors, run_sim_test_dense
+from synonyms_solver import most_sim_word, run_sim_test
+from batch_scoring import read_quiz, run_sim_test_batch
+from cooccurrence_sketch import build_sketch_from_files
+from synthetic_corpus import LENGTH_DISTRIBUTIONS, SyntheticLanguage, generate_corpus, generate_quiz
+
+
+
+# DEFINE FUNCTIONS
+def time_function(function, *args):
+    """ (function, ...) -> tuple
+
+    The function calls function with the given arguments.
+    It returns a tuple containing the value returned by the call
+    and the number of seconds the call took.
+    The garbage collector is turned off during the call.
+
+    >>> result, seconds = time_function(sorted, [3, 1, 2])
+    >>> result
+    [1, 2, 3]
+    >>> seconds >= 0
+    True
+    """
+    # time the call with the garbage collector turned off, like timeit does
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # return the result and the elapsed time
+    return result, seconds
+
+
+def read_word_breakdowns(files):
+    """ (list) -> list
+
+    The function takes a list of file names as input.
+    It returns a list containing the word breakdown of each file.
+    """
+    # initialize variable
+    breakdowns = []
+
+    # separate the text of each file into words
+    for filename in files:
+        fobj = open(filename, "r", encoding="utf-8")
+        breakdowns.append(get_word_breakdown(fobj.read()))
+        fobj.close()
+
+    # return the word breakdowns
+    return breakdowns
+
+
+def benchmark_descriptor_builders(files):
+    """ (list) -> dict
+
+    The function takes a list of file names as input.
+    It times get_all_semantic_descriptors and get_all_semantic_descriptors_fast
+    on the words of each file, checks that both produce the same semantic
+    descriptors and returns a dictionary with the total time taken by each
+    builder and the speedup of the fast builder.
+    """
+    # tokenize the files once so only the builders are timed
+    breakdowns = read_word_breakdowns(files)
+
+    # initialize the total time taken by each builder
+    reference_seconds = 0
+    fast_seconds = 0
+
+    # time both builders on each file
+    for file_words in breakdowns:
+        reference, seconds = time_function(get_all_semantic_descriptors, file_words)
+        reference_seconds += seconds
+        fast, seconds = time_function(get_all_semantic_descriptors_fast, file_words)
+        fast_seconds += seconds
+
+        # make sure the fast builder gives the same result
+        if fast != reference:
+            raise AssertionError("the builders produced different semantic descriptors")
+
+    # return the results
+    return {'reference': reference_seconds, 'fast': fast_seconds,
+            'speedup': reference_seconds / fast_seconds}
+
+
+def read_texts(files):
+    """ (list) -> list
+
+    The function takes a list of file names as input.
+    It returns a list containing the content of each file.
+    """
+    texts = []
+    for filename in files:
+        fobj = open(filename, "r", encoding="utf-8")
+        texts.append(fobj.read())
+        fobj.close()
+    return texts
+
+
+def benchmark_tokenizers(files):
+    """ (list) -> dict
+
+    The function takes a list of file names as input.
+    It times get_word_breakdown and get_word_breakdown_fast on each file,
+    checks that both give the same words and returns a dictionary with the
+    number of tokens per second of each tokenizer and the speedup.
+    """
+    # initialize variables
+    tokens = 0
+    reference_seconds = 0
+    fast_seconds = 0
+
+    # time both tokenizers on each file
+    for text in read_texts(files):
+        reference, seconds = time_function(get_word_breakdown, text)
+        reference_seconds += seconds
+        fast, seconds = time_function(get_word_breakdown_fast, text)
+        fast_seconds += seconds
+
+        # make sure the fast tokenizer gives the same words
+        if fast != reference:
+            raise AssertionError("the tokenizers produced different words")
+        tokens += sum(len(sentence) for sentence in reference)
+
+    # return the results
+    return {'tokens': tokens, 'reference_tokens_per_second': tokens / reference_seconds,
+            'fast_tokens_per_second': tokens / fast_seconds,
+            'speedup': reference_seconds / fast_seconds}
+
+
+def benchmark_descriptor_memory(files):
+    """ (list) -> dict
+
+    The function takes a list of file names as input.
+    It builds the semantic descriptors of the files and returns a dictionary
+    with the estimated number of bytes used by the dictionary of descriptors,
+    by the equivalent SemanticSpace, and the ratio between the two.
+    """
+    # build the descriptors and the space
+    descriptors = build_semantic_descriptors_from_files(files)
+    space = SemanticSpace.from_descriptors(descriptors)
+
+    # measure both
+    dict_bytes = get_descriptors_memory_size(descriptors)
+    space_bytes = space.get_memory_size()
+
+    # return the results
+    return {'entries': len(space.indices), 'dict_bytes': dict_bytes,
+            'space_bytes': space_bytes, 'reduction': dict_bytes / space_bytes}
+
+
+def load_pickle(filename):
+    """ (str) -> object
+
+    The function returns the object stored in the given pickle file.
+    """
+    fobj = open(filename, "rb")
+    try:
+        return pickle.load(fobj)
+    finally:
+        fobj.close()
+
+
+def benchmark_descriptor_loading(files, word):
+    """ (list, str) -> dict
+
+    The function takes a list of file names and a word as input.
+    It saves the semantic descriptors of the files as a pickle and as a
+    binary descriptor file, then returns a dictionary with the number of
+    seconds needed to load each of them and read the vector of word.
+    """
+    # save the descriptors in both formats
+    descriptors = build_semantic_descriptors_from_files(files)
+    directory = tempfile.mkdtemp()
+    pickle_name = os.path.join(directory, "descriptors.pickle")
+    binary_name = os.path.join(directory, "descriptors.bin")
+    fobj = open(pickle_name, "wb")
+    pickle.dump(descriptors, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+    fobj.close()
+    save_descriptor_file(descriptors, binary_name)
+    del descriptors
+
+    # time loading each format and reading one vector
+    loaded, pickle_seconds = time_function(load_pickle, pickle_name)
+    vector, seconds = time_function(dict, loaded[word])
+    pickle_seconds += seconds
+    del loaded
+    space, mmap_seconds = time_function(open_descriptor_file, binary_name)
+    vector, seconds = time_function(dict, space[word])
+    mmap_seconds += seconds
+    space.close()
+
+    # remove the files and return the results
+    os.remove(pickle_name)
+    os.remove(binary_name)
+    os.rmdir(directory)
+    return {'pickle': pickle_seconds, 'mmap': mmap_seconds, 'speedup': pickle_seconds / mmap_seconds}
+
+
+def benchmark_top_k(files, words, k):
+    """ (list, list, int) -> dict
+
+    The function takes a list of file names, a list of words and a number k.
+    It returns a dictionary with the average number of seconds needed to find
+    the k words most similar to each word with get_cos_sim, by brute force
+    and with a ContextIndex, and the time needed to build the index.
+    """
+    # build the descriptors and the index
+    descriptors = build_semantic_descriptors_from_files(files)
+    index, index_seconds = time_function(ContextIndex, descriptors)
+
+    # time both searches on each word
+    brute_force_seconds = 0
+    indexed_seconds = 0
+    for word in words:
+        expected, seconds = time_function(top_k_similar_brute_force, word, k, descriptors, get_cos_sim)
+        brute_force_seconds += seconds
+        found, seconds = time_function(index.top_k_similar, word, k, get_cos_sim)
+        indexed_seconds += seconds
+
+        # make sure the index finds the same words
+        if [pair[0] for pair in found] != [pair[0] for pair in expected]:
+            raise AssertionError("the index found different words for %r" % (word,))
+
+    # return the results
+    return {'build_index': index_seconds, 'brute_force': brute_force_seconds / len(words),
+            'indexed': indexed_seconds / len(words), 'speedup': brute_force_seconds / indexed_seconds}
+
+
+def benchmark_lsh(files, words, k, settings):
+    """ (list, list, int, list) -> dict
+
+    The function takes a list of file names, a list of words, a number k and a
+    list of (bits, tables) pairs. For each pair, it builds a CosineLSHIndex and
+    returns its recall@k against the exact search of a ContextIndex, its average
+    number of candidates and its average number of seconds per query.
+    """
+    # build the descriptors and the exact index
+    descriptors = build_semantic_descriptors_from_files(files)
+    exact_index = ContextIndex(descriptors)
+    exact_fn = lambda word, k: exact_index.top_k_similar(word, k, get_cos_sim)
+
+    # measure every setting
+    results = {}
+    for bits, tables in settings:
+        index, seconds = time_function(CosineLSHIndex, descriptors, bits, tables)
+        measures = measure_recall(index, words, k, exact_fn)
+        results['%d bits x %d tables' % (bits, tables)] = \
+            "recall %.2f, %.0f candidates, %.5f s/query (exact %.5f s), built in %.2f s" % \
+            (measures['recall'], measures['candidates'], measures['approximate_seconds'],
+             measures['exact_seconds'], seconds)
+
+    # return the results
+    return results
+
+
+def benchmark_dense_embeddings(files, quiz_filename, dimensions, method='hashing'):
+    """ (list, str, list, str) -> dict
+
+    The function takes a list of file names, the name of a quiz file, a list of
+    dimensions and a projection method. It returns a dictionary with the
+    percentage of correct answers and the time taken by run_sim_test with
+    get_cos_sim on the sparse vectors, and for each dimension, by
+    run_sim_test_dense on the projected vectors, along with the time taken
+    by the projection and the fraction of answers which stay the same as
+    with the sparse vectors.
+    """
+    # answer the quiz with the sparse vectors
+    descriptors = build_semantic_descriptors_from_files(files)
+    percentage, seconds = time_function(run_sim_test, quiz_filename, descriptors, get_cos_sim)
+    results = {'sparse': "%.1f%% in %.4f s" % (percentage, seconds)}
+    expected = run_sim_test_batch(quiz_filename, descriptors, get_cos_sim)[1]
+
+    # answer it with the dense vectors of every dimension
+    for dimension in dimensions:
+        embeddings, projection_seconds = time_function(project_descriptors, descriptors, dimension, 0, method)
+        (percentage, answers), seconds = time_function(run_sim_test_dense, quiz_filename, embeddings, get_cos_sim)
+        agreement = sum(answer == other for answer, other in zip(answers, expected)) / len(expected)
+        results['%d columns' % dimension] = "%.1f%% in %.4f s (projected in %.2f s), %.0f%% same answers" % \
+            (percentage, seconds, projection_seconds, agreement * 100)
+
+    # return the results
+    return results
+
+
+def benchmark_pruning(files, quiz_filename, settings):
+    """ (list, str, list) -> dict
+
+    The function takes a list of file names, the name of a quiz file and a list
+    of dictionaries of keyword arguments for prune_semantic_descriptors.
+    It returns a dictionary with, for the unpruned descriptors and for each
+    setting, the number of entries, the estimated number of bytes used by the
+    descriptors, and the percentages of correct answers given by run_sim_test
+    with get_cos_sim, get_euc_sim and get_norm_euc_sim.
+    """
+    results = {}
+    all_fns = [get_cos_sim, get_euc_sim, get_norm_euc_sim]
+    for setting in [{}] + settings:
+        # build and measure the pruned descriptors
+        descriptors = build_semantic_descriptors_from_files(files, **setting)
+        entries = sum(len(vector) for vector in descriptors.values())
+        size = get_descriptors_memory_size(descriptors)
+        percentages = run_sim_test(quiz_filename, descriptors, all_fns)
+
+        # describe the setting and its results
+        name = ", ".join("%s=%s" % (key, value if key != 'stopwords' else len(value))
+                         for key, value in setting.items()) or "unpruned"
+        results[name] = "%d entries, %d bytes, %s%% correct (cos, euc, norm_euc)" % \
+            (entries, size, " / ".join("%.1f" % percentage for percentage in percentages))
+
+    # return the results
+    return results
+
+
+def benchmark_sketch(files, quiz_filename, budgets, heavy_hitters=200):
+    """ (list, str, list, int) -> dict
+
+    The function takes a list of file names, the name of a quiz file and a list
+    of numbers of bytes. It returns a dictionary with the memory used by the
+    exact descriptors and their percentage of correct answers with get_cos_sim,
+    and, for each budget, the memory used by a CooccurrenceSketch, its error
+    bound, the time taken to build it and the change in the percentage of
+    correct answers given by the descriptors of the quiz words it materializes.
+    """
+    # answer the quiz with the exact descriptors
+    descriptors, seconds = time_function(build_semantic_descriptors_from_files, files)
+    exact_percentage = run_sim_test(quiz_filename, descriptors, get_cos_sim)
+    results = {'exact': "%d bytes, %.1f%% correct, built in %.2f s" %
+               (get_descriptors_memory_size(descriptors), exact_percentage, seconds)}
+    del descriptors
+
+    # gather the words of the quiz
+    quiz_words = []
+    for word, answer, choices in read_quiz(quiz_filename):
+        quiz_words.extend([word] + choices)
+
+    # answer it with the sketch of every budget
+    for budget in budgets:
+        sketch, seconds = time_function(build_sketch_from_files, files, budget, 4, heavy_hitters)
+        percentage = run_sim_test(quiz_filename, sketch.get_semantic_descriptors(quiz_words), get_cos_sim)
+        error, probability = sketch.get_error_bound()
+        results['%d bytes' % budget] = \
+            "%d bytes used, error <= %.0f with p >= %.2f, %.1f%% correct (%+.1f), built in %.2f s" % \
+            (sketch.get_memory_size(), error, 1 - probability, percentage, percentage - exact_percentage, seconds)
+
+    # return the results
+    return results
+
+
+def get_sparse_descriptors_memory_size(sparse_descriptors, words):
+    """ (dict, list) -> int
+
+    The function takes as input the tuple returned by get_sparse_descriptors.
+    It returns an estimate of the number of bytes used by the dictionary,
+    its SparseVectors, their arrays and the words, as get_descriptors_memory_size does.
+
+    >>> sparse, words = get_sparse_descriptors({'a' : {'b' : 3}})
+    >>> get_sparse_descriptors_memory_size(sparse, words) > 0
+    True
+    """
+    size = sys.getsizeof(sparse_descriptors) + sys.getsizeof(words) + sum(sys.getsizeof(word) for word in words)
+    for vector in sparse_descriptors.values():
+        size += sys.getsizeof(vector) + sys.getsizeof(vector.ids) + sys.getsizeof(vector.values)
+    return size
+
+
+def benchmark_sparse_vectors(files, quiz_filename, repeat=3):
+    """ (list, str, int) -> dict
+
+    The function takes a list of file names and the name of a quiz file.
+    It returns a dictionary with the number of bytes per vector entry taken by
+    the descriptors of the files as dictionaries and as SparseVectors, and the
+    number of operations per second of each representation on the (word, choice)
+    pairs of the quiz: dot products, sums, differences and cosine similarities.
+    """
+    # build both representations
+    descriptors = build_semantic_descriptors_from_files(files)
+    sparse_descriptors, words = get_sparse_descriptors(descriptors)
+    entries = sum(map(len, descriptors.values()))
+    results = {'entries': entries,
+               'dict bytes per entry': get_descriptors_memory_size(descriptors) / entries,
+               'sparse bytes per entry': get_sparse_descriptors_memory_size(sparse_descriptors, words) / entries}
+
+    # gather the pairs of the quiz in both representations
+    pairs = [(word, choice) for word, answer, choices in read_quiz(quiz_filename) for choice in choices
+             if word in descriptors and choice in descriptors]
+    representations = {'dict': [(descriptors[word], descriptors[choice]) for word, choice in pairs],
+                       'sparse': [(sparse_descriptors[word], sparse_descriptors[choice]) for word, choice in pairs]}
+
+    # time every operation on every pair, with the same functions for both representations
+    def add_copies(vector_pairs):
+        for first_vector, second_vector in vector_pairs:
+            add_vectors(copy_dict(first_vector), second_vector)
+    operations = {'get_dot_product': get_dot_product, 'sub_vectors': sub_vectors, 'get_cos_sim': get_cos_sim}
+    for name, vector_pairs in representations.items():
+        for operation_name, operation in operations.items():
+            result, seconds = time_best(lambda: [operation(first_vector, second_vector)
+                                                 for first_vector, second_vector in vector_pairs], (), repeat)
+            results['%s %s (ops/s)' % (name, operation_name)] = round(len(vector_pairs) / seconds)
+        result, seconds = time_best(add_copies, (vector_pairs,), repeat)
+        results['%s copy_dict + add_vectors (ops/s)' % name] = round(len(vector_pairs) / seconds)
+
+    # return the results
+    return results
+
+
+def benchmark_context_windows(files, quiz_filename, settings):
+    """ (list, str, list) -> dict
+
+    The function takes a list of file names, the name of a quiz file and a list
+    of dictionaries of context options of build_semantic_descriptors_from_files
+    (window, weighting, max_sentence_length). It returns a dictionary with the
+    time taken to build the descriptors with the whole sentences as contexts
+    and with each of the options, their estimated memory and their percentage
+    of correct answers on the quiz with get_cos_sim.
+    """
+    results = {}
+    for options in [{}] + settings:
+        descriptors, seconds = time_function(lambda: build_semantic_descriptors_from_files(files, **options))
+        percentage = run_sim_test(quiz_filename, descriptors, get_cos_sim)
+        name = ", ".join("%s=%s" % item for item in options.items()) or "whole sentences"
+        results[name] = "built in %.2f s, %d bytes, %.1f%% correct" % \
+                        (seconds, get_descriptors_memory_size(descriptors), percentage)
+        del descriptors
+    return results
+
+
+def benchmark_merges(files, num_parts, workers=2, chunk_bytes=1 << 18, repeat=3):
+    """ (list, int, int, int, int) -> dict
+
+    The function takes a list of file names and a number of parts.
+    It splits the sentences of the files into num_parts parts and returns a
+    dictionary with the seconds taken to merge their descriptors one after the
+    other with merge_dicts_of_vectors and at once with merge_many_dicts_of_vectors,
+    copying or consuming them, and to build the descriptors of the files in
+    workers processes with the linear and the tree reductions.
+    """
+    # build the descriptors of every part
+    sentences = [sentence for filename in files for sentence in get_file_word_breakdown(filename)]
+    parts = [get_all_semantic_descriptors_fast(sentences[len(sentences) * index // num_parts :
+                                                         len(sentences) * (index + 1) // num_parts])
+             for index in range(num_parts)]
+    copy_parts = lambda: ([{word: dict(vector) for word, vector in part.items()} for part in parts],)
+    expected = merge_many_dicts_of_vectors(parts)
+    results = {}
+
+    # merge them one after the other and at once
+    def merge_pairwise(parts, consume):
+        merged = {}
+        for part in parts:
+            merge_dicts_of_vectors(merged, part, consume)
+        return merged
+    for consume in (False, True):
+        mode = 'consume' if consume else 'copy'
+        merged, results['pairwise %s' % mode] = time_best(lambda parts: merge_pairwise(parts, consume), (), repeat,
+                                                          copy_parts)
+        if merged != expected:
+            raise AssertionError("the pairwise merge gave different descriptors")
+        merged, results['k-way %s' % mode] = time_best(lambda parts: merge_many_dicts_of_vectors(parts, consume), (),
+                                                       repeat, copy_parts)
+        if merged != expected:
+            raise AssertionError("the k-way merge gave different descriptors")
+    del merged, parts
+
+    # build the descriptors in parallel with both reductions
+    for reduction in ('linear', 'tree'):
+        build = lambda: build_semantic_descriptors_in_parallel(files, workers, None, chunk_bytes, reduction=reduction)
+        merged, results['parallel %s' % reduction] = time_best(build, (), repeat)
+        if merged != expected:
+            raise AssertionError("the %s reduction gave different descriptors" % reduction)
+
+    # return the results
+    return results
+
+
+def time_best(function, args, repeat, prepare=None):
+    """ (function, tuple, int, function) -> tuple
+
+    The function calls function with the given arguments repeat times with
+    time_function and returns a tuple containing the value returned by the
+    last call and the smallest number of seconds a call took.
+    If prepare is given, the arguments are prepare() instead, called again
+    before every call and not timed.
+
+    >>> result, seconds = time_best(sorted, ([3, 1, 2],), 3)
+    >>> result, seconds >= 0
+    ([1, 2, 3], True)
+    """
+    best_seconds = float('inf')
+    for index in range(repeat):
+        if prepare is not None:
+            args = prepare()
+        result, seconds = time_function(function, *args)
+        best_seconds = min(best_seconds, seconds)
+    return result, best_seconds
+
+
+def benchmark_stages(corpus_filename, quiz_filename, repeat=3):
+    """ (str, str, int) -> dict
+
+    The function takes the name of a corpus file and of a quiz file.
+    It returns a dictionary with the smallest number of seconds taken by each
+    stage of the program over repeat runs: splitting the corpus into sentences
+    and into words, building its semantic descriptors, merging the descriptors
+    of its two halves, computing each similarity on the (word, choice) pairs of
+    the quiz, answering its questions with most_sim_word and run_sim_test.
+    """
+    stages = {}
+    fobj = open(corpus_filename, "r", encoding="utf-8")
+    text = fobj.read().lower()
+    fobj.close()
+    questions = read_quiz(quiz_filename)
+
+    # time the tokenizer
+    sentences, stages['get_sentences'] = time_best(get_sentences, (text,), repeat)
+    file_words, stages['get_words'] = time_best(lambda: [get_words(sentence) for sentence in sentences], (),
+                                                repeat)
+
+    # time the builders
+    descriptors, stages['get_all_semantic_descriptors'] = time_best(get_all_semantic_descriptors, (file_words,),
+                                                                    repeat)
+    fast, stages['get_all_semantic_descriptors_fast'] = time_best(get_all_semantic_descriptors_fast,
+                                                                  (file_words,), repeat)
+    if fast != descriptors:
+        raise AssertionError("the builders produced different semantic descriptors")
+
+    # time the merge of the descriptors of both halves, on fresh copies every time
+    first_half = get_all_semantic_descriptors_fast(file_words[:len(file_words) // 2])
+    second_half = get_all_semantic_descriptors_fast(file_words[len(file_words) // 2:])
+    copy_halves = lambda: ({word: dict(vector) for word, vector in first_half.items()}, second_half)
+    merged, stages['merge_dicts_of_vectors'] = time_best(merge_dicts_of_vectors, (), repeat, copy_halves)
+
+    # time each similarity function on the pairs of the quiz
+    pairs = [(descriptors[word], descriptors[choice]) for word, answer, choices in questions
+             for choice in choices if word in descriptors and choice in descriptors]
+    def compute_similarities(similarity_fn):
+        for first_vector, second_vector in pairs:
+            try:
+                similarity_fn(first_vector, second_vector)
+            except ZeroDivisionError:
+                pass
+    for similarity_fn in (get_cos_sim, get_euc_sim, get_norm_euc_sim):
+        result, stages[similarity_fn.__name__] = time_best(compute_similarities, (similarity_fn,), repeat)
+
+    # time the answers to the quiz
+    answer_all = lambda: [most_sim_word(word, choices, descriptors, get_cos_sim)
+                          for word, answer, choices in questions]
+    answers, stages['most_sim_word'] = time_best(answer_all, (), repeat)
+    percentage, stages['run_sim_test'] = time_best(run_sim_test, (quiz_filename, descriptors, get_cos_sim),
+                                                   repeat)
+
+    # return the timings
+    return stages
+
+
+def run_stage_suite(sentences=20000, vocabulary=5000, zipf=1.1, length_mean=15, length_distribution='poisson',
+                    synonyms=100, repeat=3, seed=0):
+    """ (int, int, float, float, str, int, int, int) -> dict
+
+    The function generates a synthetic corpus and quiz with the given settings
+    in a temporary directory and times the stages of the program on them.
+    It returns a dictionary holding the settings, the environment and the
+    number of seconds of each stage, which can be saved as JSON.
+    """
+    settings = {'sentences': sentences, 'vocabulary': vocabulary, 'zipf': zipf, 'length_mean': length_mean,
+                'length_distribution': length_distribution, 'synonyms': synonyms, 'repeat': repeat,
+                'seed': seed}
+
+    # generate the corpus and the quiz, then time the stages on them
+    directory = tempfile.mkdtemp()
+    try:
+        corpus_filename = os.path.join(directory, 'corpus.txt')
+        quiz_filename = os.path.join(directory, 'quiz.txt')
+        language = SyntheticLanguage(vocabulary, zipf, synonyms, seed=seed)
+        generate_corpus(corpus_filename, language, sentences, length_mean, length_distribution, seed)
+        generate_quiz(quiz_filename, language, seed=seed)
+        stages = benchmark_stages(corpus_filename, quiz_filename, repeat)
+    finally:
+        shutil.rmtree(directory)
+
+    # return the results
+    return {'settings': settings,
+            'environment': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                            'machine': platform.machine()},
+            'stages': stages}
+
+
+def compare_with_baseline(results, baseline, tolerance=0.25):
+    """ (dict, dict, float) -> list
+
+    The function takes the results of run_stage_suite and of a previous run.
+    It returns a list of (stage, baseline seconds, seconds) tuples for the stages
+    which became slower by more than the fraction tolerance.
+
+    >>> baseline = {'stages': {'get_words': 1.0, 'run_sim_test': 2.0, 'removed': 1.0}}
+    >>> compare_with_baseline({'stages': {'get_words': 1.2, 'run_sim_test': 3.0, 'new': 9.0}}, baseline)
+    [('run_sim_test', 2.0, 3.0)]
+    """
+    regressions = []
+    for stage, seconds in results['stages'].items():
+        baseline_seconds = baseline['stages'].get(stage)
+        if baseline_seconds is not None and seconds > baseline_seconds * (1 + tolerance):
+            regressions.append((stage, baseline_seconds, seconds))
+    return regressions
+
+
+def print_results(title, results):
+    """ (str, dict) -> NoneType
+
+    The function prints the title followed by each key-value pair of results.
+
+    >>> print_results('builders', {'reference': 2.0, 'speedup': 4})
+    builders
+      reference: 2.0000
+      speedup: 4
+    """
+    print(title)
+    for key, value in results.items():
+        if type(value) == float:
+            print("  %s: %.4f" % (key, value))
+        else:
+            print("  %s: %s" % (key, value))
+
+
+
+# RUN BENCHMARKS
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the stages of the program.")
+    parser.add_argument("files", nargs="*", default=['war_and_peace.txt', 'swanns_way.txt'],
+                        help="corpus of the benchmarks of the optimizations")
+    parser.add_argument("--stages", action="store_true",
+                        help="time each stage on a synthetic corpus instead")
+    parser.add_argument("--sentences", type=int, default=20000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--length-mean", type=float, default=15)
+    parser.add_argument("--length-distribution", choices=LENGTH_DISTRIBUTIONS, default='poisson')
+    parser.add_argument("--synonyms", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write the stage timings into")
+    parser.add_argument("--baseline", help="JSON file of previous stage timings to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction by which a stage may be slower than the baseline")
+    args = parser.parse_args()
+
+    # time the stages on a synthetic corpus and flag the regressions
+    if args.stages:
+        results = run_stage_suite(args.sentences, args.vocabulary, args.zipf, args.length_mean,
+                                  args.length_distribution, args.synonyms, args.repeat, args.seed)
+        print_results("stages (seconds)", results['stages'])
+        if args.output is not None:
+            fobj = open(args.output, "w", encoding="utf-8")
+            json.dump(results, fobj, indent=2)
+            fobj.close()
+        if args.baseline is not None:
+            fobj = open(args.baseline, "r", encoding="utf-8")
+            baseline = json.load(fobj)
+            fobj.close()
+            regressions = compare_with_baseline(results, baseline, args.tolerance)
+            for stage, baseline_seconds, seconds in regressions:
+                print("REGRESSION %s: %.4f s -> %.4f s (%+.0f%%)" %
+                      (stage, baseline_seconds, seconds, (seconds / baseline_seconds - 1) * 100))
+            sys.exit(1 if regressions else 0)
+        sys.exit(0)
+
+    # otherwise, measure the optimizations on the given corpus
+    corpus = args.files
+    print_results("tokenizers", benchmark_tokenizers(corpus))
+    print_results("get_all_semantic_descriptors (seconds)", benchmark_descriptor_builders(corpus))
+    print_results("descriptor memory (bytes)", benchmark_descriptor_memory(corpus))
+    print_results("load descriptors and read one vector (seconds)", benchmark_descriptor_loading(corpus, 'the'))
+    print_results("top 20 similar words (seconds per query)",
+                  benchmark_top_k(corpus, ['king', 'happy', 'war', 'walk', 'beautiful'], 20))
+    print_results("approximate top 20 with random-hyperplane LSH",
+                  benchmark_lsh(corpus, ['king', 'happy', 'war', 'walk', 'beautiful'], 20,
+                                [(16, 8), (32, 8), (64, 8)]))
+    print_results("run_sim_test on dense vectors (get_cos_sim)",
+                  benchmark_dense_embeddings(corpus, 'test.txt', [64, 256, 1024, 4096]))
+    stopwords = ['the', 'and', 'to', 'of', 'a', 'he', 'in', 'his', 'that', 'was', 'with', 'her', 'it', 'had',
+                 'i', 'at', 'not', 'she', 'him', 'as', 'on', 'for', 'but', 'you', 'is', 'which', 'by']
+    print_results("pruned descriptors",
+                  benchmark_pruning(corpus, 'test.txt', [{'min_count': 20}, {'max_features': 10000},
+                                                         {'stopwords': stopwords}, {'max_contexts': 200},
+                                                         {'min_count': 20, 'max_features': 10000,
+                                                          'stopwords': stopwords, 'max_contexts': 200}]))
+    print_results("count-min sketch of the co-occurrences (get_cos_sim)",
+                  benchmark_sketch(corpus, 'test.txt', [1 << 20, 1 << 24, 1 << 28]))
+    print_results("SparseVector against dict vectors", benchmark_sparse_vectors(corpus, 'test.txt'))
+    print_results("merges of 16 partial descriptors (seconds)", benchmark_merges(corpus, 16))
+    print_results("context windows (get_cos_sim)",
+                  benchmark_context_windows(corpus, 'test.txt',
+                                            [{'window': 2}, {'window': 5}, {'window': 10},
+                                             {'window': 5, 'weighting': 'harmonic'}, {'max_sentence_length': 50},
+                                             {'window': 5, 'max_sentence_length': 50}]))
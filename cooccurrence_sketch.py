@@ -0,0 +1,337 @@
+# synonym-finder
+
+# This module contains an approximate accumulator of semantic descriptors
+# whose memory is fixed in advance. The count of every (word, context word)
+# pair is added to a count-min sketch: a few rows of counters, where each pair
+# is hashed to one counter per row and its count is estimated by the smallest
+# of its counters. Counts are never underestimated, and are overestimated by
+# at most e / width times the total count with probability 1 - exp(-depth).
+# The context words with the largest estimates are kept for every word
+# (the heavy hitters), and become its approximate semantic descriptor vector.
+# The counters and the heavy hitters share a memory budget fixed in advance:
+# counters saturate instead of wrapping around, and a pair only enters the
+# heavy hitters table when its estimate beats the smallest one of its word,
+# or of the whole table once it is full, as in the Space-Saving algorithm.
+
+# IMPORT MODULES
+import doctest
+import math
+import numpy as np
+from file_processing import *
+
+
+
+# DEFINE CONSTANTS
+# bytes taken by an entry of the heavy hitters table: its pair key and its estimated count
+HEAVY_ENTRY_BYTES = 16
+# largest count of a counter, which it keeps instead of wrapping around
+MAX_COUNTER = np.iinfo(np.uint32).max
+
+
+
+# DEFINE CLASSES
+class CooccurrenceSketch:
+    """ A count-min sketch of the counts of (word, context word) pairs,
+    with a table of the heavy_hitters context words with the largest counts
+    for every word.
+
+    The counters and the heavy hitters table take at most memory_bytes bytes,
+    heavy_fraction of them being given to the table, of HEAVY_ENTRY_BYTES bytes
+    per entry, and the rest to the counters, split into depth rows whose width
+    is rounded down to a power of two. The table keeps at most heavy_hitters
+    entries per word; once it is full, a pair only enters it by beating its
+    smallest estimate, which then leaves it.
+    With conservative update, a pair only increases the counters which would
+    otherwise underestimate it, which gives smaller errors for the same memory.
+    Counters stop at MAX_COUNTER instead of wrapping around.
+
+    >>> s = [['all', 'the', 'habits', 'of', 'man', 'are', 'evil'], \
+    ['and', 'above', 'all', 'no', 'animal', 'must', 'ever', 'tyrannise', 'over', 'his', 'own', 'kind'], \
+    ['weak', 'or', 'strong', 'clever', 'or', 'simple', 'we', 'are', 'all', 'brothers'], \
+    ['no', 'animal', 'must', 'ever', 'kill', 'any', 'other', 'animal'], \
+    ['all', 'animals', 'are', 'equal']]
+    >>> sketch = CooccurrenceSketch(1 << 16, heavy_hitters=100)
+    >>> sketch.add_sentences(s)
+    >>> sketch.get_semantic_descriptors(['animal', 'weak', 'unknown']) == \
+    {word: vector for word, vector in get_all_semantic_descriptors(s).items() if word in ['animal', 'weak']}
+    True
+    >>> sketch = CooccurrenceSketch(1 << 16, heavy_hitters=2)
+    >>> sketch.add_sentences(s)
+    >>> sketch.get_semantic_descriptors(['animal'])
+    {'animal': {'no': 3, 'must': 3}}
+    >>> sketch = CooccurrenceSketch(1 << 12, heavy_hitters=100)
+    >>> sketch.add_sentences(s)
+    >>> sketch.heavy_capacity, len(sketch.heavy_keys), sketch.get_memory_size() <= 1 << 12
+    (128, 128, True)
+    """
+
+    def __init__(self, memory_bytes, depth=4, heavy_hitters=200, conservative=True, seed=0, heavy_fraction=0.5):
+        """ (CooccurrenceSketch, int, int, int, bool, int, float) -> NoneType
+
+        The method creates an empty sketch whose counters and heavy hitters
+        take at most memory_bytes bytes, heavy_fraction of them for the heavy hitters.
+        It raises a ValueError if memory_bytes is too small for one counter per row
+        and one heavy hitter.
+        """
+        self.heavy_capacity = int(memory_bytes * heavy_fraction) // HEAVY_ENTRY_BYTES
+        width = (memory_bytes - self.heavy_capacity * HEAVY_ENTRY_BYTES) // (4 * depth)
+        if width < 1 or self.heavy_capacity < 1:
+            raise ValueError("memory_bytes must hold at least one counter per row and one heavy hitter")
+
+        # round the width down to a power of two, for multiply-shift hashing
+        self.width_bits = width.bit_length() - 1
+        self.width = 1 << self.width_bits
+        self.depth = depth
+        self.counters = np.zeros((depth, self.width), dtype=np.uint32)
+        self.heavy_hitters = heavy_hitters
+        self.conservative = conservative
+        self.total = 0
+
+        # draw one odd 64-bit multiplier per row
+        generator = np.random.default_rng(seed)
+        self.multipliers = generator.integers(0, 1 << 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+        # vocabulary, with the number of heavy hitters of each word and the smallest
+        # of their estimates once the word has all of them
+        self.word_ids = {}
+        self.words = []
+        self.word_sizes = np.zeros(0, dtype=np.int64)
+        self.word_thresholds = np.zeros(0, dtype=np.int64)
+
+        # heavy hitters as sorted (word id << 32) | (context id) keys with their
+        # estimates, and the largest estimate which left the full table
+        self.heavy_keys = np.zeros(0, dtype=np.uint64)
+        self.heavy_counts = np.zeros(0, dtype=np.int64)
+        self.heavy_floor = 0
+
+    def get_cells(self, keys):
+        """ (CooccurrenceSketch, ndarray) -> ndarray
+
+        The method returns the counter of each pair key in each row,
+        as a (depth, number of keys) array.
+        """
+        shift = np.uint64(64 - self.width_bits)
+        with np.errstate(over='ignore'):
+            products = keys[None, :] * self.multipliers[:, None]
+        if self.width_bits == 0:
+            return np.zeros(products.shape, dtype=np.int64)
+        return (products >> shift).astype(np.int64)
+
+    def estimate(self, keys):
+        """ (CooccurrenceSketch, ndarray) -> ndarray
+
+        The method returns the estimated count of each pair key.
+        """
+        cells = self.get_cells(keys)
+        return self.counters[np.arange(self.depth)[:, None], cells].min(axis=0)
+
+    def get_pair_keys(self, sentences):
+        """ (CooccurrenceSketch, list) -> tuple
+
+        The method takes a list of lists of words and returns a tuple (keys, counts)
+        of arrays holding each distinct (word, context word) pair of the sentences
+        and the number of times it is counted, as in get_all_semantic_descriptors_fast.
+        New words are added to the vocabulary.
+        """
+        # gather the distinct words of each sentence and their counts
+        ids = []
+        counts = []
+        sizes = []
+        for sentence in sentences:
+            word_counts = count_words(sentence)
+            for word, count in word_counts.items():
+                word_id = self.word_ids.get(word)
+                if word_id is None:
+                    word_id = self.word_ids[word] = len(self.words)
+                    self.words.append(word)
+                ids.append(word_id)
+                counts.append(count)
+            sizes.append(len(word_counts))
+        ids = np.array(ids, dtype=np.uint64)
+        counts = np.array(counts, dtype=np.int64)
+        sizes = np.array(sizes, dtype=np.int64)
+
+        # pair every word with every word of its sentence
+        element_sizes = np.repeat(sizes, sizes)
+        element_starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+        lefts = np.repeat(np.arange(len(ids)), element_sizes)
+        block_starts = np.cumsum(element_sizes) - element_sizes
+        rights = np.repeat(element_starts, element_sizes) + np.arange(len(lefts)) - np.repeat(block_starts, element_sizes)
+        different = lefts != rights
+        lefts = lefts[different]
+        rights = rights[different]
+
+        # add up the counts of the same pairs
+        keys = (ids[lefts] << np.uint64(32)) | ids[rights]
+        keys, inverse = np.unique(keys, return_inverse=True)
+        pair_counts = np.bincount(inverse, counts[lefts] * counts[rights], minlength=len(keys))
+        return keys, pair_counts.astype(np.int64)
+
+    def add_sentences(self, sentences):
+        """ (CooccurrenceSketch, list) -> NoneType
+
+        The method adds the counts of the pairs of words of a list of sentences
+        to the sketch and updates the heavy hitters of their words.
+        """
+        keys, counts = self.get_pair_keys(sentences)
+        if len(keys) == 0:
+            return
+        self.total += int(counts.sum())
+
+        # add the counts to the counters, saturating them
+        cells = self.get_cells(keys)
+        if self.conservative:
+            # only raise the counters below the new estimate of each pair
+            targets = np.minimum(self.estimate(keys).astype(np.int64) + counts, MAX_COUNTER).astype(np.uint32)
+            for row in range(self.depth):
+                np.maximum.at(self.counters[row], cells[row], targets)
+        else:
+            for row in range(self.depth):
+                sums = self.counters[row] + np.bincount(cells[row], counts, minlength=self.width)
+                self.counters[row] = np.minimum(sums, MAX_COUNTER)
+
+        # make room for the new words, then update the heavy hitters
+        missing = len(self.words) - len(self.word_sizes)
+        if missing > 0:
+            self.word_sizes = np.concatenate((self.word_sizes, np.zeros(missing, dtype=np.int64)))
+            self.word_thresholds = np.concatenate((self.word_thresholds, np.zeros(missing, dtype=np.int64)))
+        self.update_heavy_hitters(keys)
+
+    def update_heavy_hitters(self, keys):
+        """ (CooccurrenceSketch, ndarray) -> NoneType
+
+        The method takes the sorted pair keys of a batch. It refreshes the estimates
+        of those already in the heavy hitters table and inserts those beating the
+        smallest estimate of their word, if the word has all of its heavy hitters,
+        and the largest estimate which left the table, if it was ever full.
+        Only the entries of the words receiving pairs are sorted, and the
+        smallest entries leave the table when it holds more than heavy_capacity.
+        """
+        estimates = self.estimate(keys).astype(np.int64)
+        word_ids = (keys >> np.uint64(32)).astype(np.int64)
+
+        # refresh the estimates of the pairs already in the table
+        positions = np.searchsorted(self.heavy_keys, keys)
+        found = positions < len(self.heavy_keys)
+        found[found] = self.heavy_keys[positions[found]] == keys[found]
+        self.heavy_counts[positions[found]] = estimates[found]
+
+        # in case no other pair beats the thresholds
+        admitted = ~found & (estimates > self.heavy_floor) & \
+            ((self.word_sizes[word_ids] < self.heavy_hitters) | (estimates > self.word_thresholds[word_ids]))
+        if not admitted.any():
+            return
+
+        # insert the admitted pairs, keeping the keys sorted
+        self.heavy_keys = np.insert(self.heavy_keys, positions[admitted], keys[admitted])
+        self.heavy_counts = np.insert(self.heavy_counts, positions[admitted], estimates[admitted])
+
+        # sort the entries of the words receiving pairs by decreasing estimate
+        affected = np.unique(word_ids[admitted])
+        heavy_word_ids = (self.heavy_keys >> np.uint64(32)).astype(np.int64)
+        starts = np.searchsorted(heavy_word_ids, affected, side='left')
+        sizes = np.searchsorted(heavy_word_ids, affected, side='right') - starts
+        offsets = np.cumsum(sizes) - sizes
+        indices = np.repeat(starts - offsets, sizes) + np.arange(sizes.sum())
+        owners = np.repeat(np.arange(len(affected)), sizes)
+        indices = indices[np.lexsort((-self.heavy_counts[indices], owners))]
+        ranks = np.arange(len(indices)) - np.repeat(offsets, sizes)
+
+        # keep the heavy_hitters largest entries of those words and record their thresholds
+        kept_sizes = np.minimum(sizes, self.heavy_hitters)
+        self.word_sizes[affected] = kept_sizes
+        self.word_thresholds[affected] = np.where(sizes >= self.heavy_hitters,
+                                                  self.heavy_counts[indices[offsets + kept_sizes - 1]], 0)
+        keep = np.ones(len(self.heavy_keys), dtype=bool)
+        keep[indices[ranks >= self.heavy_hitters]] = False
+
+        # in case the table is over its capacity, drop its smallest entries
+        excess = int(keep.sum()) - self.heavy_capacity
+        if excess > 0:
+            kept = np.flatnonzero(keep)
+            dropped = kept[np.argpartition(self.heavy_counts[kept], excess - 1)[:excess]]
+            keep[dropped] = False
+            self.heavy_floor = max(self.heavy_floor, int(self.heavy_counts[dropped].max()))
+            dropped_word_ids = heavy_word_ids[dropped]
+            np.subtract.at(self.word_sizes, dropped_word_ids, 1)
+            self.word_thresholds[dropped_word_ids] = 0
+
+        self.heavy_keys = self.heavy_keys[keep]
+        self.heavy_counts = self.heavy_counts[keep]
+
+    def get_semantic_descriptors(self, words):
+        """ (CooccurrenceSketch, list) -> dict
+
+        The method returns a dictionary mapping each word of words which was seen
+        to its approximate semantic descriptor vector: its heavy hitters
+        with their estimated counts, the largest first.
+        """
+        semantic_descriptors = {}
+        word_ids = (self.heavy_keys >> np.uint64(32)).astype(np.int64)
+        for word in words:
+            word_id = self.word_ids.get(word)
+            if word_id is None:
+                continue
+
+            # find the heavy hitters of the word and estimate their counts
+            start, end = np.searchsorted(word_ids, [word_id, word_id + 1])
+            keys = self.heavy_keys[start:end]
+            estimates = self.estimate(keys).tolist()
+            context_ids = (keys & np.uint64(0xFFFFFFFF)).tolist()
+            vector = sorted(zip(context_ids, estimates), key=lambda pair: -pair[1])
+            semantic_descriptors[word] = {self.words[context_id]: count for context_id, count in vector}
+
+        return semantic_descriptors
+
+    def get_error_bound(self):
+        """ (CooccurrenceSketch) -> tuple
+
+        The method returns a tuple (error, probability): each estimated count
+        exceeds the true count by more than error with at most that probability.
+        Estimates are never smaller than the true counts.
+
+        >>> sketch = CooccurrenceSketch(1 << 13, depth=4)
+        >>> sketch.add_sentences([['a', 'b', 'c']])
+        >>> error, probability = sketch.get_error_bound()
+        >>> sketch.total, round(error, 4), round(probability, 4)
+        (6, 0.0637, 0.0183)
+        """
+        return math.e / self.width * self.total, math.exp(-self.depth)
+
+    def get_memory_size(self):
+        """ (CooccurrenceSketch) -> int
+
+        The method returns the number of bytes used by the counters
+        and the heavy hitters table, without the vocabulary.
+        It is at most the memory_bytes given to the sketch.
+        """
+        return self.counters.nbytes + self.heavy_keys.nbytes + self.heavy_counts.nbytes
+
+
+
+# DEFINE FUNCTIONS
+def build_sketch_from_files(files, memory_bytes, depth=4, heavy_hitters=200, conservative=True,
+                            batch_sentences=2000):
+    """ (list, int, int, int, bool, int) -> CooccurrenceSketch
+
+    The function takes a list of file names and a number of bytes.
+    It streams the sentences of the files into a CooccurrenceSketch whose
+    counters take memory_bytes bytes, batch_sentences sentences at a time, so that
+    memory depends on the sketch and the vocabulary but not on the files.
+    """
+    sketch = CooccurrenceSketch(memory_bytes, depth, heavy_hitters, conservative)
+    batch = []
+    for filename in files:
+        for sentence in get_file_word_breakdown(filename):
+            batch.append(sentence)
+            if len(batch) == batch_sentences:
+                sketch.add_sentences(batch)
+                batch = []
+    sketch.add_sentences(batch)
+    return sketch
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
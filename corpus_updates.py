@@ -0,0 +1,469 @@
+# synonym-finder
+
+# This module contains functions to update a dictionary of semantic descriptors
+# when files are added to or removed from the corpus. Semantic descriptors are
+# sums over the files, so only the descriptors of the changed files are
+# added or substracted, instead of building the descriptors of the whole corpus again.
+# The manifest of the added files can be saved as JSON next to the descriptor
+# cache, so that the next run only reads the files which changed. It also
+# records the options the descriptors were built with, so that the files
+# added later are built the same way.
+
+# IMPORT MODULES
+import doctest
+import json
+import os
+import tempfile
+from file_processing import *
+
+
+
+# DEFINE CONSTANTS
+# name of the manifest file saved in the directory of a DescriptorCache
+MANIFEST_FILENAME = "manifest.json"
+
+
+
+# DEFINE CLASSES
+class CorpusManifest:
+    """ A record of the files whose semantic descriptors were added to a dictionary.
+
+    For every file, it holds the cache key of the content the descriptors were
+    built from, with the size and modification time of the file at that moment
+    (files). For every word, it holds the number of added files containing it
+    (word_files), so that words are only deleted once no file contains them.
+    It also holds the options every file is built with (options): the context
+    options window, weighting and max_sentence_length of
+    get_text_semantic_descriptors, and the stopwords removed from the
+    descriptors of each file, as build_semantic_descriptors_from_files
+    removes them. The other pruning options of build_semantic_descriptors_from_files
+    depend on the whole corpus, so they cannot be kept up to date file by file:
+    prune a copy of the descriptors once they are updated instead.
+
+    >>> manifest = CorpusManifest(window=2, stopwords=['the'])
+    >>> manifest.files['a.txt'] = ('0123', 10, 1000)
+    >>> manifest.word_files['cat'] = 1
+    >>> filename = os.path.join(tempfile.mkdtemp(), MANIFEST_FILENAME)
+    >>> manifest.save(filename)
+    >>> loaded = load_manifest(filename)
+    >>> loaded.files, loaded.word_files
+    ({'a.txt': ('0123', 10, 1000)}, {'cat': 1})
+    >>> loaded.options == manifest.options, loaded.get_settings()['builder']
+    (True, 'window')
+    >>> load_manifest(filename + '.missing').files
+    {}
+    """
+
+    def __init__(self, window=None, weighting=None, max_sentence_length=None, stopwords=None):
+        """ (CorpusManifest, int, str, int, iterable) -> NoneType
+
+        The method creates an empty manifest of files to be built with the given options.
+        It raises a ValueError if a weighting is given without a window.
+        """
+        get_descriptor_settings(window, weighting, max_sentence_length)
+        self.files = {}
+        self.word_files = {}
+        self.options = {'window': window, 'weighting': weighting, 'max_sentence_length': max_sentence_length,
+                        'stopwords': sorted(set(stopwords)) if stopwords is not None else None}
+
+    def get_settings(self):
+        """ (CorpusManifest) -> dict
+
+        The method returns the settings of the cache keys of the files,
+        those of get_descriptor_settings for the context options of the manifest.
+        The descriptors stored in a cache are the ones before the stopwords are
+        removed, as build_semantic_descriptors_from_files stores them, so the
+        stopwords are not part of the settings.
+        """
+        options = self.options
+        return get_descriptor_settings(options['window'], options['weighting'], options['max_sentence_length'])
+
+    def get_changes(self, files):
+        """ (CorpusManifest, list) -> tuple
+
+        The method compares the files of the manifest with a new list of files.
+        It returns a tuple (added, removed, changed, refreshed): the lists of the
+        files which are not in the manifest, of the files of the manifest which are
+        not in files and of the files whose content changed since they were added,
+        and a dictionary mapping the files whose content is the same but whose
+        size or modification time changed to their new record.
+        The content of a file is only read when its size or its modification
+        time changed. The manifest is not modified: update_files records the changes.
+
+        >>> filename = os.path.join(tempfile.mkdtemp(), 'cats.txt')
+        >>> with open(filename, 'w') as fobj:
+        ...     _ = fobj.write('Cats sleep.')
+        >>> manifest = CorpusManifest()
+        >>> manifest.files[filename] = (get_file_cache_key(filename, DESCRIPTOR_SETTINGS), 11, 0)
+        >>> added, removed, changed, refreshed = manifest.get_changes([filename])
+        >>> added, removed, changed, refreshed[filename][2] == os.stat(filename).st_mtime_ns
+        ([], [], [], True)
+        >>> manifest.files[filename][2]
+        0
+        """
+        added = [filename for filename in files if filename not in self.files]
+        removed = [filename for filename in self.files if filename not in files]
+        changed = []
+        refreshed = {}
+        settings = self.get_settings()
+        for filename in files:
+            if filename not in self.files:
+                continue
+
+            # in case the file looks the same, do not read it
+            key, size, mtime_ns = self.files[filename]
+            stat = os.stat(filename)
+            if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                continue
+            if get_file_cache_key(filename, settings) != key:
+                changed.append(filename)
+            else:
+                refreshed[filename] = (key, stat.st_size, stat.st_mtime_ns)
+        return added, removed, changed, refreshed
+
+    def save(self, filename):
+        """ (CorpusManifest, str) -> NoneType
+
+        The method saves the manifest as JSON into the file filename,
+        which load_manifest can read. The file is replaced at once, so that
+        it is never left half written.
+        """
+        content = {'options': self.options, 'files': self.files, 'word_files': self.word_files}
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp")
+        try:
+            fobj = os.fdopen(fd, "w", encoding="utf-8")
+            try:
+                json.dump(content, fobj)
+            finally:
+                fobj.close()
+            os.replace(temp_path, filename)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+
+# DEFINE FUNCTIONS
+def load_manifest(filename):
+    """ (str) -> CorpusManifest
+
+    The function returns the manifest saved with CorpusManifest.save into the
+    file filename, or an empty manifest if there is no such file.
+    """
+    try:
+        fobj = open(filename, "r", encoding="utf-8")
+    except FileNotFoundError:
+        return CorpusManifest()
+    try:
+        content = json.load(fobj)
+    finally:
+        fobj.close()
+    manifest = CorpusManifest(**content['options'])
+    manifest.files = {name: tuple(record) for name, record in content['files'].items()}
+    manifest.word_files = content['word_files']
+    return manifest
+
+
+def get_manifest_path(cache):
+    """ (DescriptorCache) -> str
+
+    The function returns the path of the manifest saved next to the entries of the cache.
+    """
+    return os.path.join(cache.directory, MANIFEST_FILENAME)
+
+
+def read_file_semantic_descriptors(filename, manifest, cache=None):
+    """ (str, CorpusManifest, DescriptorCache) -> tuple
+
+    The function returns a tuple (key, size, mtime_ns, semantic descriptors)
+    for the file, built with the options of the manifest, where key is the
+    cache key of the content the descriptors were built from. The descriptors
+    are loaded from the cache when possible.
+    """
+    options = manifest.options
+    stat = os.stat(filename)
+    fobj = open(filename, "rb")
+    raw_content = fobj.read()
+    fobj.close()
+    key = get_cache_key(raw_content, manifest.get_settings())
+
+    # in case the file was already processed
+    sem_desc = cache.get(key) if cache is not None else None
+    if sem_desc is None:
+        file_words = get_word_breakdown_fast(decode_file_content(raw_content))
+        sem_desc = get_text_semantic_descriptors(file_words, options['window'], options['weighting'],
+                                                 options['max_sentence_length'])
+        if cache is not None:
+            cache.put(key, sem_desc)
+
+    # remove the stopwords from the descriptors of the file
+    if options['stopwords'] is not None:
+        prune_semantic_descriptors(sem_desc, stopwords=options['stopwords'])
+
+    return key, stat.st_size, stat.st_mtime_ns, sem_desc
+
+
+def refresh_normed_vectors(semantic_descriptors, words):
+    """ (dict, iterable) -> NoneType
+
+    The function records again the norms of the vectors of words which are
+    NormedVectors, since the vectors changed after their norms were recorded.
+    """
+    for word in words:
+        vector = semantic_descriptors.get(word)
+        if isinstance(vector, NormedVector):
+            semantic_descriptors[word] = NormedVector(vector, vector.normalized is not None)
+
+
+def add_files(semantic_descriptors, files, manifest, cache=None, similarity_cache=None):
+    """ (dict, list, CorpusManifest, DescriptorCache, SimilarityCache) -> NoneType
+
+    The function adds the semantic descriptors of the files, built with the
+    options of the manifest, to a dictionary of semantic descriptors and
+    records the files in the manifest.
+    It modifies the dictionary and the manifest. Only the given files are read.
+    It raises a ValueError if a file is already in the manifest.
+    If a SimilarityCache is given, the similarities of the words of the files
+    are dropped from it, since their vectors changed.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> first = os.path.join(directory, 'first.txt')
+    >>> second = os.path.join(directory, 'second.txt')
+    >>> with open(first, 'w') as fobj:
+    ...     _ = fobj.write('All animals are equal. Hello!')
+    >>> with open(second, 'w') as fobj:
+    ...     _ = fobj.write('Some animals are more equal. Hello!')
+    >>> d = {}
+    >>> manifest = CorpusManifest()
+    >>> add_files(d, [first], manifest)
+    >>> add_files(d, [second], manifest)
+    >>> d == build_semantic_descriptors_from_files([first, second])
+    True
+    >>> manifest.word_files['animals'], manifest.word_files['some']
+    (2, 1)
+    >>> windowed, manifest_windowed = {}, CorpusManifest(window=1, stopwords=['are'])
+    >>> add_files(windowed, [first], manifest_windowed)
+    >>> add_files(windowed, [second], manifest_windowed)
+    >>> windowed == build_semantic_descriptors_from_files([first, second], window=1, stopwords=['are'])
+    True
+    >>> from similarity_cache import SimilarityCache
+    >>> similarity_cache = SimilarityCache()
+    >>> for word in ['all', 'hello']:
+    ...     _ = similarity_cache.get_similarity(word, 'animals', d, get_cos_sim)
+    >>> third = os.path.join(directory, 'third.txt')
+    >>> with open(third, 'w') as fobj:
+    ...     _ = fobj.write('All pigs are equal.')
+    >>> add_files(d, [third], manifest, similarity_cache=similarity_cache)
+    >>> [key[1:] for key in similarity_cache.entries]
+    [('animals', 'hello')]
+    >>> add_files(d, [first], manifest)
+    Traceback (most recent call last):
+    ValueError: file already added: 'first.txt'
+    >>> import shutil
+    >>> shutil.rmtree(directory)
+    """
+    # read every file before changing the dictionary
+    file_descs = []
+    for filename in files:
+        if filename in manifest.files:
+            raise ValueError("file already added: %r" % (os.path.basename(filename),))
+        file_descs.append((filename, read_file_semantic_descriptors(filename, manifest, cache)))
+
+    # add the descriptors of the files
+    for filename, file_desc in file_descs:
+        add_file_descriptors(semantic_descriptors, filename, file_desc, manifest, similarity_cache)
+
+
+def add_file_descriptors(semantic_descriptors, filename, file_desc, manifest, similarity_cache=None):
+    """ (dict, str, tuple, CorpusManifest, SimilarityCache) -> NoneType
+
+    The function adds the semantic descriptors of a file, given as the tuple
+    returned by read_file_semantic_descriptors, to a dictionary of semantic
+    descriptors and records the file in the manifest.
+    """
+    key, size, mtime_ns, sem_desc = file_desc
+    words = list(sem_desc)
+    merge_dicts_of_vectors(semantic_descriptors, sem_desc, consume=True)
+    refresh_normed_vectors(semantic_descriptors, words)
+
+    # record the file and its words
+    manifest.files[filename] = (key, size, mtime_ns)
+    for word in words:
+        manifest.word_files[word] = manifest.word_files.get(word, 0) + 1
+    if similarity_cache is not None:
+        similarity_cache.invalidate(words)
+
+
+def remove_files(semantic_descriptors, files, manifest, cache=None, similarity_cache=None):
+    """ (dict, list, CorpusManifest, DescriptorCache, SimilarityCache) -> NoneType
+
+    The function substracts the semantic descriptors the files were added with
+    from a dictionary of semantic descriptors and removes the files from the manifest.
+    Components which become 0 are deleted, as are the words no other file contains.
+    It modifies the dictionary and the manifest. Only the given files are read.
+    The descriptors of a file are found in the cache, or by reading the file
+    again when its content did not change; a ValueError is raised otherwise,
+    and also if a file is not in the manifest.
+    If a SimilarityCache is given, the similarities of the words of the files
+    are dropped from it.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> first = os.path.join(directory, 'first.txt')
+    >>> second = os.path.join(directory, 'second.txt')
+    >>> with open(first, 'w') as fobj:
+    ...     _ = fobj.write('All animals are equal. Hello!')
+    >>> with open(second, 'w') as fobj:
+    ...     _ = fobj.write('Some animals are more equal. Hello!')
+    >>> d = {}
+    >>> manifest = CorpusManifest()
+    >>> add_files(d, [first, second], manifest)
+    >>> remove_files(d, [first], manifest)
+    >>> d == build_semantic_descriptors_from_files([second])
+    True
+    >>> 'all' in d, d['hello']
+    (False, {})
+    >>> remove_files(d, [first], manifest)
+    Traceback (most recent call last):
+    ValueError: file not added: 'first.txt'
+    >>> with open(second, 'w') as fobj:
+    ...     _ = fobj.write('Changed.')
+    >>> remove_files(d, [second], manifest)
+    Traceback (most recent call last):
+    ValueError: cannot find the descriptors 'second.txt' was added with
+    >>> import shutil
+    >>> shutil.rmtree(directory)
+    """
+    # find the descriptors of every file before changing the dictionary
+    file_descs = [(filename, find_added_descriptors(filename, manifest, cache)) for filename in files]
+
+    # substract them
+    for filename, sem_desc in file_descs:
+        remove_file_descriptors(semantic_descriptors, filename, sem_desc, manifest, similarity_cache)
+
+
+def find_added_descriptors(filename, manifest, cache=None):
+    """ (str, CorpusManifest, DescriptorCache) -> dict
+
+    The function returns the semantic descriptors the file was added with,
+    found in the cache, or by reading the file again when its content did not change.
+    It raises a ValueError if the file is not in the manifest or if its
+    descriptors cannot be found.
+    """
+    if filename not in manifest.files:
+        raise ValueError("file not added: %r" % (os.path.basename(filename),))
+
+    # look in the cache first, then in the file
+    key = manifest.files[filename][0]
+    sem_desc = cache.get(key) if cache is not None else None
+    if sem_desc is None and os.path.exists(filename):
+        new_key, size, mtime_ns, sem_desc = read_file_semantic_descriptors(filename, manifest, cache)
+        if new_key != key:
+            sem_desc = None
+    if sem_desc is None:
+        raise ValueError("cannot find the descriptors %r was added with" % (os.path.basename(filename),))
+    return sem_desc
+
+
+def remove_file_descriptors(semantic_descriptors, filename, sem_desc, manifest, similarity_cache=None):
+    """ (dict, str, dict, CorpusManifest, SimilarityCache) -> NoneType
+
+    The function substracts the semantic descriptors a file was added with from
+    a dictionary of semantic descriptors, deletes the words no other file
+    contains and removes the file from the manifest. Words the manifest does
+    not count are left in the dictionary.
+
+    >>> d, manifest = {'cat': {'furry': 2}}, CorpusManifest()
+    >>> manifest.files['cats.txt'] = ('0123', 10, 1000)
+    >>> remove_file_descriptors(d, 'cats.txt', {'cat': {'furry': 1}}, manifest)
+    >>> d, manifest.files
+    ({'cat': {'furry': 1}}, {})
+    """
+    sub_dicts_of_vectors(semantic_descriptors, sem_desc)
+    for word in sem_desc:
+        count = manifest.word_files.get(word)
+        if count is None:
+            continue
+        if count == 1:
+            del manifest.word_files[word]
+            del semantic_descriptors[word]
+        else:
+            manifest.word_files[word] = count - 1
+    refresh_normed_vectors(semantic_descriptors, sem_desc)
+    del manifest.files[filename]
+    if similarity_cache is not None:
+        similarity_cache.invalidate(sem_desc)
+
+
+def update_files(semantic_descriptors, files, manifest, cache, similarity_cache=None):
+    """ (dict, list, CorpusManifest, DescriptorCache, SimilarityCache) -> tuple
+
+    The function updates a dictionary of semantic descriptors and its manifest
+    so that they describe the new list of files: files which are no longer
+    in the list or whose content changed are removed, and new or changed files
+    are added, with the options of the manifest. The descriptors of changed
+    files are found in the cache.
+    It returns the tuple of lists (added, removed, changed) of CorpusManifest.get_changes.
+    The descriptors of every file to remove are found and the ones of every
+    file to add are built before the dictionary is changed, so that the
+    dictionary and the manifest are left as they were if a file cannot be
+    read or its old descriptors cannot be found. The manifest then records
+    the new sizes and modification times of the files whose content is the
+    same, and is saved next to the cache, where load_manifest(get_manifest_path(cache))
+    finds it.
+    The similarities of the words of the changed files are dropped from
+    similarity_cache, if it is given.
+
+    >>> from descriptor_cache import DescriptorCache
+    >>> directory = tempfile.mkdtemp()
+    >>> cache = DescriptorCache(os.path.join(directory, 'cache'))
+    >>> first = os.path.join(directory, 'first.txt')
+    >>> second = os.path.join(directory, 'second.txt')
+    >>> with open(first, 'w') as fobj:
+    ...     _ = fobj.write('All animals are equal.')
+    >>> with open(second, 'w') as fobj:
+    ...     _ = fobj.write('Some animals are more equal.')
+    >>> d = {}
+    >>> manifest = CorpusManifest()
+    >>> names = lambda changes: [[os.path.basename(f) for f in files] for files in changes]
+    >>> names(update_files(d, [first], manifest, cache))
+    [['first.txt'], [], []]
+    >>> with open(first, 'w') as fobj:
+    ...     _ = fobj.write('All pigs are equal.')
+    >>> names(update_files(d, [first, second], manifest, cache))
+    [['second.txt'], [], ['first.txt']]
+    >>> d == build_semantic_descriptors_from_files([first, second])
+    True
+    >>> load_manifest(get_manifest_path(cache)).files == manifest.files
+    True
+    >>> before = build_semantic_descriptors_from_files([first, second])
+    >>> with open(first, 'w') as fobj:
+    ...     _ = fobj.write('All cows are equal.')
+    >>> update_files(d, [first, second, os.path.join(directory, 'missing.txt')], manifest, cache) # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    FileNotFoundError: [Errno 2] No such file or directory: ...
+    >>> d == before, sorted(names([manifest.files])[0])
+    (True, ['first.txt', 'second.txt'])
+    >>> import shutil
+    >>> shutil.rmtree(directory)
+    """
+    added, removed, changed, refreshed = manifest.get_changes(files)
+
+    # find the old descriptors and build the new ones
+    old_descs = [(filename, find_added_descriptors(filename, manifest, cache)) for filename in removed + changed]
+    new_descs = [(filename, read_file_semantic_descriptors(filename, manifest, cache))
+                 for filename in files if filename in added or filename in changed]
+
+    # swap them once every file was read
+    for filename, sem_desc in old_descs:
+        remove_file_descriptors(semantic_descriptors, filename, sem_desc, manifest, similarity_cache)
+    for filename, file_desc in new_descs:
+        add_file_descriptors(semantic_descriptors, filename, file_desc, manifest, similarity_cache)
+    manifest.files.update(refreshed)
+    manifest.save(get_manifest_path(cache))
+    return added, removed, changed
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
@@ -0,0 +1,284 @@
+# synonym-finder
+
+# This module contains functions to project semantic descriptors into
+# fixed-width dense vectors stored in a float32 NumPy matrix, so that
+# similarities are computed with a few matrix operations instead of one
+# dictionary lookup per context word.
+# Every context word is sent to a few columns of the matrix with a random sign,
+# using a hash of the word (the hashing trick, or a sparse random projection
+# when several columns are used). Dot products and norms are only kept
+# approximately, so more columns give answers closer to the sparse vectors.
+
+# IMPORT MODULES
+import doctest
+import zlib
+from collections.abc import Mapping
+import numpy as np
+from similarity_measures import get_cos_sim, get_euc_sim, get_norm_euc_sim
+from batch_scoring import read_quiz
+
+
+
+# DEFINE CONSTANTS
+PROJECTION_METHODS = ('hashing', 'sparse_random')
+
+
+
+# DEFINE CLASSES
+class DenseEmbeddings(Mapping):
+    """ A read-only mapping from words to rows of a float32 matrix of dense vectors.
+
+    >>> d = {'cat': {'furry': 3, 'grumpy': 5}, 'dog': {'furry': 3, 'bark': 5}, 'nothing': {}}
+    >>> embeddings = project_descriptors(d, dimension=8)
+    >>> len(embeddings), embeddings.matrix.shape, embeddings.matrix.dtype
+    (3, (3, 8), dtype('float32'))
+    >>> embeddings['nothing'].tolist() == [0.0] * 8
+    True
+    >>> sorted(embeddings)
+    ['cat', 'dog', 'nothing']
+    """
+
+    def __init__(self, words, matrix, method, seed):
+        """ (DenseEmbeddings, list, ndarray, str, int) -> NoneType
+
+        The method creates embeddings whose row i holds the vector of words[i].
+        """
+        self.words = words
+        self.positions = {word: position for position, word in enumerate(words)}
+        self.matrix = matrix
+        self.norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix, dtype=np.float64))
+        self.method = method
+        self.seed = seed
+
+    def __getitem__(self, word):
+        return self.matrix[self.positions[word]]
+
+    def __iter__(self):
+        return iter(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.positions
+
+
+
+# DEFINE FUNCTIONS
+def get_context_columns(context_words, dimension, seed, nonzeros):
+    """ (list, int, int, int) -> tuple
+
+    The function takes a list of context words, the dimension of the dense
+    vectors, a seed and the number of columns each context word is sent to.
+    It returns a tuple (columns, signs) of arrays with one row per context word.
+    Columns and signs only depend on the context word and the seed, not on
+    the other context words, so that two projections with the same settings
+    can be compared.
+
+    >>> columns, signs = get_context_columns(['a', 'b'], 16, 0, 2)
+    >>> columns.shape, signs.shape
+    ((2, 2), (2, 2))
+    >>> columns2, signs2 = get_context_columns(['b'], 16, 0, 2)
+    >>> (columns2[0] == columns[1]).all().item(), (signs2[0] == signs[1]).all().item()
+    (True, True)
+    >>> sorted(set(abs(signs).ravel().tolist())) == [1 / 2 ** 0.5]
+    True
+    """
+    # hash every context word once per column
+    hashes = np.empty((len(context_words), nonzeros), dtype=np.uint64)
+    for row, context_word in enumerate(context_words):
+        encoded = context_word.encode("utf-8")
+        for column in range(nonzeros):
+            hashes[row, column] = zlib.crc32(encoded, zlib.crc32(b"%d:%d" % (seed, column)))
+
+    # the low bits give the sign and the other bits the column
+    columns = (hashes >> np.uint64(1)) % np.uint64(dimension)
+    signs = np.where(hashes & np.uint64(1), 1.0, -1.0) / np.sqrt(nonzeros)
+    return columns.astype(np.int64), signs
+
+
+def project_descriptors(semantic_descriptors, dimension=256, seed=0, method='hashing',
+                        nonzeros=4, batch_entries=1 << 22):
+    """ (dict, int, int, str, int, int) -> DenseEmbeddings
+
+    The function takes as input a dictionary of semantic descriptors (or a SemanticSpace).
+    It returns DenseEmbeddings holding a vector of dimension floats for each word.
+    With the 'hashing' method, every context word is added to one column with
+    a random sign; with the 'sparse_random' method, it is added to nonzeros
+    columns with random signs scaled by 1/sqrt(nonzeros), which keeps dot
+    products closer to the sparse ones. The vectors are projected a few words
+    at a time, with about batch_entries context words per batch.
+    It raises a ValueError if the method is unknown.
+
+    >>> d = {'cat': {'furry': 3, 'grumpy': 5}, 'feline': {'furry': 2, 'grumpy': 4}}
+    >>> embeddings = project_descriptors(d, dimension=1024, method='sparse_random')
+    >>> round(float(embeddings['cat'] @ embeddings['feline']))
+    26
+    >>> project_descriptors(d, method='exact')
+    Traceback (most recent call last):
+    ValueError: unknown projection method: 'exact'
+    """
+    if method not in PROJECTION_METHODS:
+        raise ValueError("unknown projection method: %r" % (method,))
+    if method == 'hashing':
+        nonzeros = 1
+
+    # give an id to every context word and draw its columns and signs
+    context_ids = {}
+    for vector in semantic_descriptors.values():
+        for context_word in vector:
+            if context_word not in context_ids:
+                context_ids[context_word] = len(context_ids)
+    columns, signs = get_context_columns(list(context_ids), dimension, seed, nonzeros)
+
+    # add the counts of each batch of words to their columns
+    words = list(semantic_descriptors)
+    matrix = np.zeros((len(words), dimension), dtype=np.float32)
+    start = 0
+    while start < len(words):
+        batch_start = start
+        rows = []
+        ids = []
+        counts = []
+        while start < len(words) and (len(ids) == 0 or len(ids) < batch_entries):
+            vector = semantic_descriptors[words[start]]
+            rows.extend([start] * len(vector))
+            ids.extend([context_ids[context_word] for context_word in vector])
+            counts.extend(vector.values())
+            start += 1
+        if not ids:
+            continue
+
+        # sum the signed counts falling into each (row, column) cell
+        rows = np.array(rows, dtype=np.int64) - batch_start
+        ids = np.array(ids, dtype=np.int64)
+        cells = rows[:, None] * dimension + columns[ids]
+        weights = np.array(counts, dtype=np.float64)[:, None] * signs[ids]
+        sums = np.bincount(cells.ravel(), weights.ravel(), minlength=(start - batch_start) * dimension)
+        matrix[batch_start : start] = sums.reshape(start - batch_start, dimension)
+
+    # return the embeddings
+    return DenseEmbeddings(words, matrix, method, seed)
+
+
+def score_pairs(embeddings, targets, choices, similarity_fn):
+    """ (DenseEmbeddings, list, list, function) -> ndarray
+
+    The function takes embeddings, two lists of words of the same length and one of
+    get_cos_sim, get_euc_sim and get_norm_euc_sim. It returns an array holding
+    the similarity between targets[i] and choices[i] for each i, computed on the
+    dense vectors all at once. As in most_sim_word, the similarity is -inf when
+    a word has no vector or when the cosine similarity cannot be computed.
+    It raises a ValueError for any other similarity function.
+
+    >>> d = {'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 5}, 'd': {}}
+    >>> embeddings = project_descriptors(d, dimension=64)
+    >>> score_pairs(embeddings, ['a', 'a', 'a', 'z'], ['b', 'c', 'd', 'a'], get_cos_sim).round(4).tolist()
+    [0.9487, 0.0, -inf, -inf]
+    >>> score_pairs(embeddings, ['a', 'a'], ['b', 'd'], get_euc_sim).round(4).tolist()
+    [-1.4142, -2.0]
+    >>> score_pairs(embeddings, ['a', 'a'], ['c', 'd'], get_norm_euc_sim).round(4).tolist()
+    [-1.4142, -1.0]
+    """
+    if similarity_fn not in (get_cos_sim, get_euc_sim, get_norm_euc_sim):
+        raise ValueError("dense vectors only support get_cos_sim, get_euc_sim and get_norm_euc_sim")
+
+    # find the rows of the words, -1 for missing words
+    target_rows = np.array([embeddings.positions.get(word, -1) for word in targets], dtype=np.int64)
+    choice_rows = np.array([embeddings.positions.get(word, -1) for word in choices], dtype=np.int64)
+    known = (target_rows >= 0) & (choice_rows >= 0)
+    target_rows = target_rows[known]
+    choice_rows = choice_rows[known]
+
+    # compute the dot products and the norms of every pair
+    target_vectors = embeddings.matrix[target_rows]
+    choice_vectors = embeddings.matrix[choice_rows]
+    dots = np.einsum('ij,ij->i', target_vectors, choice_vectors, dtype=np.float64)
+    target_norms = embeddings.norms[target_rows]
+    choice_norms = embeddings.norms[choice_rows]
+
+    # compute the similarities from them
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if similarity_fn is get_cos_sim:
+            known_scores = np.where(target_norms * choice_norms == 0, -np.inf,
+                                    dots / (target_norms * choice_norms))
+        elif similarity_fn is get_euc_sim:
+            squares = target_norms ** 2 + choice_norms ** 2 - 2 * dots
+            known_scores = -np.sqrt(np.maximum(squares, 0))
+        else:
+            # zero vectors stay zero once normalized
+            cos_sims = np.where(target_norms * choice_norms == 0, 0.0, dots / (target_norms * choice_norms))
+            squares = (target_norms > 0).astype(np.float64) + (choice_norms > 0) - 2 * cos_sims
+            known_scores = -np.sqrt(np.maximum(squares, 0))
+
+    # missing words have a similarity of -inf
+    scores = np.full(len(targets), -np.inf)
+    scores[known] = known_scores
+    return scores
+
+
+def dense_most_sim_word(word, choices, embeddings, similarity_fn):
+    """ (str, list, DenseEmbeddings, function) -> str
+
+    The function returns the element of choices which has the largest similarity
+    to word on the dense vectors, computing all the similarities at once.
+    As in most_sim_word, the first choice wins ties and an empty string is
+    returned when no similarity can be computed.
+
+    >>> c = {'furry' : 3, 'grumpy' : 5, 'nimble' : 4}
+    >>> f = {'furry' : 2, 'nimble' : 5}
+    >>> d = {'furry' : 3, 'bark' : 5, 'loyal' : 8}
+    >>> h = {'race' : 4, 'queen' : 2}
+    >>> embeddings = project_descriptors({'cat' : c, 'feline' : f, 'dog' : d, 'horse' : h, 'nothing': {}})
+    >>> dense_most_sim_word('feline', ['dog', 'cat', 'horse'], embeddings, get_cos_sim)
+    'cat'
+    >>> dense_most_sim_word('nothing', ['dog', 'cat'], embeddings, get_cos_sim)
+    ''
+    """
+    scores = score_pairs(embeddings, [word] * len(choices), choices, similarity_fn)
+    if len(scores) == 0 or scores.max() == -np.inf:
+        return ""
+    return choices[int(scores.argmax())]
+
+
+def run_sim_test_dense(filename, embeddings, similarity_fn):
+    """ (str, DenseEmbeddings, function) -> tuple
+
+    The function answers every question of the quiz file with the dense vectors,
+    scoring all the (word, choice) pairs of the quiz at once.
+    It returns a tuple (percentage, answers) where percentage is the percentage
+    of correct answers, computed as in run_sim_test, and answers is the list
+    of choices picked for each question.
+    """
+    # read the questions
+    questions = read_quiz(filename)
+
+    # score every pair of the quiz
+    targets = []
+    choices = []
+    for word, answer, question_choices in questions:
+        targets.extend([word] * len(question_choices))
+        choices.extend(question_choices)
+    scores = score_pairs(embeddings, targets, choices, similarity_fn).tolist()
+
+    # pick the answer of each question, as in most_sim_word
+    answers = []
+    correct_answers = 0
+    start = 0
+    for word, answer, question_choices in questions:
+        question_scores = scores[start : start + len(question_choices)]
+        start += len(question_choices)
+        max_score = max(question_scores)
+        guess = "" if max_score == float('-inf') else question_choices[question_scores.index(max_score)]
+        answers.append(guess)
+        if guess == answer:
+            correct_answers += 1
+
+    # return the percentage and the answers
+    return (correct_answers / len(questions)) * 100, answers
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
@@ -0,0 +1,311 @@
+# synonym-finder
+
+# This module contains an on-disk cache for the semantic descriptors of single files.
+# Entries are keyed by a hash of the file's content and of the tokenizer settings,
+# so a file is only processed again when its content or the settings change.
+
+# IMPORT MODULES
+import doctest
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+
+
+
+# DEFINE CLASSES
+class DescriptorCache:
+    """ A directory of pickled semantic descriptors, one file per cache key.
+
+    The total size of the entries can be capped with max_bytes. When the cap
+    is exceeded, entries are evicted following the eviction policy:
+    'lru' removes the least recently used entries first and 'fifo' removes
+    the oldest written entries first.
+    The number of hits, misses and evictions is recorded.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> cache = DescriptorCache(directory)
+    >>> key = get_cache_key(b'Hello there.', {'tokenizer': 'default'})
+    >>> cache.get(key) is None
+    True
+    >>> cache.put(key, {'hello': {'there': 1}, 'there': {'hello': 1}})
+    >>> cache.get(key)['hello']
+    {'there': 1}
+    >>> cache.get_stats()
+    {'hits': 1, 'misses': 1, 'evictions': 0, 'entries': 1}
+
+    >>> DescriptorCache(directory, eviction='random')
+    Traceback (most recent call last):
+    ValueError: unknown eviction policy: 'random'
+    """
+
+    EVICTION_POLICIES = ('lru', 'fifo')
+
+    def __init__(self, directory=".descriptor_cache", max_bytes=None, eviction='lru'):
+        """ (DescriptorCache, str, int, str) -> NoneType
+
+        The method creates a cache stored in directory, which is created if needed.
+        max_bytes is the maximal total size of the entries (no limit if None).
+        """
+        if eviction not in self.EVICTION_POLICIES:
+            raise ValueError("unknown eviction policy: %r" % (eviction,))
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.eviction = eviction
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, key):
+        """ (DescriptorCache, str) -> str
+
+        The method returns the path of the file storing the entry with the given key.
+        """
+        return os.path.join(self.directory, key + ".pickle")
+
+    def get(self, key):
+        """ (DescriptorCache, str) -> dict
+
+        The method returns the semantic descriptors stored under key,
+        or None if there is no such entry or if it cannot be read.
+        """
+        path = self.get_path(key)
+
+        # load the entry
+        try:
+            fobj = open(path, "rb")
+            try:
+                semantic_descriptors = pickle.load(fobj)
+            finally:
+                fobj.close()
+
+        # in case the entry is missing or damaged
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+
+        # mark the entry as recently used
+        if self.eviction == 'lru':
+            os.utime(path)
+
+        self.hits += 1
+        return semantic_descriptors
+
+    def put(self, key, semantic_descriptors):
+        """ (DescriptorCache, str, dict) -> NoneType
+
+        The method stores the semantic descriptors under key,
+        then evicts entries if the cache is larger than its size cap.
+        """
+        # write to a temporary file first so that readers never see a partial entry
+        path = self.get_path(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            fobj = os.fdopen(fd, "wb")
+            try:
+                pickle.dump(semantic_descriptors, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+            finally:
+                fobj.close()
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        # keep the cache under its size cap
+        if self.max_bytes is not None:
+            self.evict(keep=path)
+
+    def get_entries(self):
+        """ (DescriptorCache) -> list
+
+        The method returns a list of (modification time, size, path) tuples,
+        one for each entry of the cache, oldest first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self, keep=None):
+        """ (DescriptorCache, str) -> NoneType
+
+        The method removes the oldest entries until the total size of the cache
+        is at most max_bytes. The entry stored at path keep is never removed.
+        Entries are touched when read with the 'lru' policy only, so the oldest
+        entries are the least recently used ones with 'lru' and the first
+        written ones with 'fifo'.
+
+        >>> cache = DescriptorCache(tempfile.mkdtemp(), max_bytes=150, eviction='fifo')
+        >>> for word in ['a', 'b', 'c']:
+        ...     cache.put(word, {word: {'x' * 40: 1}})
+        >>> cache.get('a') is None
+        True
+        >>> cache.get('b') is None
+        False
+        >>> cache.evictions
+        1
+        """
+        entries = self.get_entries()
+        total_size = sum(size for mtime, size, path in entries)
+
+        # remove entries, oldest first
+        for mtime, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            self.evictions += 1
+
+    def get_stats(self):
+        """ (DescriptorCache) -> dict
+
+        The method returns a dictionary with the number of hits, misses
+        and evictions so far and the number of entries in the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self.get_entries())}
+
+
+
+class HashingReader(io.RawIOBase):
+    """ A binary file adding every byte read from it to a hashlib digest,
+    so that the key of the content is computed from the bytes actually read.
+
+    >>> digest = hashlib.sha256()
+    >>> reader = HashingReader(io.BytesIO(b'Hello there.'), digest)
+    >>> reader.read(5), reader.read()
+    (b'Hello', b' there.')
+    >>> digest.hexdigest() == hashlib.sha256(b'Hello there.').hexdigest()
+    True
+    """
+
+    def __init__(self, fobj, digest):
+        """ (HashingReader, file, object) -> NoneType
+
+        The method wraps the binary file fobj, which is closed along with it.
+        """
+        super().__init__()
+        self.fobj = fobj
+        self.digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.fobj.readinto(buffer)
+        self.digest.update(memoryview(buffer)[:count])
+        return count
+
+    def close(self):
+        self.fobj.close()
+        super().close()
+
+
+
+# DEFINE FUNCTIONS
+def get_settings_digest(settings):
+    """ (dict) -> object
+
+    The function returns a SHA-256 digest of the settings used to turn a file
+    into semantic descriptors, to which the content of the file is then added.
+    """
+    # hash the settings in a fixed order
+    digest = hashlib.sha256()
+    digest.update(repr(sorted(settings.items())).encode("utf-8"))
+    digest.update(b"\0")
+    return digest
+
+
+def open_hashed_text_file(filename, digest):
+    """ (str, object) -> file
+
+    The function opens the UTF-8 text file filename as open does in text mode,
+    adding the bytes read from it to digest, so that once the file is read
+    whole, digest.hexdigest() is the key of the content that was read:
+    get_settings_digest(settings) gives the digest of get_file_cache_key.
+
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'hello.txt')
+    >>> fobj = open(filename, 'wb')
+    >>> _ = fobj.write(b'Hello\\r\\nthere.')
+    >>> fobj.close()
+    >>> digest = get_settings_digest({})
+    >>> fobj = open_hashed_text_file(filename, digest)
+    >>> fobj.read()
+    'Hello\\nthere.'
+    >>> fobj.close()
+    >>> digest.hexdigest() == get_file_cache_key(filename, {})
+    True
+    """
+    return io.TextIOWrapper(io.BufferedReader(HashingReader(open(filename, "rb"), digest)), encoding="utf-8")
+
+
+def get_cache_key(content, settings):
+    """ (bytes, dict) -> str
+
+    The function takes as input the content of a file and a dictionary
+    of the settings used to turn it into semantic descriptors.
+    It returns a string which changes whenever the content or the settings change.
+
+    >>> k1 = get_cache_key(b'Hello there.', {'tokenizer': 'default'})
+    >>> k2 = get_cache_key(b'Hello there!', {'tokenizer': 'default'})
+    >>> k3 = get_cache_key(b'Hello there.', {'tokenizer': 'other'})
+    >>> len({k1, k2, k3})
+    3
+    >>> k1 == get_cache_key(b'Hello there.', {'tokenizer': 'default'})
+    True
+    """
+    # hash the settings, then the content
+    digest = get_settings_digest(settings)
+    digest.update(content)
+
+    # return the hexadecimal digest
+    return digest.hexdigest()
+
+
+
+def get_file_cache_key(filename, settings):
+    """ (str, dict) -> str
+
+    The function takes as input the name of a file and a dictionary of settings.
+    It returns the same key as get_cache_key for the content of the file,
+    reading the file in blocks so that it never has to fit in memory.
+
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'hello.txt')
+    >>> fobj = open(filename, 'wb')
+    >>> _ = fobj.write(b'Hello there.')
+    >>> fobj.close()
+    >>> get_file_cache_key(filename, {}) == get_cache_key(b'Hello there.', {})
+    True
+    """
+    # hash the settings, then the content
+    digest = get_settings_digest(settings)
+    fobj = open(filename, "rb")
+    try:
+        for block in iter(lambda: fobj.read(1 << 20), b""):
+            digest.update(block)
+    finally:
+        fobj.close()
+
+    # return the hexadecimal digest
+    return digest.hexdigest()
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
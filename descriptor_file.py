@@ -0,0 +1,201 @@
+# synonym-finder
+
+# This module contains functions to save semantic descriptors into a compact
+# binary file and to open such a file through mmap, so that only the pages
+# holding the vectors of the queried words are read, and so that several
+# processes opening the same file share one copy of it in the page cache.
+
+# File layout (every section starts on an 8-byte boundary, numbers use the
+# byte order of the machine which wrote the file):
+#   header      magic, byte order, count typecode, number of words,
+#               number of words with a vector, number of entries, vocabulary size
+#   vocabulary  the words encoded in UTF-8 and separated by newlines
+#   offsets     (number of words + 1) 64-bit start positions of each vector
+#   context ids one 32-bit id per entry
+#   counts      one count per entry
+
+# IMPORT MODULES
+import doctest
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from semantic_space import SemanticSpace
+
+
+
+# DEFINE CONSTANTS
+MAGIC = b"SYNDESC1"
+HEADER_FORMAT = "<8s8s8sQQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+
+# DEFINE CLASSES
+class MappedSemanticSpace(SemanticSpace):
+    """ A SemanticSpace whose arrays are read from a memory-mapped descriptor file.
+    It must be closed once it is no longer used, which can be done with a with statement.
+    """
+
+    def __init__(self, words, indptr, indices, data, num_keys, mapping):
+        """ (MappedSemanticSpace, list, memoryview, memoryview, memoryview, int, mmap) -> NoneType
+
+        The method creates a space over the arrays of an open mmap.
+        """
+        SemanticSpace.__init__(self, words, indptr, indices, data, num_keys)
+        self.mapping = mapping
+
+    def close(self):
+        """ (MappedSemanticSpace) -> NoneType
+
+        The method releases the arrays and closes the underlying mmap.
+        """
+        if self.mapping is None:
+            return
+        for view in (self.indptr, self.indices, self.data):
+            view.release()
+        self.mapping.close()
+        self.mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+
+# DEFINE FUNCTIONS
+def get_padding(size):
+    """ (int) -> bytes
+
+    The function returns the zero bytes needed after size bytes
+    to reach the next 8-byte boundary.
+
+    >>> get_padding(13)
+    b'\\x00\\x00\\x00'
+    >>> get_padding(16)
+    b''
+    """
+    return b"\0" * (-size % 8)
+
+
+def save_descriptor_file(semantic_descriptors, filename):
+    """ (dict, str) -> NoneType
+
+    The function takes as input a dictionary of semantic descriptor vectors
+    (or a SemanticSpace) and the name of a file.
+    It writes the vectors into the file using the binary descriptor format.
+    """
+    # turn the descriptors into CSR arrays
+    if isinstance(semantic_descriptors, SemanticSpace):
+        space = semantic_descriptors
+    else:
+        space = SemanticSpace.from_descriptors(semantic_descriptors)
+
+    # words never contain whitespace, so they can be separated by newlines
+    vocabulary = "\n".join(space.words).encode("utf-8")
+
+    # write the sections one after the other
+    fobj = open(filename, "wb")
+    try:
+        fobj.write(struct.pack(HEADER_FORMAT, MAGIC, sys.byteorder.encode("ascii"),
+                               space.data.typecode.encode("ascii"), len(space.words),
+                               space.num_keys, len(space.indices), len(vocabulary)))
+        fobj.write(vocabulary + get_padding(len(vocabulary)))
+        for values, typecode in ((space.indptr, 'q'), (space.indices, 'I'), (space.data, space.data.typecode)):
+            content = array(typecode, values).tobytes()
+            fobj.write(content + get_padding(len(content)))
+    finally:
+        fobj.close()
+
+
+def open_descriptor_file(filename):
+    """ (str) -> MappedSemanticSpace
+
+    The function takes as input the name of a file written by save_descriptor_file.
+    It returns a MappedSemanticSpace reading its vectors directly from the file
+    through mmap. Only the vocabulary is read when the file is opened.
+    It raises a ValueError if the file is not a descriptor file written on
+    a machine with the same byte order, or if it is shorter than its header says.
+
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'descriptors.bin')
+    >>> d = {'cat': {'furry': 3, 'grumpy': 5}, 'feline': {'furry': 2}, 'dog': {}}
+    >>> save_descriptor_file(d, filename)
+    >>> with open_descriptor_file(filename) as space:
+    ...     space['cat']['grumpy'], len(space['feline']), space.to_dict() == d
+    (5, 1, True)
+
+    >>> fobj = open(filename, 'wb')
+    >>> _ = fobj.write(b'not a descriptor file' * 4)
+    >>> fobj.close()
+    >>> open_descriptor_file(filename)
+    Traceback (most recent call last):
+    ValueError: not a descriptor file
+
+    >>> save_descriptor_file(d, filename)
+    >>> os.truncate(filename, os.path.getsize(filename) - 8)
+    >>> open_descriptor_file(filename)
+    Traceback (most recent call last):
+    ValueError: truncated descriptor file
+    """
+    # map the whole file in memory, read only
+    fobj = open(filename, "rb")
+    try:
+        mapping = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        fobj.close()
+
+    try:
+        # read the header
+        if len(mapping) < HEADER_SIZE:
+            raise ValueError("not a descriptor file")
+        magic, byteorder, typecode, num_words, num_keys, num_entries, vocabulary_size = \
+            struct.unpack_from(HEADER_FORMAT, mapping)
+        if magic != MAGIC:
+            raise ValueError("not a descriptor file")
+        if byteorder.rstrip(b"\0").decode("ascii") != sys.byteorder:
+            raise ValueError("descriptor file written with a different byte order")
+        typecode = typecode.rstrip(b"\0").decode("ascii")
+
+        # check that the sections given by the header fit in the file
+        sections = [('q', num_words + 1), ('I', num_entries), (typecode, num_entries)]
+        end = HEADER_SIZE + vocabulary_size + len(get_padding(vocabulary_size))
+        for typecode_, length in sections:
+            size = length * array(typecode_).itemsize
+            end += size + len(get_padding(size))
+        if end > len(mapping):
+            raise ValueError("truncated descriptor file")
+
+        # read the vocabulary
+        position = HEADER_SIZE
+        vocabulary = mapping[position : position + vocabulary_size].decode("utf-8")
+        words = vocabulary.split("\n") if num_words else []
+        if len(words) != num_words:
+            raise ValueError("not a descriptor file")
+        position += vocabulary_size + len(get_padding(vocabulary_size))
+
+        # view the arrays without copying them
+        buffer = memoryview(mapping)
+        views = []
+        for typecode_, length in sections:
+            size = length * array(typecode_).itemsize
+            views.append(buffer[position : position + size].cast(typecode_))
+            position += size + len(get_padding(size))
+        buffer.release()
+
+    except BaseException:
+        mapping.close()
+        raise
+
+    # return the space
+    indptr, indices, data = views
+    return MappedSemanticSpace(words, indptr, indices, data, num_keys, mapping)
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
@@ -5,7 +5,29 @@
 
 # IMPORT MODULES
 import doctest
+import hashlib
+import os
+import re
 from similarity_measures import *
+from descriptor_cache import get_cache_key, get_file_cache_key, get_settings_digest, open_hashed_text_file
+from instrumentation import Instrumentation, get_stage
+
+
+
+# DEFINE CONSTANTS
+# settings that determine how a file is turned into semantic descriptors,
+# cached descriptors are only reused when they were built with the same settings
+DESCRIPTOR_SETTINGS = {'tokenizer': 'default', 'builder': 'sentence'}
+
+# punctuation that separates sentences
+SENTENCE_END_PATTERN = re.compile("[.!?]")
+
+# table replacing the punctuation that separates phrases by white spaces
+WORD_SEPARATORS_TABLE = str.maketrans(",-:;\"'", "      ")
+
+# number of characters around a capital sigma needed to lowercase it
+# (it becomes a final sigma depending on the letters around it)
+SIGMA_CONTEXT = 64
 
 
 
@@ -150,12 +172,892 @@ def get_word_breakdown(text):
     return list_of_strings
         
   
-def build_semantic_descriptors_from_files(files):
-    """ (list) -> dict
+def get_sentences_fast(text):
+    """ (str) -> list
+    
+    The function takes as input a string. It returns the same list of sentences
+    as get_sentences, splitting the text with a precompiled regular expression
+    instead of looking at one character at a time.
+    
+    >>> get_sentences_fast("No animal must ever kill any other animal. All animals are equal.")
+    ['No animal must ever kill any other animal', 'All animals are equal']
+    >>> get_sentences_fast("Hello! How are you? I'm doing fine, thank you.")
+    ['Hello', 'How are you', "I'm doing fine, thank you"]
+    >>> get_sentences_fast("A sentence without ending punctuation")
+    ['A sentence without ending punctuation']
+    >>> get_sentences_fast("Hey!I am Groot.Who are you?") # no space behind punctuation
+    ['Hey', 'I am Groot', 'Who are you']
+    >>> get_sentences_fast("")
+    []
+    >>> get_sentences_fast(" ")
+    []
+    >>> get_sentences_fast('Dropped after a quote "')
+    []
+    """
+    # split the text at the punctuation that separates sentences
+    pieces = SENTENCE_END_PATTERN.split(text)
+    
+    # every piece but the last one is a sentence
+    sentences = [piece.strip() for piece in pieces[:-1] if piece != ""]
+    
+    # in case the sentence does not have an ending punctuation
+    if (len(text) >= 1) and (text[-1] not in ".!?\" "):
+        sentences.append(pieces[-1])
+    
+    # return the list of sentences
+    return sentences
+
+
+def get_words_fast(sentence):
+    """ (str) -> list
+    
+    The function takes as input a string representing a sentence.
+    It returns the same list of words as get_words, replacing all the
+    punctuation in a single pass with a translation table.
+    
+    >>> get_words_fast("Today, I will be staying home all day")
+    ['Today', 'I', 'will', 'be', 'staying', 'home', 'all', 'day']
+    >>> get_words_fast("Okay; here's a pretty-punctuated sentence: 'Hi, -- how are you'")
+    ['Okay', 'here', 's', 'a', 'pretty', 'punctuated', 'sentence', 'Hi', 'how', 'are', 'you']
+    >>> get_words_fast("")
+    []
+    """
+    return sentence.translate(WORD_SEPARATORS_TABLE).split()
+
+
+def get_word_breakdown_fast(text):
+    """ (str) -> list
+    
+    The function takes as input a string. It returns the same 2D list of words
+    as get_word_breakdown. The punctuation separating words is replaced in the
+    whole text at once, which does not change where sentences end.
+    
+    >>> t = "That's all anybody can do right now. Live. Hold out. \
+    Survive. I don't know whether good times are coming back again. But \
+    I know that won't matter if we don't survive these times."
+    >>> get_word_breakdown_fast(t) == get_word_breakdown(t)
+    True
+    >>> t = "Okay; here's a pretty-punctuated -- sentence: 'Hi, how are you'. Ends with a quote '"
+    >>> get_word_breakdown_fast(t) == get_word_breakdown(t)
+    True
+    >>> get_word_breakdown_fast("")
+    []
+    """
+    # lowercase the text and replace the punctuation separating words
+    text = text.lower()
+    pieces = SENTENCE_END_PATTERN.split(text.translate(WORD_SEPARATORS_TABLE))
+    
+    # separate each sentence into words
+    list_of_strings = [piece.split() for piece in pieces[:-1] if piece != ""]
+    
+    # in case the last sentence does not have an ending punctuation
+    # (checked on the text before its punctuation was replaced)
+    if (len(text) >= 1) and (text[-1] not in ".!?\" "):
+        list_of_strings.append(pieces[-1].split())
+    
+    # return the list of strings
+    return list_of_strings
+
+
+def get_lowercase_in_context(text, before, after):
+    """ (str, str, str) -> str
+    
+    The function returns text in lowercase, exactly as it appears in the
+    lowercase version of before + text + after. Only the capital sigma is
+    lowercased differently depending on its neighbours, so the text is
+    lowercased on its own unless it contains one; before and after need only
+    hold the SIGMA_CONTEXT characters around the text.
+    
+    >>> get_lowercase_in_context("\u03a3 B", "\u0391.", ""), "\u03a3 B".lower()
+    ('\u03c2 b', '\u03c3 b')
+    """
+    if "\u03a3" not in text:
+        return text.lower()
+    start = len(before.lower())
+    return (before + text + after).lower()[start : start + len(text.lower())]
+
+
+def read_lowercase_chunks(fobj, chunk_size):
+    """ (file, int) -> generator
+    
+    The function takes as input an open text file and a number of characters.
+    It reads the file chunk_size characters at a time and yields each chunk
+    in lowercase, exactly as it appears in the lowercase version of the whole text.
+    
+    Only the capital sigma is lowercased differently depending on its neighbours,
+    so chunks containing one are lowercased together with the SIGMA_CONTEXT
+    characters around them.
+    
+    >>> import io
+    >>> list(read_lowercase_chunks(io.StringIO("Hello World. Bye!"), 5))
+    ['hello', ' worl', 'd. by', 'e!']
+    >>> text = "\u039f\u0394\u03a5\u03a3\u03a3\u0395\u03a5\u03a3. \u0391\u03a3"
+    >>> ''.join(read_lowercase_chunks(io.StringIO(text), 1)) == text.lower()
+    True
+    """
+    # initialize the text read ahead and the text already lowercased before it
+    ahead = ""
+    behind = ""
+    end_of_file = False
+    
+    while True:
+        # read enough text to lowercase the next chunk in its context
+        while (not end_of_file) and (len(ahead) < chunk_size + SIGMA_CONTEXT):
+            text = fobj.read(chunk_size)
+            end_of_file = (text == "")
+            ahead += text
+        if ahead == "":
+            return
+        chunk = ahead[:chunk_size]
+        yield get_lowercase_in_context(chunk, behind, ahead[chunk_size:])
+        
+        # move on to the next chunk
+        behind = (behind + chunk)[-SIGMA_CONTEXT:]
+        ahead = ahead[chunk_size:]
+
+
+def get_sentences_from_chunks(chunks):
+    """ (iterable) -> generator
+    
+    The function takes as input an iterable of strings which together form a text.
+    It yields the same sentences as get_sentences would return for the whole text,
+    keeping the end of the last sentence of each chunk until the sentence is complete.
+    Only the new chunk is searched for the end of that sentence, and its pieces
+    are joined once, so that a long sentence spread over many chunks takes
+    linear time.
+    
+    >>> t = "Hey!I am Groot.Who are you? No ending"
+    >>> list(get_sentences_from_chunks([t[:7], t[7:20], t[20:]])) == get_sentences(t)
+    True
+    >>> list(get_sentences_from_chunks(['Quoted at the end "', '.']))
+    ['Quoted at the end "']
+    >>> list(get_sentences_from_chunks(['Dropped after a quote "']))
+    []
+    >>> list(get_sentences_from_chunks([]))
+    []
+    >>> list(get_sentences_from_chunks(['A long', ' sentence', ' ends', '. Then', ' another']))
+    ['A long sentence ends', ' Then another']
+    """
+    # initialize the pieces of the incomplete sentence
+    rest = []
+    
+    for chunk in chunks:
+        # split the chunk at the punctuation that separates sentences
+        pieces = SENTENCE_END_PATTERN.split(chunk)
+        
+        # in case the incomplete sentence goes on after the chunk
+        if len(pieces) == 1:
+            rest.append(chunk)
+            continue
+        
+        # the first piece completes the incomplete sentence, and every other
+        # piece but the last one is a complete sentence
+        pieces[0] = "".join(rest) + pieces[0]
+        for index in range(len(pieces) - 1):
+            if pieces[index] != "":
+                yield pieces[index].strip()
+        rest = [pieces[-1]]
+    
+    # in case the last sentence does not have an ending punctuation
+    rest = "".join(rest)
+    if (rest != "") and (rest[-1] not in "\" "):
+        yield rest
+
+
+def get_file_word_breakdown(filename, chunk_size=1 << 20, digest=None):
+    """ (str, int, object) -> generator
+    
+    The function takes as input the name of a file and a number of characters.
+    It yields the same lists of words as get_word_breakdown would return for the
+    content of the file, reading only chunk_size characters at a time so that
+    memory does not grow with the size of the file.
+    If a hashlib digest is given, the raw bytes of the file are added to it as
+    they are read (see open_hashed_text_file).
+    """
+    if digest is None:
+        fobj = open(filename, "r", encoding="utf-8")
+    else:
+        fobj = open_hashed_text_file(filename, digest)
+    try:
+        for sentence in get_sentences_from_chunks(read_lowercase_chunks(fobj, chunk_size)):
+            yield get_words_fast(sentence)
+    finally:
+        fobj.close()
+
+
+def decode_file_content(content):
+    """ (bytes) -> str
+    
+    The function takes as input the raw content of a UTF-8 text file.
+    It returns the text the file would give when opened in text mode,
+    with every line ending turned into a newline character.
+    
+    >>> decode_file_content(b'One.\\r\\nTwo.\\rThree.\\n')
+    'One.\\nTwo.\\nThree.\\n'
+    """
+    return content.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def split_long_sentences(text, max_sentence_length):
+    """ (list, int) -> list
+    
+    The function takes as input a list of lists representing the words in a text.
+    It returns the list of sentences where every sentence longer than
+    max_sentence_length words is split into consecutive sentences of at most
+    max_sentence_length words, so that text with little punctuation does not
+    give huge sentences.
+    
+    >>> split_long_sentences([['a', 'b', 'c', 'd', 'e'], ['f']], 2)
+    [['a', 'b'], ['c', 'd'], ['e'], ['f']]
+    """
+    return list(get_split_sentences(text, max_sentence_length))
+
+
+def get_split_sentences(text, max_sentence_length):
+    """ (iterable, int) -> generator
+    
+    The function takes as input an iterable of lists of words, such as the
+    generator returned by get_file_word_breakdown. It yields the sentences
+    split_long_sentences returns, one at a time.
+    
+    >>> list(get_split_sentences(iter([['a', 'b', 'c'], []]), 2))
+    [['a', 'b'], ['c'], []]
+    """
+    for sentence in text:
+        if len(sentence) <= max_sentence_length:
+            yield sentence
+        else:
+            for start in range(0, len(sentence), max_sentence_length):
+                yield sentence[start : start + max_sentence_length]
+
+
+def get_descriptor_settings(window=None, weighting=None, max_sentence_length=None):
+    """ (int, str, int) -> dict
+    
+    The function returns the settings which determine how a file is turned into
+    semantic descriptors with the given context window, window weighting and
+    maximal sentence length, which are DESCRIPTOR_SETTINGS when none is given.
+    It raises a ValueError if a weighting is given without a window.
+    
+    >>> get_descriptor_settings() is DESCRIPTOR_SETTINGS
+    True
+    >>> get_descriptor_settings(5, 'harmonic', 100)['builder']
+    'window'
+    """
+    if weighting is not None and window is None:
+        raise ValueError("a window weighting needs a context window")
+    if window is None and max_sentence_length is None:
+        return DESCRIPTOR_SETTINGS
+    
+    # record the options which change the descriptors
+    settings = dict(DESCRIPTOR_SETTINGS)
+    if window is not None:
+        settings.update(builder='window', window=window, weighting=weighting)
+    if max_sentence_length is not None:
+        settings['max_sentence_length'] = max_sentence_length
+    return settings
+
+
+def get_text_semantic_descriptors(text, window=None, weighting=None, max_sentence_length=None):
+    """ (list, int, str, int) -> dict
+    
+    The function takes as input a list of lists representing the words in a text,
+    or any iterable of them, which is only gone through once.
+    It returns its semantic descriptors, with the whole sentence as the context
+    of every word (get_all_semantic_descriptors_fast) unless a context window is
+    given (get_all_semantic_descriptors_windowed), after splitting the sentences
+    longer than max_sentence_length words if it is given.
+    
+    >>> s = [['no', 'animal', 'must', 'ever', 'kill', 'any', 'other', 'animal']]
+    >>> get_text_semantic_descriptors(s)['kill'] == get_all_semantic_descriptors_fast(s)['kill']
+    True
+    >>> get_text_semantic_descriptors(s, 1, max_sentence_length=4)['ever']
+    {'must': 1}
+    """
+    if max_sentence_length is not None:
+        text = get_split_sentences(text, max_sentence_length)
+    if window is None:
+        return get_all_semantic_descriptors_fast(text)
+    return get_all_semantic_descriptors_windowed(text, window, weighting)
+
+
+def record_file_counters(instrumentation, file_words, semantic_descriptors, window=None, max_sentence_length=None):
+    """ (Instrumentation, list, dict, int, int) -> NoneType
+    
+    The function adds to the counters of instrumentation the number of sentences,
+    tokens, (word, context word) pairs emitted by get_all_semantic_descriptors_fast
+    (or by get_all_semantic_descriptors_windowed if a window is given)
+    and vector entries of a file, given its words and its semantic descriptors.
+    The sentences are counted once split as get_text_semantic_descriptors
+    splits them if max_sentence_length is given.
+    
+    >>> from instrumentation import Instrumentation
+    >>> instrumentation = Instrumentation()
+    >>> s = [['no', 'animal', 'must', 'ever', 'kill', 'any', 'other', 'animal'], ['all', 'animals']]
+    >>> record_file_counters(instrumentation, s, get_all_semantic_descriptors_fast(s))
+    >>> instrumentation.counters
+    {'sentences': 2, 'tokens': 10, 'pairs': 44, 'entries': 44}
+    >>> record_file_counters(instrumentation, s, {}, window=2)
+    >>> instrumentation.counters['pairs'] - 44
+    28
+    >>> instrumentation = Instrumentation()
+    >>> record_file_counters(instrumentation, s, {}, max_sentence_length=4)
+    >>> instrumentation.counters['sentences'], instrumentation.counters['pairs']
+    (3, 26)
+    """
+    if max_sentence_length is not None:
+        file_words = split_long_sentences(file_words, max_sentence_length)
+    instrumentation.count('sentences', len(file_words))
+    instrumentation.count('tokens', sum(map(len, file_words)))
+    
+    # in case of a window, count the positions around each word
+    if window is not None:
+        lengths = [len(sentence) for sentence in file_words]
+        instrumentation.count('pairs', sum(length * (length - 1) if length <= window + 1 else
+                                           window * (window + 1) + 2 * window * (length - 1 - window)
+                                           for length in lengths))
+    else:
+        distinct_counts = [len(set(sentence)) for sentence in file_words]
+        instrumentation.count('pairs', sum(count * (count - 1) for count in distinct_counts))
+    instrumentation.count('entries', sum(map(len, semantic_descriptors.values())))
+
+
+def get_file_semantic_descriptors(filename, cache=None, instrumentation=None, window=None, weighting=None,
+                                  max_sentence_length=None):
+    """ (str, DescriptorCache, Instrumentation, int, str, int) -> dict
+    
+    The function takes a file name as input and returns the dictionary
+    of semantic descriptors of all the words in the file.
+    If a cache is given, the descriptors are loaded from it when the file's
+    content was already processed with the same settings, and are stored
+    in it otherwise.
+    If no Instrumentation is given, the words of the file are streamed into the
+    descriptors with get_file_word_breakdown, so that memory depends on the
+    vocabulary but not on the size of the file. The descriptors are then stored
+    under the key of the bytes they were built from, hashed as they are
+    streamed, so the key matches them even if the file changed after it was
+    looked up.
+    If an Instrumentation is given, the file is read whole so that the time taken
+    to read, tokenize, count and cache it is added to it, along with its counters.
+    window, weighting and max_sentence_length are the context options of
+    get_text_semantic_descriptors.
+    """
+    # in case the stages are not timed, stream the file
+    if instrumentation is None:
+        if cache is None:
+            return get_text_semantic_descriptors(get_file_word_breakdown(filename), window, weighting,
+                                                 max_sentence_length)
+        
+        # hash the file to look its descriptors up in the cache
+        settings = get_descriptor_settings(window, weighting, max_sentence_length)
+        sem_desc = cache.get(get_file_cache_key(filename, settings))
+        if sem_desc is not None:
+            return sem_desc
+        
+        # otherwise, hash the bytes again as they are streamed, and store the descriptors under their key
+        digest = get_settings_digest(settings)
+        sem_desc = get_text_semantic_descriptors(get_file_word_breakdown(filename, digest=digest), window, weighting,
+                                                 max_sentence_length)
+        cache.put(digest.hexdigest(), sem_desc)
+        return sem_desc
+    
+    # in case no cache is used
+    if cache is None:
+        # open file
+        with get_stage(instrumentation, 'read'):
+            fobj = open(filename, "r", encoding="utf-8")
+            file_content = fobj.read()
+            fobj.close()
+        
+        # separate the text into words and get their semantic descriptor vectors
+        with get_stage(instrumentation, 'tokenize'):
+            file_words = get_word_breakdown_fast(file_content)
+        with get_stage(instrumentation, 'count'):
+            sem_desc = get_text_semantic_descriptors(file_words, window, weighting, max_sentence_length)
+        instrumentation.count('bytes_read', os.path.getsize(filename))
+        record_file_counters(instrumentation, file_words, sem_desc, window, max_sentence_length)
+        return sem_desc
+    
+    # read the raw content of the file to compute its cache key
+    with get_stage(instrumentation, 'read'):
+        fobj = open(filename, "rb")
+        raw_content = fobj.read()
+        fobj.close()
+    instrumentation.count('bytes_read', len(raw_content))
+    with get_stage(instrumentation, 'cache'):
+        key = get_cache_key(raw_content, get_descriptor_settings(window, weighting, max_sentence_length))
+        sem_desc = cache.get(key)
+    
+    # in case the file was already processed
+    if sem_desc is not None:
+        instrumentation.count('cache_hits')
+        return sem_desc
+    
+    # otherwise, process the file and store its descriptors
+    with get_stage(instrumentation, 'tokenize'):
+        file_words = get_word_breakdown_fast(decode_file_content(raw_content))
+    with get_stage(instrumentation, 'count'):
+        sem_desc = get_text_semantic_descriptors(file_words, window, weighting, max_sentence_length)
+    with get_stage(instrumentation, 'cache'):
+        cache.put(key, sem_desc)
+    instrumentation.count('cache_misses')
+    record_file_counters(instrumentation, file_words, sem_desc, window, max_sentence_length)
+    return sem_desc
+
+
+def build_semantic_descriptors_streaming(files, chunk_size=1 << 20):
+    """ (list, int) -> dict
+    
+    The function takes a list of file names as input.
+    It returns the same dictionary of semantic descriptors as
+    build_semantic_descriptors_from_files, but streams the words of the files
+    into the descriptors chunk_size characters at a time, so that memory
+    depends on the size of the chunks and of the vocabulary but not of the files.
+    """
+    # chain the sentences of every file
+    def get_all_sentences():
+        for filename in files:
+            yield from get_file_word_breakdown(filename, chunk_size)
+    
+    # add the words of each sentence to the descriptors as they are read
+    return get_all_semantic_descriptors_fast(get_all_sentences())
+
+
+def get_sentence_aligned_ranges(filename, chunk_bytes):
+    """ (str, int) -> list
+    
+    The function takes as input the name of a file and a number of bytes.
+    It splits the file into ranges of about chunk_bytes bytes and returns
+    a list of (start, end) byte positions. Every range but the last one ends
+    right after a '.', '!' or '?', so that get_sentences gives the same
+    sentences for the ranges as for the whole file.
+    
+    >>> import tempfile
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'text.txt')
+    >>> fobj = open(filename, 'wb')
+    >>> _ = fobj.write(b'One two. Three four five! Six? Seven')
+    >>> fobj.close()
+    >>> get_sentence_aligned_ranges(filename, 4)
+    [(0, 8), (8, 25), (25, 30), (30, 36)]
+    >>> get_sentence_aligned_ranges(filename, 100)
+    [(0, 36)]
+    """
+    # initialize variables
+    size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+    
+    fobj = open(filename, "rb")
+    while start < size:
+        # in case the rest of the file fits in one range
+        end = start + chunk_bytes
+        if end >= size:
+            end = size
+        
+        # otherwise, end the range after the next sentence punctuation
+        # (these bytes never occur inside a multi-byte UTF-8 character)
+        else:
+            fobj.seek(end)
+            found = False
+            while not found:
+                block = fobj.read(1 << 16)
+                if block == b"":
+                    end = size
+                    break
+                for index in range(len(block)):
+                    if block[index] in b".!?":
+                        end += index + 1
+                        found = True
+                        break
+                else:
+                    end += len(block)
+        
+        ranges.append((start, end))
+        start = end
+    fobj.close()
+    
+    # return the list of ranges
+    return ranges
+
+
+def get_range_digests(filename, ranges, settings):
+    """ (str, list, dict) -> tuple
+    
+    The function takes as input the name of a file, the (start, end) ranges
+    of get_sentence_aligned_ranges and the settings of the descriptors.
+    It reads the file once and returns a tuple (key, digests) where key is the
+    cache key of its content and digests holds the SHA-256 digest of each range.
+    
+    >>> import tempfile
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'text.txt')
+    >>> fobj = open(filename, 'wb')
+    >>> _ = fobj.write(b'One two. Three.')
+    >>> fobj.close()
+    >>> key, digests = get_range_digests(filename, [(0, 8), (8, 15)], {})
+    >>> key == get_file_cache_key(filename, {}), digests[1] == hashlib.sha256(b' Three.').hexdigest()
+    (True, True)
+    """
+    file_digest = get_settings_digest(settings)
+    digests = []
+    fobj = open(filename, "rb")
+    try:
+        for start, end in ranges:
+            raw_content = fobj.read(end - start)
+            file_digest.update(raw_content)
+            digests.append(hashlib.sha256(raw_content).hexdigest())
+    finally:
+        fobj.close()
+    return file_digest.hexdigest(), digests
+
+
+def read_range_context(fobj, start, end):
+    """ (file, int, int) -> tuple
+    
+    The function takes as input a binary file and the byte positions of a range.
+    It returns a tuple (before, after) of the text of the SIGMA_CONTEXT characters,
+    at most, before and after the range, with the characters cut by the ends
+    of the bytes read left out.
+    """
+    size = 4 * SIGMA_CONTEXT + 3
+    fobj.seek(max(0, start - size))
+    before = decode_file_content(fobj.read(start - max(0, start - size)).decode("utf-8", "ignore").encode("utf-8"))
+    fobj.seek(end)
+    after = decode_file_content(fobj.read(size).decode("utf-8", "ignore").encode("utf-8"))
+    return before[-SIGMA_CONTEXT:], after[:SIGMA_CONTEXT]
+
+
+def get_range_semantic_descriptors(task):
+    """ (tuple) -> tuple
+    
+    The function takes as input a tuple (filename, start, end, window,
+    weighting, max_sentence_length, digest, count).
+    It returns a tuple (semantic descriptors, counters): the dictionary of
+    semantic descriptors of the words between the byte positions start and
+    end of the file, built with the context options of
+    get_text_semantic_descriptors, and the counters record_file_counters adds
+    for the range, with its number of bytes, if count is True (an empty
+    dictionary otherwise). The vector entries are left to whoever merges the ranges.
+    The range is lowercased with the text around it, as it would be in the
+    whole file. It raises a ValueError if digest is given and is not the
+    SHA-256 digest of the bytes of the range, which means the file changed.
+    It is run by the worker processes of a parallel build.
+    
+    >>> import tempfile
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'text.txt')
+    >>> fobj = open(filename, 'w', encoding='utf-8')
+    >>> _ = fobj.write("The \u0391.\u03a3 cat. \u03a3 sat.")
+    >>> fobj.close()
+    >>> ranges = get_sentence_aligned_ranges(filename, 1)
+    >>> parts = [get_range_semantic_descriptors((filename, start, end, None, None, None, None, True))
+    ...          for start, end in ranges]
+    >>> merge_many_dicts_of_vectors([sem_desc for sem_desc, counters in parts]) == \
+    build_semantic_descriptors_from_files([filename])
+    True
+    >>> parts[1][1]
+    {'bytes_read': 7, 'sentences': 1, 'tokens': 2, 'pairs': 2, 'entries': 0}
+    >>> get_range_semantic_descriptors((filename, 0, 5, None, None, None, '0123', False))
+    Traceback (most recent call last):
+    ValueError: file changed while it was processed: 'text.txt'
+    """
+    filename, start, end, window, weighting, max_sentence_length, digest, count = task
+    
+    # read the range and the text around it
+    fobj = open(filename, "rb")
+    try:
+        fobj.seek(start)
+        raw_content = fobj.read(end - start)
+        if digest is not None and hashlib.sha256(raw_content).hexdigest() != digest:
+            raise ValueError("file changed while it was processed: %r" % (os.path.basename(filename),))
+        text = decode_file_content(raw_content)
+        if "\u03a3" in text:
+            before, after = read_range_context(fobj, start, end)
+            text = get_lowercase_in_context(text, before, after)
+    finally:
+        fobj.close()
+    
+    # separate the text into words and get their semantic descriptor vectors
+    file_words = get_word_breakdown_fast(text)
+    sem_desc = get_text_semantic_descriptors(file_words, window, weighting, max_sentence_length)
+    
+    # count the work done on the range
+    counters = {}
+    if count:
+        instrumentation = Instrumentation()
+        instrumentation.count('bytes_read', len(raw_content))
+        record_file_counters(instrumentation, file_words, {}, window, max_sentence_length)
+        counters = instrumentation.counters
+    return sem_desc, counters
+
+
+def get_ranges_semantic_descriptors(tasks):
+    """ (list) -> tuple
+    
+    The function takes as input a list of tasks of get_range_semantic_descriptors.
+    It returns a tuple (semantic descriptors, counters) holding the merged
+    dictionary of semantic descriptors of all their ranges and the sums of
+    their counters, so that a worker process of a parallel build sends back
+    a single dictionary.
+    """
+    results = [get_range_semantic_descriptors(task) for task in tasks]
+    counters = {}
+    for sem_desc, range_counters in results:
+        for name, amount in range_counters.items():
+            counters[name] = counters.get(name, 0) + amount
+    return merge_many_dicts_of_vectors([sem_desc for sem_desc, range_counters in results], consume=True), counters
+
+
+def build_semantic_descriptors_in_parallel(files, workers, cache=None, chunk_bytes=1 << 24, window=None,
+                                           weighting=None, max_sentence_length=None, reduction='linear',
+                                           instrumentation=None):
+    """ (list, int, DescriptorCache, int, int, str, int, str, Instrumentation) -> dict
+    
+    The function takes a list of file names and a number of worker processes.
+    It returns the same dictionary of semantic descriptors as
+    build_semantic_descriptors_from_files, but splits the files into
+    sentence-aligned ranges of about chunk_bytes bytes and builds the
+    descriptors of the ranges in a pool of worker processes.
+    If a DescriptorCache is given, only the files missing from it are processed.
+    A file listed more than once is processed, and stored in the cache, once,
+    but its descriptors are counted once per occurrence, as they are by
+    build_semantic_descriptors_from_files.
+    window, weighting and max_sentence_length are the context options of
+    get_text_semantic_descriptors.
+    With the 'linear' reduction, each range is a task whose descriptors are sent
+    back and merged by this process. With the 'tree' reduction, the ranges of
+    each file are split into at most workers groups of consecutive ranges, and
+    each worker merges the descriptors of a group before sending them back,
+    so that this process merges and unpickles fewer, overlapping results.
+    The partial results of each file are merged with merge_many_dicts_of_vectors,
+    consuming them, since they belong to this function only.
+    If a cache is given, the workers check that the bytes of their ranges are
+    the ones the cache key of the file was computed from.
+    If an Instrumentation is given, the counters of the ranges are sent back by
+    the workers and added to it, with the cache hits and misses and the vector
+    entries of each file, and its progress callback is called after each task
+    ('ranges') and each file ('files').
+    It raises a ValueError if the reduction is unknown, or if a file changes
+    while it is processed with a cache.
+    
+    >>> import tempfile
+    >>> from descriptor_cache import DescriptorCache
+    >>> directory = tempfile.mkdtemp()
+    >>> filename = os.path.join(directory, 'cats.txt')
+    >>> with open(filename, 'w') as fobj:
+    ...     _ = fobj.write("The cat sat. A cat ran.")
+    >>> cache = DescriptorCache(os.path.join(directory, 'cache'))
+    >>> d = build_semantic_descriptors_in_parallel([filename, filename], 2, cache)
+    >>> d['cat'] == {'the': 2, 'sat': 2, 'a': 2, 'ran': 2}
+    True
+    >>> build_semantic_descriptors_in_parallel([filename, filename], 2, cache) == d
+    True
+    >>> len(cache.get_entries())
+    1
+    >>> from instrumentation import Instrumentation
+    >>> instrumentation = Instrumentation(progress=print)
+    >>> build_semantic_descriptors_in_parallel([filename], 2, chunk_bytes=8, instrumentation=instrumentation) == \
+    build_semantic_descriptors_from_files([filename])
+    ranges 1 2
+    ranges 2 2
+    files 1 1
+    True
+    >>> instrumentation.counters
+    {'bytes_read': 23, 'sentences': 2, 'tokens': 6, 'pairs': 12, 'entries': 12}
+    """
+    if reduction not in ('linear', 'tree'):
+        raise ValueError("unknown reduction: %r" % (reduction,))
+    
+    # find the files which need to be processed and split them into ranges,
+    # processing a file listed more than once only once
+    settings = get_descriptor_settings(window, weighting, max_sentence_length)
+    file_descs = {}
+    file_keys = {}
+    num_of_tasks = {}
+    tasks = []
+    for filename in files:
+        if filename in file_keys:
+            continue
+        file_keys[filename] = get_file_cache_key(filename, settings) if cache is not None else None
+        if cache is not None:
+            sem_desc = cache.get(file_keys[filename])
+            if instrumentation is not None:
+                instrumentation.count('cache_hits' if sem_desc is not None else 'cache_misses')
+            if sem_desc is not None:
+                file_descs[filename] = sem_desc
+                continue
+        
+        # split the file, keeping the digest of each range when the descriptors are cached,
+        # so that they are stored under the key of the bytes the workers read
+        ranges = get_sentence_aligned_ranges(filename, chunk_bytes)
+        digests = [None] * len(ranges)
+        if cache is not None:
+            file_keys[filename], digests = get_range_digests(filename, ranges, settings)
+        ranges = [(filename, start, end, window, weighting, max_sentence_length, digest, instrumentation is not None)
+                  for (start, end), digest in zip(ranges, digests)]
+        
+        # group the ranges of the file, one group per range unless they are reduced in a tree
+        num_of_groups = min(workers, len(ranges)) if reduction == 'tree' else len(ranges)
+        for index in range(num_of_groups):
+            tasks.append(ranges[len(ranges) * index // num_of_groups : len(ranges) * (index + 1) // num_of_groups])
+        num_of_tasks[filename] = num_of_groups
+    
+    # initialize variables
+    all_semantic_descriptors = {}
+    occurrences_left = {}
+    for filename in files:
+        occurrences_left[filename] = occurrences_left.get(filename, 0) + 1
+    
+    # process the ranges in the pool and merge the results in order
+    # (multiprocessing is only imported when it is needed, as it is slow to import)
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        results = executor.map(get_ranges_semantic_descriptors, tasks)
+        tasks_done = 0
+        for index, filename in enumerate(files):
+            # in case the file was not processed yet, merge its ranges, which come
+            # in the order of the first occurrences of the files
+            if filename not in file_descs:
+                partial_descs = []
+                for task_index in range(num_of_tasks[filename]):
+                    sem_desc, counters = next(results)
+                    partial_descs.append(sem_desc)
+                    tasks_done += 1
+                    if instrumentation is not None:
+                        for name, amount in counters.items():
+                            instrumentation.count(name, amount)
+                        instrumentation.report_progress('ranges', tasks_done, len(tasks))
+                file_descs[filename] = merge_many_dicts_of_vectors(partial_descs, consume=True)
+                if instrumentation is not None:
+                    instrumentation.count('entries', sum(map(len, file_descs[filename].values())))
+                
+                # store the descriptors of the file before they are merged
+                if cache is not None:
+                    cache.put(file_keys[filename], file_descs[filename])
+            
+            # merge the descriptors of the file, moving its vectors at its last occurrence
+            occurrences_left[filename] -= 1
+            if occurrences_left[filename] == 0:
+                merge_dicts_of_vectors(all_semantic_descriptors, file_descs.pop(filename), consume=True)
+            else:
+                merge_dicts_of_vectors(all_semantic_descriptors, file_descs[filename])
+            if instrumentation is not None:
+                instrumentation.report_progress('files', index + 1, len(files))
+    finally:
+        executor.shutdown(cancel_futures=True)
+    
+    # return the dictionary
+    return all_semantic_descriptors
+
+
+def prune_semantic_descriptors(semantic_descriptors, min_count=1, max_features=None, stopwords=None,
+                               max_contexts=None):
+    """ (dict, int, int, iterable, int) -> NoneType
+    
+    The function takes as input a dictionary of semantic descriptor vectors
+    and removes the entries which matter least, to bound its memory:
+    - stopwords are never used as context words (their own vectors are kept);
+    - words whose count is less than min_count are removed, both as words
+      and as context words;
+    - only the max_features context words with the largest counts are kept;
+    - only the max_contexts largest components of each vector are kept.
+    Stopwords are removed first. The count of a word is then the sum of its
+    vector, which is the number of times it was seen in a sentence with
+    another word. Vectors are symmetric (d[w][c] == d[c][w]), so it is also
+    its total count as a context word. Ties are broken by keeping the words
+    seen first.
+    It modifies the input dictionary, replacing the pruned vectors by smaller copies.
+    
+    >>> d = get_all_semantic_descriptors_fast([['the', 'cat', 'sat'], ['the', 'cat', 'ran'], ['the', 'dog']])
+    >>> prune_semantic_descriptors(d, min_count=3)
+    >>> d == {'the': {'cat': 2}, 'cat': {'the': 2}}
+    True
+    
+    >>> d = get_all_semantic_descriptors_fast([['the', 'cat', 'sat'], ['the', 'cat', 'ran'], ['the', 'dog']])
+    >>> prune_semantic_descriptors(d, stopwords=['the'], max_features=2)
+    >>> d['the'], d['cat'], d['dog']
+    ({'cat': 2, 'sat': 1}, {'sat': 1}, {})
+    
+    >>> d = get_all_semantic_descriptors_fast([['the', 'cat', 'sat'], ['the', 'cat', 'ran'], ['the', 'dog']])
+    >>> prune_semantic_descriptors(d, max_contexts=1)
+    >>> d['the'], d['cat'], d['ran']
+    ({'cat': 2}, {'the': 2}, {'the': 1})
+    """
+    # never use the stopwords as context words
+    # (vectors are copied rather than modified, since dictionaries do not shrink)
+    if stopwords is not None:
+        stopwords = set(stopwords)
+        for word, vector in semantic_descriptors.items():
+            if not stopwords.isdisjoint(vector):
+                semantic_descriptors[word] = {context_word: count for context_word, count in vector.items()
+                                              if context_word not in stopwords}
+    
+    # compute the count of every word
+    counts = {}
+    for word, vector in semantic_descriptors.items():
+        counts[word] = sum(vector.values())
+    
+    # remove the rare words
+    if min_count > 1:
+        for word in [word for word, count in counts.items() if count < min_count]:
+            del semantic_descriptors[word]
+    
+    # determine the context words which are kept, None to keep all of them
+    kept_contexts = None
+    if max_features is not None or min_count > 1:
+        candidates = [word for word in counts if counts[word] >= min_count]
+        if stopwords is not None:
+            candidates = [word for word in candidates if word not in stopwords]
+        if max_features is not None:
+            positions = {word: position for position, word in enumerate(candidates)}
+            candidates = sorted(candidates, key=lambda word: (-counts[word], positions[word]))[:max_features]
+        kept_contexts = set(candidates)
+    
+    # remove the other components of every vector
+    for word, vector in semantic_descriptors.items():
+        if kept_contexts is not None and not kept_contexts.issuperset(vector):
+            vector = {context_word: count for context_word, count in vector.items()
+                      if context_word in kept_contexts}
+        
+        # keep the largest components, in their original order
+        if max_contexts is not None and len(vector) > max_contexts:
+            ranked = sorted(enumerate(vector.items()), key=lambda item: (-item[1][1], item[0]))
+            kept = set(context_word for position, (context_word, count) in ranked[:max_contexts])
+            vector = {context_word: count for context_word, count in vector.items() if context_word in kept}
+        semantic_descriptors[word] = vector
+
+
+def build_semantic_descriptors_from_files(files, cache=None, workers=1, record_norms=False,
+                                          record_normalized=False, min_count=1, max_features=None,
+                                          stopwords=None, max_contexts=None, instrumentation=None, window=None,
+                                          weighting=None, max_sentence_length=None, reduction='linear'):
+    """ (list, DescriptorCache, int, bool, bool, int, int, iterable, int, Instrumentation, int, str, int, str)
+    -> dict
     
     The function takes a list of file names as input.
     It returns a dictionary of semantic descriptors of
     all the words in the files received as input.
+    If a DescriptorCache is given, the descriptors of each file are
+    loaded from it when possible and only new or changed files are processed.
+    If workers is more than 1, the files are processed by that many
+    processes with build_semantic_descriptors_in_parallel, whose partial
+    results are merged following reduction ('linear' or 'tree').
+    If record_norms is True, every vector is returned as a NormedVector
+    recording its norm, which the similarity functions then reuse instead of
+    computing it for every question. If record_normalized is True, the
+    NormedVectors also record a normalized copy for get_norm_euc_sim.
+    min_count, max_features, stopwords and max_contexts prune the descriptors
+    as prune_semantic_descriptors does. Stopwords are also removed from the
+    descriptors of each file before they are merged, to lower the peak memory.
+    If an Instrumentation is given, the time taken by every stage of the build
+    is added to it along with its counters, and its progress callback is called
+    after each file. When the files are processed in parallel, the work of the
+    processes is timed as a single 'parallel_build' stage, and their counters
+    and progress are forwarded by build_semantic_descriptors_in_parallel.
+    By default, the context of a word is its whole sentence. If window is given,
+    it is the window words before and after it instead, weighted by their distance
+    if weighting is 'harmonic' or 'linear' (see get_all_semantic_descriptors_windowed).
+    If max_sentence_length is given, longer sentences are split into sentences
+    of at most that many words first.
     
     >>> d = build_semantic_descriptors_from_files(['animal_farm.txt'])
     >>> d['animal']['must']
@@ -179,26 +1081,49 @@ def build_semantic_descriptors_from_files(files):
     >>> len(d['all'])
     26
     """
-    # initialize variable
-    all_semantic_descriptors = {}
+    # in case the files should be processed in parallel
+    if workers > 1:
+        with get_stage(instrumentation, 'parallel_build'):
+            all_semantic_descriptors = build_semantic_descriptors_in_parallel(files, workers, cache, window=window,
+                                                                              weighting=weighting,
+                                                                              max_sentence_length=max_sentence_length,
+                                                                              reduction=reduction,
+                                                                              instrumentation=instrumentation)
     
-    # get the semantic descriptor vectors for each word of each file
-    for filename in files:
-        # open file
-        fobj = open(filename, "r", encoding="utf-8")
-        file_content= fobj.read()
-        
-        # separate the text into words
-        file_words = get_word_breakdown(file_content)
-        
-        # get the semantic descriptor vectors for those words
-        sem_desc = get_all_semantic_descriptors(file_words)
+    # otherwise, process them one after the other
+    else:
+        all_semantic_descriptors = {}
         
-        # merge the semantic descriptor with the ones from previous files
-        merge_dicts_of_vectors(all_semantic_descriptors, sem_desc)
-        
-        # close file
-        fobj.close()
+        # get the semantic descriptor vectors for each word of each file
+        for index, filename in enumerate(files):
+            sem_desc = get_file_semantic_descriptors(filename, cache, instrumentation, window, weighting,
+                                                     max_sentence_length)
+            if stopwords is not None:
+                with get_stage(instrumentation, 'prune'):
+                    prune_semantic_descriptors(sem_desc, stopwords=stopwords)
+            
+            # merge the semantic descriptor with the ones from previous files,
+            # moving its vectors since nothing else uses them
+            with get_stage(instrumentation, 'merge'):
+                merge_dicts_of_vectors(all_semantic_descriptors, sem_desc, consume=True)
+            if instrumentation is not None:
+                instrumentation.report_progress('files', index + 1, len(files))
+    
+    # prune the descriptors once the counts are complete
+    if min_count > 1 or max_features is not None or stopwords is not None or max_contexts is not None:
+        with get_stage(instrumentation, 'prune'):
+            prune_semantic_descriptors(all_semantic_descriptors, min_count, max_features, stopwords,
+                                       max_contexts)
+    
+    # record the norms once the vectors are complete
+    if record_norms or record_normalized:
+        with get_stage(instrumentation, 'record_norms'):
+            record_vector_norms(all_semantic_descriptors, record_normalized)
+    
+    # count the words and the entries of the final descriptors
+    if instrumentation is not None:
+        instrumentation.count('distinct_words', len(all_semantic_descriptors))
+        instrumentation.count('final_entries', sum(map(len, all_semantic_descriptors.values())))
     
     # return the dictionary
     return all_semantic_descriptors
@@ -0,0 +1,163 @@
+# synonym-finder
+
+# This module contains an optional recorder of where the time goes when
+# descriptors are built or a quiz is answered. An Instrumentation object can be
+# passed to build_semantic_descriptors_from_files and run_sim_test: it adds up
+# the wall time of each stage (reading, tokenizing, counting, merging...),
+# counters such as the number of bytes read or of tokens, and optionally the
+# peak memory allocated during each stage, measured with tracemalloc.
+# Functions given no Instrumentation only test for None once per file
+# or per question, so they run as fast as before.
+
+# IMPORT MODULES
+import contextlib
+import doctest
+import time
+import tracemalloc
+
+
+
+# DEFINE CLASSES
+class Instrumentation:
+    """ A record of the wall time, counters and peak memory of the stages of a run.
+
+    seconds and calls map each stage to its total number of seconds and to the
+    number of times it ran, counters map names to numbers, and peak_memory maps
+    each stage to the largest number of bytes allocated while it ran, if
+    trace_memory is True. If progress is given, it is called as
+    progress(unit, done, total) as the run goes, total being None when unknown.
+
+    >>> instrumentation = Instrumentation()
+    >>> for index in range(2):
+    ...     with instrumentation.stage('sleep'):
+    ...         time.sleep(0.01)
+    >>> instrumentation.count('naps', 2)
+    >>> instrumentation.calls, instrumentation.counters, instrumentation.seconds['sleep'] >= 0.02
+    ({'sleep': 2}, {'naps': 2}, True)
+
+    >>> instrumentation = Instrumentation(trace_memory=True, progress=print)
+    >>> with instrumentation.stage('allocate'):
+    ...     data = bytearray(1 << 20)
+    >>> instrumentation.peak_memory['allocate'] >= 1 << 20
+    True
+    >>> instrumentation.report_progress('files', 1, 3)
+    files 1 3
+    """
+
+    def __init__(self, trace_memory=False, progress=None):
+        """ (Instrumentation, bool, function) -> NoneType
+
+        The method creates an empty record.
+        """
+        self.trace_memory = trace_memory
+        self.progress = progress
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self.peak_memory = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ (Instrumentation, str) -> context manager
+
+        The method returns a context manager adding the time taken by its body
+        to the stage name. Stages should not be nested when memory is traced,
+        since each of them resets the peak of tracemalloc.
+        """
+        # start tracing the memory allocated from now on
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            start_memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # record the time, and the memory allocated at the peak of the stage
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - start_memory
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def count(self, name, amount=1):
+        """ (Instrumentation, str, int) -> NoneType
+
+        The method adds amount to the counter name.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report_progress(self, unit, done, total=None):
+        """ (Instrumentation, str, int, int) -> NoneType
+
+        The method calls the progress callback, if there is one, to report that
+        done of the total units were processed.
+        """
+        if self.progress is not None:
+            self.progress(unit, done, total)
+
+    def get_report(self):
+        """ (Instrumentation) -> dict
+
+        The method returns a dictionary holding the seconds, calls, counters and
+        peak memory of the run, which can be saved as JSON.
+
+        >>> instrumentation = Instrumentation()
+        >>> instrumentation.count('tokens', 5)
+        >>> instrumentation.get_report()
+        {'seconds': {}, 'calls': {}, 'counters': {'tokens': 5}, 'peak_memory': {}}
+        """
+        return {'seconds': dict(self.seconds), 'calls': dict(self.calls), 'counters': dict(self.counters),
+                'peak_memory': dict(self.peak_memory)}
+
+    def format_report(self):
+        """ (Instrumentation) -> str
+
+        The method returns the report as lines of text, one per stage
+        then one per counter.
+
+        >>> instrumentation = Instrumentation()
+        >>> instrumentation.seconds['read'] = 0.5
+        >>> instrumentation.calls['read'] = 2
+        >>> instrumentation.count('bytes_read', 1024)
+        >>> print(instrumentation.format_report())
+        read: 0.5000 s in 2 calls
+        bytes_read: 1024
+        """
+        lines = []
+        for name, seconds in self.seconds.items():
+            line = "%s: %.4f s in %d calls" % (name, seconds, self.calls[name])
+            if name in self.peak_memory:
+                line += ", peak %.1f MiB" % (self.peak_memory[name] / (1 << 20))
+            lines.append(line)
+        for name, count in self.counters.items():
+            lines.append("%s: %d" % (name, count))
+        return "\n".join(lines)
+
+
+
+# DEFINE FUNCTIONS
+def get_stage(instrumentation, name):
+    """ (Instrumentation, str) -> context manager
+
+    The function returns the context manager timing the stage name,
+    or one doing nothing if instrumentation is None.
+
+    >>> with get_stage(None, 'read'):
+    ...     pass
+    """
+    if instrumentation is None:
+        return contextlib.nullcontext()
+    return instrumentation.stage(name)
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
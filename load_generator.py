@@ -0,0 +1,102 @@
+# synonym-finder
+
+# This module sends the questions of a quiz file to a running synonym_server
+# from many concurrent connections, and reports the latency and throughput
+# seen by the clients along with the statistics of the server.
+#
+# Run it with: python load_generator.py test.txt --concurrency 32 --requests 5000
+
+# IMPORT MODULES
+import argparse
+import asyncio
+import doctest
+import itertools
+import json
+import time
+from batch_scoring import read_quiz
+from synonym_server import get_percentile, request_json
+
+
+
+# DEFINE FUNCTIONS
+async def open_connection(host, port, unix_path):
+    """ (str, int, str) -> tuple
+
+    The function opens a connection to the server, over the Unix socket
+    unix_path if it is given, and returns its (reader, writer) pair.
+    """
+    if unix_path is not None:
+        return await asyncio.open_unix_connection(unix_path)
+    return await asyncio.open_connection(host, port)
+
+
+async def run_client(queries, connection, latencies, errors):
+    """ (iterator, tuple, list, list) -> NoneType
+
+    The function sends queries one after the other on an open connection
+    until the shared iterator is exhausted, recording the latency of each answer
+    and the status of the failed ones.
+    """
+    reader, writer = connection
+    try:
+        for query in queries:
+            start = time.perf_counter()
+            status, response = await request_json(reader, writer, "POST", "/query", query)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def generate_load(questions, num_requests, concurrency, measure, host="127.0.0.1", port=8765,
+                        unix_path=None):
+    """ (list, int, int, str, str, int, str) -> dict
+
+    The function sends num_requests queries built from the (word, answer, choices)
+    questions, cycling through them, from concurrency connections at once.
+    It returns a dictionary with the throughput and latency percentiles seen by
+    the clients, the number of errors and the statistics of the server.
+    """
+    # build the queries, shared by all the clients
+    queries = ({'word': word, 'choices': choices, 'measure': measure}
+               for word, answer, choices in itertools.islice(itertools.cycle(questions), num_requests))
+
+    # send them from every connection at once
+    connections = [await open_connection(host, port, unix_path) for index in range(concurrency)]
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*[run_client(queries, connection, latencies, errors) for connection in connections])
+    seconds = time.perf_counter() - start
+
+    # ask the server for its own statistics
+    reader, writer = await open_connection(host, port, unix_path)
+    status, server_stats = await request_json(reader, writer, "GET", "/stats")
+    writer.close()
+
+    # return the results
+    latencies.sort()
+    return {'requests': len(latencies), 'errors': len(errors), 'seconds': seconds,
+            'requests_per_second': len(latencies) / seconds,
+            'latency_ms': {name: get_percentile(latencies, fraction) * 1000
+                           for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+            'server': server_stats}
+
+
+
+# RUN LOAD GENERATOR
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the questions of a quiz file to a synonym server.")
+    parser.add_argument("quiz", help="quiz file, one question per line")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--measure", default="cos", choices=["cos", "euc", "norm_euc"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to this Unix socket instead of TCP")
+    args = parser.parse_args()
+
+    results = asyncio.run(generate_load(read_quiz(args.quiz), args.requests, args.concurrency, args.measure,
+                                        args.host, args.port, args.unix))
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,324 @@
+# synonym-finder
+
+# This module contains an approximate index to find the words most similar
+# to a given word with the cosine similarity. Vectors are hashed with random
+# hyperplanes (locality-sensitive hashing): words with a small angle between
+# their vectors are likely to fall into the same bucket in at least one table.
+# The words found in the buckets are then ranked exactly with get_cos_sim.
+
+# IMPORT MODULES
+import doctest
+import hashlib
+import heapq
+import os
+import tempfile
+import time
+import numpy as np
+from similarity_measures import *
+from nearest_neighbours import top_k_similar_brute_force
+
+
+
+# DEFINE CONSTANTS
+# number of context words whose hyperplane coefficients are drawn together,
+# from a generator seeded with the seed of the index and the number of the block
+HYPERPLANE_BLOCK_ROWS = 1024
+
+
+
+# DEFINE CLASSES
+class CosineLSHIndex:
+    """ A random-hyperplane locality-sensitive hashing index over semantic descriptors.
+
+    Every table draws bits random hyperplanes; the signature of a vector in a table
+    is the side of each hyperplane it falls on. More bits give smaller buckets
+    (faster queries, fewer candidates), more tables give a better recall.
+    The index only stores the signatures, so it can be saved and loaded again
+    for the same semantic descriptors without hashing them again, along with a
+    fingerprint of the descriptors (see get_descriptors_fingerprint).
+
+    >>> d = {'cat': {'furry': 3, 'grumpy': 5, 'nimble': 4}, 'feline': {'furry': 2, 'nimble': 5}, \
+    'dog': {'furry': 3, 'bark': 5, 'loyal': 8}, 'horse': {'race': 4, 'queen': 2}, 'nothing': {}}
+    >>> index = CosineLSHIndex(d, bits=2, tables=8, seed=1)
+    >>> index.top_k_similar('feline', 2)[0][0]
+    'cat'
+    >>> [word for word, score in index.top_k_similar('feline', 2)] == \
+    [word for word, score in top_k_similar_exact('feline', 2, d)]
+    True
+    """
+
+    def __init__(self, semantic_descriptors, bits=16, tables=8, seed=0, keys=None, batch_floats=1 << 24):
+        """ (CosineLSHIndex, dict, int, int, int, ndarray, int) -> NoneType
+
+        The method hashes every vector of semantic_descriptors into tables tables
+        of bits bits each, using random hyperplanes drawn from seed.
+        If keys is given, it holds the signatures computed before
+        and the vectors are not hashed again. batch_floats bounds the memory
+        used to hash the vectors (see hash_vectors).
+        """
+        if not 1 <= bits <= 64:
+            raise ValueError("bits must be between 1 and 64")
+
+        self.semantic_descriptors = semantic_descriptors
+        self.bits = bits
+        self.tables = tables
+        self.seed = seed
+        self.words = list(semantic_descriptors)
+        self.positions = {word: position for position, word in enumerate(self.words)}
+
+        # compute the signature of every word in every table
+        if keys is None:
+            keys = self.hash_vectors(batch_floats)
+        self.keys = keys
+
+        # put every word in the bucket of its signature, in each table
+        self.buckets = []
+        for table in range(tables):
+            buckets = {}
+            for position, key in enumerate(keys[:, table].tolist()):
+                if key not in buckets:
+                    buckets[key] = []
+                buckets[key].append(position)
+            self.buckets.append(buckets)
+
+    def hash_vectors(self, batch_floats):
+        """ (CosineLSHIndex, int) -> ndarray
+
+        The method returns a matrix holding the signature of each word (rows)
+        in each table (columns). The vectors are projected on the hyperplanes a
+        few words at a time, and the coefficients of the hyperplanes are drawn
+        again for each block of HYPERPLANE_BLOCK_ROWS context words the words
+        use, so that only about batch_floats numbers are held in memory for the
+        projections, plus one block of coefficients, whatever the vocabulary.
+        """
+        # give an id to every context word
+        context_ids = {}
+        for vector in self.semantic_descriptors.values():
+            for context_word in vector:
+                if context_word not in context_ids:
+                    context_ids[context_word] = len(context_ids)
+
+        # one column per bit of each table
+        columns = self.bits * self.tables
+        powers = np.left_shift(np.uint64(1), np.arange(self.bits, dtype=np.uint64))
+        max_entries = max(1, batch_floats // columns)
+
+        keys = np.zeros((len(self.words), self.tables), dtype=np.uint64)
+        start = 0
+        while start < len(self.words):
+            # gather the vectors of the next words, up to max_entries entries and words
+            lengths = []
+            ids = []
+            counts = []
+            while (start + len(lengths) < len(self.words)) and \
+                    (len(lengths) == 0 or max(len(ids), len(lengths)) < max_entries):
+                vector = self.semantic_descriptors[self.words[start + len(lengths)]]
+                lengths.append(len(vector))
+                ids.extend([context_ids[context_word] for context_word in vector])
+                counts.extend(vector.values())
+            ids = np.array(ids, dtype=np.int64)
+            counts = np.array(counts, dtype=np.float32)
+            owners = np.repeat(np.arange(len(lengths)), lengths)
+
+            # project them on the hyperplanes, one block of context words at a time,
+            # keeping the entries of each block in the order of their words
+            projections = np.zeros((len(lengths), columns), dtype=np.float32)
+            blocks = ids // HYPERPLANE_BLOCK_ROWS
+            order = np.argsort(blocks, kind='stable')
+            block_starts = np.flatnonzero(np.concatenate(([True], blocks[order][1:] != blocks[order][:-1])))
+            block_starts = block_starts[:len(ids)]
+            for block_start, block_end in zip(block_starts.tolist(), block_starts[1:].tolist() + [len(ids)]):
+                entries = order[block_start:block_end]
+                block = int(blocks[entries[0]])
+                generator = np.random.default_rng([self.seed, block])
+                hyperplanes = generator.standard_normal((HYPERPLANE_BLOCK_ROWS, columns), dtype=np.float32)
+                products = hyperplanes[ids[entries] - block * HYPERPLANE_BLOCK_ROWS]
+                products *= counts[entries][:, None]
+                block_owners = owners[entries]
+                firsts = np.flatnonzero(np.concatenate(([True], block_owners[1:] != block_owners[:-1])))
+                projections[block_owners[firsts]] += np.add.reduceat(products, firsts, axis=0)
+
+            # turn the sides of the hyperplanes into one number per table
+            sides = (projections > 0).reshape(len(lengths), self.tables, self.bits).astype(np.uint64)
+            keys[start : start + len(lengths)] = (sides * powers).sum(axis=2, dtype=np.uint64)
+            start += len(lengths)
+
+        # return the signatures
+        return keys
+
+    def get_candidates(self, word):
+        """ (CosineLSHIndex, str) -> list
+
+        The method returns the positions of the other words which share
+        a bucket with word in at least one table, in increasing order.
+        It raises a KeyError if word is not in the index.
+        """
+        position = self.positions[word]
+        candidates = set()
+        for table in range(self.tables):
+            candidates.update(self.buckets[table][self.keys[position, table].item()])
+        candidates.discard(position)
+        return sorted(candidates)
+
+    def top_k_similar(self, word, k):
+        """ (CosineLSHIndex, str, int) -> list
+
+        The method returns a list of (word, similarity) pairs for at most k words
+        among the candidates of word, ranked with get_cos_sim, most similar first.
+        Words with the same similarity are ordered as in the semantic descriptors,
+        and words whose similarity cannot be computed are left out.
+        """
+        target_vector = self.semantic_descriptors[word]
+
+        # rank the candidates exactly
+        scores = []
+        for position in self.get_candidates(word):
+            other_word = self.words[position]
+            try:
+                scores.append((-get_cos_sim(target_vector, self.semantic_descriptors[other_word]),
+                               position, other_word))
+            # in case the similarity cannot be computed
+            except ZeroDivisionError:
+                continue
+
+        # keep the k best scores
+        return [(other_word, -score) for score, position, other_word in heapq.nsmallest(k, scores)]
+
+    def save(self, filename):
+        """ (CosineLSHIndex, str) -> NoneType
+
+        The method saves the settings, the vocabulary, the fingerprint of the
+        semantic descriptors and the signatures of the index into a NumPy .npz
+        file, which load_lsh_index can read.
+        """
+        np.savez(filename, settings=np.array([self.bits, self.tables, self.seed]),
+                 words=np.array(self.words, dtype=str),
+                 fingerprint=np.array(get_descriptors_fingerprint(self.semantic_descriptors)), keys=self.keys)
+
+
+
+# DEFINE FUNCTIONS
+def get_descriptors_fingerprint(semantic_descriptors):
+    """ (dict) -> str
+
+    The function returns a hash of the words of semantic_descriptors and of
+    their vectors, which changes whenever a count changes. It goes through
+    the descriptors once, which takes much less time than hashing their vectors.
+
+    >>> d = {'a': {'x': 2}, 'b': {'x': 3, 'y': 1}}
+    >>> get_descriptors_fingerprint(d) == get_descriptors_fingerprint({'a': {'x': 2}, 'b': {'x': 3, 'y': 1}})
+    True
+    >>> get_descriptors_fingerprint(d) == get_descriptors_fingerprint({'a': {'x': 2}, 'b': {'x': 3, 'y': 2}})
+    False
+    """
+    digest = hashlib.sha256()
+    for word, vector in semantic_descriptors.items():
+        digest.update(repr((word, vector)).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_lsh_index(filename, semantic_descriptors):
+    """ (str, dict) -> CosineLSHIndex
+
+    The function loads an index saved with CosineLSHIndex.save for the
+    given semantic descriptors, without hashing the vectors again.
+    It raises a ValueError if the descriptors do not have the same words
+    and vectors as the ones the index was built from, as their fingerprints tell.
+
+    >>> d = {'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 5}}
+    >>> index = CosineLSHIndex(d, bits=4, tables=2)
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'index.npz')
+    >>> index.save(filename)
+    >>> loaded = load_lsh_index(filename, d)
+    >>> loaded.top_k_similar('a', 2) == index.top_k_similar('a', 2)
+    True
+    >>> load_lsh_index(filename, {'a': {'x': 2}})
+    Traceback (most recent call last):
+    ValueError: the index was built for other semantic descriptors
+    >>> load_lsh_index(filename, {'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 4}})
+    Traceback (most recent call last):
+    ValueError: the index was built for other semantic descriptors
+    """
+    archive = np.load(filename)
+    try:
+        bits, tables, seed = archive['settings'].tolist()
+        words = archive['words'].tolist()
+        fingerprint = archive['fingerprint'].item() if 'fingerprint' in archive.files else None
+        keys = archive['keys']
+    finally:
+        archive.close()
+
+    # make sure the index belongs to the descriptors
+    if words != list(semantic_descriptors) or fingerprint != get_descriptors_fingerprint(semantic_descriptors):
+        raise ValueError("the index was built for other semantic descriptors")
+
+    return CosineLSHIndex(semantic_descriptors, bits, tables, seed, keys)
+
+
+def top_k_similar_exact(word, k, semantic_descriptors):
+    """ (str, int, dict) -> list
+
+    The function returns a list of (word, similarity) pairs for the k words most
+    similar to word with get_cos_sim, computing the similarity with every word
+    with top_k_similar_brute_force.
+    Words with the same similarity are ordered as in semantic_descriptors,
+    and words whose similarity cannot be computed are left out.
+
+    >>> top_k_similar_exact('a', 5, {'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 5}, 'd': {}})
+    [('b', 0.9486832980505138), ('c', 0.0)]
+    """
+    return top_k_similar_brute_force(word, k, semantic_descriptors, get_cos_sim)
+
+
+def measure_recall(index, words, k, exact_fn=None):
+    """ (CosineLSHIndex, list, int, function) -> dict
+
+    The function takes an index, a list of query words and a number k.
+    It returns a dictionary with the average recall@k of the index against the
+    exact search (the fraction of the exact k most similar words which the index
+    also returns), the average number of candidates, and the average number of
+    seconds per query of both searches.
+    exact_fn(word, k) gives the exact search, top_k_similar_exact by default.
+
+    >>> d = {'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 5}}
+    >>> results = measure_recall(CosineLSHIndex(d, bits=1, tables=1), ['a', 'b', 'c'], 1)
+    >>> 0 <= results['recall'] <= 1
+    True
+    """
+    if exact_fn is None:
+        exact_fn = lambda word, k: top_k_similar_exact(word, k, index.semantic_descriptors)
+
+    # initialize variables
+    recall = 0
+    candidates = 0
+    approximate_seconds = 0
+    exact_seconds = 0
+
+    for word in words:
+        # time both searches
+        start = time.perf_counter()
+        found = index.top_k_similar(word, k)
+        approximate_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        expected = exact_fn(word, k)
+        exact_seconds += time.perf_counter() - start
+
+        # count the exact neighbours found by the index
+        found_words = set(pair[0] for pair in found)
+        if len(expected) > 0:
+            recall += sum(pair[0] in found_words for pair in expected) / len(expected)
+        else:
+            recall += 1
+        candidates += len(index.get_candidates(word))
+
+    # return the averages
+    return {'recall': recall / len(words), 'candidates': candidates / len(words),
+            'approximate_seconds': approximate_seconds / len(words),
+            'exact_seconds': exact_seconds / len(words)}
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
@@ -0,0 +1,206 @@
+# synonym-finder
+
+# This module contains functions to find the words most similar to a given word
+# across the whole vocabulary, instead of among a list of choices.
+
+# IMPORT MODULES
+import doctest
+import heapq
+import math
+from similarity_measures import *
+
+
+
+# DEFINE CLASSES
+class ContextIndex:
+    """ An inverted index mapping each context word to the words whose
+    semantic descriptor vectors contain it, with their counts.
+
+    Dot products with a word are computed by going through the postings of its
+    context words only, so only the words sharing a context with it are visited.
+    The similarity of every other word only depends on its norm, so the best of
+    them are found from the norms without computing anything else.
+
+    >>> s = [['all', 'the', 'habits', 'of', 'man', 'are', 'evil'], \
+    ['and', 'above', 'all', 'no', 'animal', 'must', 'ever', 'tyrannise', 'over', 'his', 'own', 'kind'], \
+    ['weak', 'or', 'strong', 'clever', 'or', 'simple', 'we', 'are', 'all', 'brothers'], \
+    ['no', 'animal', 'must', 'ever', 'kill', 'any', 'other', 'animal'], \
+    ['all', 'animals', 'are', 'equal']]
+    >>> d = get_all_semantic_descriptors(s)
+    >>> index = ContextIndex(d)
+    >>> [word for word, score in index.top_k_similar('animal', 3, get_cos_sim)]
+    ['no', 'must', 'ever']
+    >>> for fn in (get_cos_sim, get_euc_sim, get_norm_euc_sim):
+    ...     fast = index.top_k_similar('weak', 5, fn)
+    ...     slow = top_k_similar_brute_force('weak', 5, d, fn)
+    ...     print([w for w, s in fast] == [w for w, s in slow], \
+    [round(s, 10) for w, s in fast] == [round(s, 10) for w, s in slow])
+    True True
+    True True
+    True True
+    """
+
+    def __init__(self, semantic_descriptors):
+        """ (ContextIndex, dict) -> NoneType
+
+        The method builds the index of a dictionary of semantic descriptors.
+        The descriptors must not be modified while the index is used.
+        """
+        self.semantic_descriptors = semantic_descriptors
+
+        # initialize variables
+        self.positions = {}
+        self.squares = {}
+        self.postings = {}
+        self.zero_words = []
+
+        # add every vector to the postings of its context words
+        for word, vector in semantic_descriptors.items():
+            self.positions[word] = len(self.positions)
+            square = 0
+            for context_word, count in vector.items():
+                square += count * count
+                if context_word not in self.postings:
+                    self.postings[context_word] = []
+                self.postings[context_word].append((word, count))
+            self.squares[word] = square
+            if square == 0:
+                self.zero_words.append(word)
+
+        # order the words by the square of their norm
+        self.words_by_square = sorted(self.positions, key=lambda word: (self.squares[word], self.positions[word]))
+
+    def get_dot_products(self, word):
+        """ (ContextIndex, str) -> dict
+
+        The method returns a dictionary mapping every other word which shares
+        a context word with word to the dot product of their vectors.
+        It raises a KeyError if word has no semantic descriptor.
+
+        >>> index = ContextIndex({'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 5}})
+        >>> index.get_dot_products('a')
+        {'b': 6}
+        """
+        # add the products of the counts of each shared context word
+        dot_products = {}
+        for context_word, count in self.semantic_descriptors[word].items():
+            for other_word, other_count in self.postings.get(context_word, ()):
+                dot_products[other_word] = dot_products.get(other_word, 0) + count * other_count
+
+        # the word itself is not one of its neighbours
+        dot_products.pop(word, None)
+        return dot_products
+
+    def get_first_words(self, words, k, excluded):
+        """ (ContextIndex, iterable, int, dict) -> list
+
+        The method returns the first k words of words which are not in excluded.
+        """
+        first_words = []
+        for word in words:
+            if len(first_words) == k:
+                break
+            if word not in excluded:
+                first_words.append(word)
+        return first_words
+
+    def top_k_similar(self, word, k, similarity_fn=get_cos_sim):
+        """ (ContextIndex, str, int, function) -> list
+
+        The method returns a list of (word, similarity) pairs for the k words
+        most similar to word according to similarity_fn, most similar first.
+        Words with the same similarity are ordered as in the semantic descriptors,
+        and words whose similarity cannot be computed are left out.
+        get_cos_sim, get_euc_sim and get_norm_euc_sim use the index; any other
+        similarity function is evaluated on every word with top_k_similar_brute_force.
+        As in get_fused_sims, the normalized euclidean similarity is derived from
+        the cosine similarity, so it can differ from get_norm_euc_sim in the last
+        digits and near ties can be ordered differently.
+        It raises a KeyError if word has no semantic descriptor.
+
+        >>> index = ContextIndex({'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 5}, 'd': {}})
+        >>> index.top_k_similar('a', 2)
+        [('b', 0.9486832980505138), ('c', 0.0)]
+        >>> index.top_k_similar('a', 5, get_euc_sim)
+        [('b', -1.4142135623730951), ('d', -2.0), ('c', -5.385164807134504)]
+        >>> index.top_k_similar('a', 5, get_norm_euc_sim)[-1]
+        ('c', -1.4142135623730951)
+        """
+        dot_products = self.get_dot_products(word)
+        target_square = self.squares[word]
+        target_norm = math.sqrt(target_square)
+        excluded = dict(dot_products)
+        excluded[word] = None
+
+        # in case the similarity function cannot use the index
+        if (similarity_fn not in FUSED_SIMILARITY_FNS) or (target_norm == 0):
+            return top_k_similar_brute_force(word, k, self.semantic_descriptors, similarity_fn)
+
+        # score the words sharing a context word with word,
+        # then the best of the others, whose score only depends on their norm
+        scores = {}
+        if similarity_fn is get_euc_sim:
+            for other_word, dot_product in dot_products.items():
+                square = target_square + self.squares[other_word] - 2 * dot_product
+                scores[other_word] = -math.sqrt(max(square, 0))
+            for other_word in self.get_first_words(self.words_by_square, k, excluded):
+                scores[other_word] = -math.sqrt(target_square + self.squares[other_word])
+        else:
+            for other_word, dot_product in dot_products.items():
+                cos_sim = dot_product / (target_norm * math.sqrt(self.squares[other_word]))
+                if similarity_fn is get_cos_sim:
+                    scores[other_word] = cos_sim
+                else:
+                    scores[other_word] = -math.sqrt(max(2 - 2 * cos_sim, 0))
+
+            # words sharing no context word are orthogonal to word,
+            # and zero vectors stay zero once normalized
+            excluded.update(dict.fromkeys(self.zero_words))
+            for other_word in self.get_first_words(self.positions, k, excluded):
+                scores[other_word] = 0.0 if similarity_fn is get_cos_sim else -math.sqrt(2)
+            if similarity_fn is get_norm_euc_sim:
+                for other_word in self.zero_words[:k + 1]:
+                    if other_word != word:
+                        scores[other_word] = -1.0
+
+        # keep the k best scores
+        best_words = heapq.nsmallest(k, scores, key=lambda other_word: (-scores[other_word],
+                                                                        self.positions[other_word]))
+        return [(other_word, scores[other_word]) for other_word in best_words]
+
+
+
+# DEFINE FUNCTIONS
+def top_k_similar_brute_force(word, k, semantic_descriptors, similarity_fn):
+    """ (str, int, dict, function) -> list
+
+    The function returns a list of (word, similarity) pairs for the k words
+    most similar to word according to similarity_fn, most similar first,
+    computing the similarity between word and every other word.
+    Words with the same similarity are ordered as in semantic_descriptors,
+    and words whose similarity cannot be computed are left out.
+
+    >>> d = {'a': {'x': 2}, 'b': {'x': 3, 'y': 1}, 'c': {'y': 5}, 'd': {}}
+    >>> top_k_similar_brute_force('a', 5, d, get_cos_sim)
+    [('b', 0.9486832980505138), ('c', 0.0)]
+    """
+    # compute the similarity of every other word
+    target_vector = semantic_descriptors[word]
+    scores = []
+    for position, (other_word, vector) in enumerate(semantic_descriptors.items()):
+        if other_word == word:
+            continue
+        try:
+            scores.append((-similarity_fn(target_vector, vector), position, other_word))
+        # in case the similarity cannot be computed
+        except ZeroDivisionError:
+            continue
+
+    # keep the k best scores
+    return [(other_word, -score) for score, position, other_word in heapq.nsmallest(k, scores)]
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
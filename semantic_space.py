@@ -0,0 +1,390 @@
+# synonym-finder
+
+# This module contains a compact store for semantic descriptor vectors.
+# The vocabulary is interned to integer ids and all the vectors are kept
+# in one compressed sparse row (CSR) structure made of three arrays.
+# Dot products and norms of the vectors are computed directly on the arrays.
+
+# IMPORT MODULES
+import doctest
+import math
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+
+
+# DEFINE CLASSES
+class DescriptorView(Mapping):
+    """ A read-only dictionary-like view of one semantic descriptor vector
+    stored in a SemanticSpace. It maps context words to their counts.
+
+    >>> space = SemanticSpace.from_descriptors({'cat': {'furry': 3, 'nimble': 4}, 'dog': {'furry': 3}})
+    >>> v = space['cat']
+    >>> v['nimble']
+    4
+    >>> 'bark' in v
+    False
+    >>> len(v)
+    2
+    >>> v == {'furry': 3, 'nimble': 4}
+    True
+    """
+
+    __slots__ = ('space', 'start', 'end')
+
+    def __init__(self, space, start, end):
+        """ (DescriptorView, SemanticSpace, int, int) -> NoneType
+
+        The view covers the entries start to end (excluded) of the space's arrays.
+        """
+        self.space = space
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, context_word):
+        """ (DescriptorView, str) -> number
+
+        The method returns the count of context_word in the vector.
+        It raises a KeyError if the vector has no such context word.
+        """
+        # find the id of the context word
+        word_id = self.space.word_ids.get(context_word)
+        if word_id is None:
+            raise KeyError(context_word)
+
+        # look for the id in the sorted ids of the row
+        indices = self.space.indices
+        position = bisect_left(indices, word_id, self.start, self.end)
+        if position == self.end or indices[position] != word_id:
+            raise KeyError(context_word)
+        return self.space.data[position]
+
+    def __iter__(self):
+        """ (DescriptorView) -> iterator
+
+        The method iterates over the context words of the vector.
+        """
+        words = self.space.words
+        indices = self.space.indices
+        for position in range(self.start, self.end):
+            yield words[indices[position]]
+
+    def __len__(self):
+        """ (DescriptorView) -> int
+
+        The method returns the number of context words of the vector.
+        """
+        return self.end - self.start
+
+    def __repr__(self):
+        return "DescriptorView(%r)" % (self.to_dict(),)
+
+    def get_dot_product(self, other):
+        """ (DescriptorView, dict) -> number
+
+        The method returns the dot product of the vector and other. When other
+        is a view of the same space, their rows are joined by get_rows_dot_product,
+        otherwise the context words of the vector are looked up in other.
+
+        >>> space = SemanticSpace.from_descriptors({'a': {'x': 2, 'y': 1}, 'b': {'y': 3, 'z': 1}})
+        >>> space['a'].get_dot_product(space['b']), space['a'].get_dot_product({'x': 5})
+        (3, 10)
+        """
+        space = self.space
+        if isinstance(other, DescriptorView) and other.space is space:
+            return get_rows_dot_product(space.indices, space.data, self.start, self.end, other.start, other.end)
+
+        # look the context words up in the other vector
+        words = space.words
+        dot_product = 0
+        for position in range(self.start, self.end):
+            context_word = words[space.indices[position]]
+            if context_word in other:
+                dot_product += space.data[position] * other[context_word]
+        return dot_product
+
+    def get_norm(self):
+        """ (DescriptorView) -> float
+
+        The method returns the norm of the vector, computed by get_row_norm.
+
+        >>> SemanticSpace.from_descriptors({'a': {'x': 3, 'y': 4}})['a'].get_norm()
+        5.0
+        """
+        return get_row_norm(self.space.data, self.start, self.end)
+
+    def to_dict(self):
+        """ (DescriptorView) -> dict
+
+        The method returns the vector as a regular dictionary.
+
+        >>> space = SemanticSpace.from_descriptors({'a': {'b': 2, 'c': 1}})
+        >>> space['a'].to_dict()
+        {'b': 2, 'c': 1}
+        """
+        words = self.space.words
+        indices = self.space.indices
+        data = self.space.data
+        return {words[indices[position]]: data[position] for position in range(self.start, self.end)}
+
+
+class SemanticSpace(Mapping):
+    """ A compact store of semantic descriptor vectors.
+
+    Every word is given an integer id (its position in words). The vector of
+    the word with id i is made of the context ids indices[indptr[i] : indptr[i + 1]],
+    sorted in increasing order, and of their counts data[indptr[i] : indptr[i + 1]].
+    space[word] returns a DescriptorView of the vector of word, so a SemanticSpace
+    can be used wherever a dictionary of semantic descriptors is expected.
+    Words which only appear as context words have an empty row and are not
+    keys of the space.
+
+    >>> d = {'cat': {'furry': 3, 'grumpy': 5}, 'feline': {'furry': 2}, 'dog': {}}
+    >>> space = SemanticSpace.from_descriptors(d)
+    >>> len(space)
+    3
+    >>> space['cat']['grumpy']
+    5
+    >>> 'furry' in space
+    False
+    >>> space['furry']
+    Traceback (most recent call last):
+    KeyError: 'furry'
+    >>> space.to_dict() == d
+    True
+    >>> list(space.indptr), list(space.indices), list(space.data)
+    ([0, 2, 3, 3, 3, 3], [3, 4, 3], [3, 5, 2])
+    
+    >>> from similarity_measures import get_cos_sim, get_norm_euc_sim
+    >>> round(get_cos_sim(space['cat'], space['feline']), 3)
+    0.514
+    >>> get_cos_sim(space['cat'], space['dog'])
+    Traceback (most recent call last):
+    ZeroDivisionError: float division by zero
+    >>> round(get_norm_euc_sim(space['cat'], space['feline']), 3)
+    -0.985
+    """
+
+    def __init__(self, words, indptr, indices, data, num_keys=None):
+        """ (SemanticSpace, list, array, array, array, int) -> NoneType
+
+        The method creates a space from a list of words and the three CSR arrays.
+        The first num_keys words (all of them by default) are the keys of the space.
+        """
+        self.words = words
+        self.word_ids = {word: word_id for word_id, word in enumerate(words)}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.num_keys = len(words) if num_keys is None else num_keys
+
+    @classmethod
+    def from_descriptors(cls, semantic_descriptors):
+        """ (dict) -> SemanticSpace
+
+        The method takes as input a dictionary of semantic descriptor vectors
+        and returns a SemanticSpace holding the same vectors.
+        Context ids are stored as 32-bit integers and counts as 32-bit integers,
+        64-bit integers if a count does not fit, or floats if any count is a float.
+
+        >>> space = SemanticSpace.from_descriptors({'x': {'y': 0.5}})
+        >>> space['x']['y']
+        0.5
+        >>> space.data.typecode
+        'd'
+        """
+        # intern the words that have a vector, then the context-only words
+        words = list(semantic_descriptors)
+        word_ids = {word: word_id for word_id, word in enumerate(words)}
+        num_keys = len(words)
+        for vector in semantic_descriptors.values():
+            for context_word in vector:
+                if context_word not in word_ids:
+                    word_ids[context_word] = len(words)
+                    words.append(context_word)
+
+        # choose the smallest type which can hold every count
+        typecode = 'i'
+        for vector in semantic_descriptors.values():
+            for count in vector.values():
+                if type(count) != int:
+                    typecode = 'd'
+                    break
+                if not -2**31 <= count < 2**31:
+                    typecode = 'q'
+            if typecode == 'd':
+                break
+
+        # fill the CSR arrays one row at a time
+        indptr = array('q', [0])
+        indices = array('I')
+        data = array(typecode)
+        for word in words[:num_keys]:
+            vector = semantic_descriptors[word]
+            row = sorted((word_ids[context_word], count) for context_word, count in vector.items())
+            indices.extend([context_id for context_id, count in row])
+            data.extend([count for context_id, count in row])
+            indptr.append(len(indices))
+
+        # context-only words have empty rows
+        for word_id in range(num_keys, len(words)):
+            indptr.append(len(indices))
+
+        # return the space
+        return cls(words, indptr, indices, data, num_keys)
+
+    def __getitem__(self, word):
+        """ (SemanticSpace, str) -> DescriptorView
+
+        The method returns a view of the semantic descriptor vector of word.
+        It raises a KeyError if word has no vector in the space.
+        """
+        start, end = self.row_bounds(word)
+        return DescriptorView(self, start, end)
+
+    def __iter__(self):
+        """ (SemanticSpace) -> iterator
+
+        The method iterates over the words which have a vector in the space.
+        """
+        return iter(self.words[:self.num_keys])
+
+    def __len__(self):
+        """ (SemanticSpace) -> int
+
+        The method returns the number of words which have a vector in the space.
+        """
+        return self.num_keys
+
+    def row_bounds(self, word):
+        """ (SemanticSpace, str) -> tuple
+
+        The method returns the start and end positions of the vector of word
+        in the indices and data arrays, so that kernels can scan the arrays directly.
+
+        >>> space = SemanticSpace.from_descriptors({'a': {'b': 1}, 'b': {'a': 1, 'c': 2}})
+        >>> space.row_bounds('b')
+        (1, 3)
+        """
+        word_id = self.word_ids.get(word)
+        if word_id is None or word_id >= self.num_keys:
+            raise KeyError(word)
+        return self.indptr[word_id], self.indptr[word_id + 1]
+
+    def to_dict(self):
+        """ (SemanticSpace) -> dict
+
+        The method returns the space as a dictionary of semantic descriptor vectors.
+        """
+        return {word: self[word].to_dict() for word in self}
+
+    def get_memory_size(self):
+        """ (SemanticSpace) -> int
+
+        The method returns an estimate of the number of bytes used by the space,
+        including its vocabulary.
+        """
+        size = sys.getsizeof(self.words) + sys.getsizeof(self.word_ids)
+        size += sum(sys.getsizeof(word) for word in self.words)
+        for arr in (self.indptr, self.indices, self.data):
+            size += sys.getsizeof(arr)
+        return size
+
+
+
+# DEFINE FUNCTIONS
+def get_rows_dot_product(indices, data, start, end, other_start, other_end):
+    """ (array, array, int, int, int, int) -> number
+
+    The function takes the indices and data arrays of a CSR structure and the
+    bounds of two of its rows. It returns the dot product of the two rows,
+    joining their sorted ids in one pass, or with binary searches in the
+    longer row when it is much longer than the other.
+
+    >>> indices, data = array('I', [0, 2, 5, 2, 5, 7]), array('i', [1, 2, 3, 4, 5, 6])
+    >>> get_rows_dot_product(indices, data, 0, 3, 3, 6)
+    23
+    >>> get_rows_dot_product(indices, data, 0, 3, 3, 3)
+    0
+    """
+    if end - start > other_end - other_start:
+        start, end, other_start, other_end = other_start, other_end, start, end
+    dot_product = 0
+
+    # in case the longer row is much longer, look its ids up
+    if (end - start) * 16 < other_end - other_start:
+        position = other_start
+        for index in range(start, end):
+            position = bisect_left(indices, indices[index], position, other_end)
+            if position == other_end:
+                break
+            if indices[position] == indices[index]:
+                dot_product += data[index] * data[position]
+        return dot_product
+
+    # otherwise, walk along both rows
+    index, other_index = start, other_start
+    while index < end and other_index < other_end:
+        word_id = indices[index]
+        other_id = indices[other_index]
+        if word_id == other_id:
+            dot_product += data[index] * data[other_index]
+            index += 1
+            other_index += 1
+        elif word_id < other_id:
+            index += 1
+        else:
+            other_index += 1
+    return dot_product
+
+
+def get_row_norm(data, start, end):
+    """ (array, int, int) -> float
+
+    The function takes the data array of a CSR structure and the bounds of
+    one of its rows. It returns the norm of the row.
+
+    >>> get_row_norm(array('i', [1, 3, 4]), 1, 3)
+    5.0
+    """
+    sum_of_squares = 0
+    for position in range(start, end):
+        sum_of_squares += data[position] * data[position]
+    return math.sqrt(sum_of_squares)
+
+
+def get_descriptors_memory_size(semantic_descriptors):
+    """ (dict) -> int
+
+    The function takes as input a dictionary of semantic descriptor vectors.
+    It returns an estimate of the number of bytes used by the dictionary,
+    its vectors, their counts and the words (each distinct word counted once).
+
+    >>> get_descriptors_memory_size({}) == sys.getsizeof({})
+    True
+    """
+    # initialize variables
+    size = sys.getsizeof(semantic_descriptors)
+    seen_words = set()
+
+    # add the size of every vector, of every count and of every distinct word
+    for word, vector in semantic_descriptors.items():
+        size += sys.getsizeof(vector)
+        seen_words.add(word)
+        for context_word, count in vector.items():
+            seen_words.add(context_word)
+            # small integers are shared by the interpreter
+            if not (type(count) == int and -5 <= count <= 256):
+                size += sys.getsizeof(count)
+    size += sum(sys.getsizeof(word) for word in seen_words)
+
+    # return the estimate
+    return size
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
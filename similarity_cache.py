@@ -0,0 +1,142 @@
+# synonym-finder
+
+# This module contains a cache of the similarities computed between words,
+# which most_sim_word and run_sim_test can use when they are given one.
+# Quiz files ask about the same words again and again, and answering several
+# quiz files with the same descriptors computes the same similarities each time.
+# The cache keeps a bounded number of similarities and forgets the least
+# recently used ones first.
+
+# IMPORT MODULES
+import collections
+import doctest
+from similarity_measures import *
+
+
+
+# DEFINE CONSTANTS
+# similarity functions giving the same similarity when their vectors are swapped,
+# whose similarities are stored once for both orders of the words
+SYMMETRIC_SIMILARITY_FNS = (get_cos_sim, get_euc_sim, get_norm_euc_sim)
+
+
+
+# DEFINE CLASSES
+class SimilarityCache:
+    """ A least recently used cache of the similarities between pairs of words,
+    holding at most max_entries similarities. A similarity which cannot be
+    computed is stored as -inf, as most_sim_word counts it.
+
+    The similarities are only valid for one dictionary of semantic descriptors:
+    the cache is emptied when it is used with another dictionary, and the
+    similarities of words whose vectors change must be dropped with invalidate.
+    The number of hits, misses and evictions is recorded.
+
+    >>> sem_descs = {'cat' : {'furry' : 3, 'nimble' : 4}, 'feline' : {'furry' : 2, 'nimble' : 5}, 'dog' : {}}
+    >>> cache = SimilarityCache(max_entries=2)
+    >>> round(cache.get_similarity('cat', 'feline', sem_descs, get_cos_sim), 4)
+    0.9656
+    >>> round(cache.get_similarity('feline', 'cat', sem_descs, get_cos_sim), 4)
+    0.9656
+    >>> cache.get_similarity('cat', 'dog', sem_descs, get_cos_sim)
+    -inf
+    >>> cache.get_similarity('cat', 'bird', sem_descs, get_cos_sim)
+    -inf
+    >>> cache.get_stats()
+    {'hits': 1, 'misses': 3, 'evictions': 1, 'entries': 2}
+    """
+
+    def __init__(self, max_entries=100000, symmetric_fns=SYMMETRIC_SIMILARITY_FNS):
+        """ (SimilarityCache, int, tuple) -> NoneType
+
+        The method creates an empty cache of at most max_entries similarities.
+        The similarities of the functions of symmetric_fns are stored once for
+        both orders of the words.
+        It raises a ValueError if max_entries is not positive.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be positive")
+
+        self.max_entries = max_entries
+        self.symmetric_fns = symmetric_fns
+        self.entries = collections.OrderedDict()
+        self.semantic_descriptors = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_similarity(self, word, choice, semantic_descriptors, similarity_fn):
+        """ (SimilarityCache, str, str, dict, function) -> float
+
+        The method returns the similarity between word and choice computed by
+        similarity_fn from semantic_descriptors, or -inf if it cannot be computed,
+        computing it only if it is not in the cache.
+        """
+        # in case the similarities were computed from another dictionary
+        if semantic_descriptors is not self.semantic_descriptors:
+            self.entries.clear()
+            self.semantic_descriptors = semantic_descriptors
+
+        # store the similarity of symmetric functions under a single order of the words
+        if similarity_fn in self.symmetric_fns and choice < word:
+            key = (similarity_fn, choice, word)
+        else:
+            key = (similarity_fn, word, choice)
+
+        # in case the similarity was already computed
+        sem_sim = self.entries.get(key)
+        if sem_sim is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return sem_sim
+
+        # otherwise, compute it, then evict the least recently used similarity if needed
+        self.misses += 1
+        try:
+            sem_sim = similarity_fn(semantic_descriptors[word], semantic_descriptors[choice])
+        except (ZeroDivisionError, KeyError):
+            sem_sim = float('-inf')
+        self.entries[key] = sem_sim
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return sem_sim
+
+    def invalidate(self, words=None):
+        """ (SimilarityCache, iterable) -> NoneType
+
+        The method drops the similarities involving any of the words,
+        or all of them if words is None.
+
+        >>> sem_descs = {'a' : {'x' : 1}, 'b' : {'x' : 2}, 'c' : {'y' : 1}}
+        >>> cache = SimilarityCache()
+        >>> for choice in 'bc':
+        ...     _ = cache.get_similarity('a', choice, sem_descs, get_euc_sim)
+        >>> cache.invalidate(['b'])
+        >>> list(cache.entries)[0][1:]
+        ('a', 'c')
+        >>> cache.invalidate()
+        >>> len(cache.entries)
+        0
+        """
+        if words is None:
+            self.entries.clear()
+            return
+        words = set(words)
+        for key in [key for key in self.entries if key[1] in words or key[2] in words]:
+            del self.entries[key]
+
+    def get_stats(self):
+        """ (SimilarityCache) -> dict
+
+        The method returns a dictionary with the number of hits, misses
+        and evictions so far and the number of similarities in the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self.entries)}
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
@@ -4,10 +4,17 @@
 
 # IMPORT MODULES
 import doctest
+import math
 from vectors_utils import *
 
 
 
+# DEFINE CONSTANTS
+# ways of weighting the words of a context window by their distance to the word
+WINDOW_WEIGHTINGS = ('harmonic', 'linear')
+
+
+
 # DEFINE FUNCTIONS
 def get_semantic_descriptor(keyword, sentence):
     """ (str, list) -> dict
@@ -130,7 +137,210 @@ def get_all_semantic_descriptors(text):
     # return the dictionary of semantic descriptor vectors
     return semantic_descs
 
+
+def count_words(sentence):
+    """ (list) -> dict
+    
+    The function takes as input a list representing all the words in a sentence.
+    It returns a dictionary mapping each distinct word to the number of times
+    it appears in the sentence, in order of first appearance.
+    
+    >>> count_words(['jingle', 'bells', 'jingle', 'bells', 'jingle', 'all'])
+    {'jingle': 3, 'bells': 2, 'all': 1}
+    
+    >>> count_words([])
+    {}
+    """
+    # initialize an empty dictionary
+    word_counts = {}
+    
+    # count the occurence of each word in the sentence
+    for word in sentence:
+        word_counts[word] = word_counts.get(word, 0) + 1
+    
+    # return the word counts
+    return word_counts
+
+
+def get_all_semantic_descriptors_fast(text):
+    """ (list) -> dict
+    
+    The function takes as input a list of lists representing the words in a text,
+    where each sentence in a text is represented by a sublist of the input list.
+    It returns the same dictionary of semantic descriptor vectors as
+    get_all_semantic_descriptors, but counts the words of each sentence only once
+    and adds every word's contribution from those counts, instead of rebuilding
+    a semantic descriptor for every occurence of every word.
+    
+    A word appearing n times in a sentence contributes n times the count of
+    each other word of that sentence to its semantic descriptor vector.
+    
+    >>> s = [['all', 'the', 'habits', 'of', 'man', 'are', 'evil'], \
+    ['and', 'above', 'all', 'no', 'animal', 'must', 'ever', 'tyrannise', 'over', 'his', 'own', 'kind'], \
+    ['weak', 'or', 'strong', 'clever', 'or', 'simple', 'we', 'are', 'all', 'brothers'], \
+    ['no', 'animal', 'must', 'ever', 'kill', 'any', 'other', 'animal'], \
+    ['all', 'animals', 'are', 'equal']]
+    >>> d = get_all_semantic_descriptors_fast(s)
+    >>> d['animal']['must']
+    3
+    >>> d == get_all_semantic_descriptors(s)
+    True
+    
+    >>> s = [['jingle', 'bells', 'jingle', 'bells'], \
+    ['jingle', 'all', 'the', 'way'], \
+    ['hey', 'jingle', 'bells', 'jingle', 'bells'], \
+    ['live']]
+    >>> d = get_all_semantic_descriptors_fast(s)
+    >>> d['jingle'] == {'bells' : 8, 'all' : 1, 'the' : 1, 'way' : 1, 'hey': 2}
+    True
+    >>> d['live']
+    {}
+    >>> list(d['jingle']) == list(get_all_semantic_descriptors(s)['jingle'])
+    True
+    
+    >>> get_all_semantic_descriptors_fast([])
+    {}
+    """
+    # initialize an empty dictionary
+    semantic_descs = {}
+    
+    # count the words of each sentence only once
+    for sentence in text:
+        word_counts = list(count_words(sentence).items())
+        
+        # add the contribution of the sentence to each of its words
+        for index, (word, word_count) in enumerate(word_counts):
+            sem_desc = semantic_descs.get(word)
+            
+            # in case this is the first time the word appears in the text
+            if sem_desc is None:
+                sem_desc = semantic_descs[word] = {}
+            
+            # add the counts of the words before and after it in the sentence
+            get_count = sem_desc.get
+            for other_word, other_count in word_counts[:index]:
+                sem_desc[other_word] = get_count(other_word, 0) + word_count * other_count
+            for other_word, other_count in word_counts[index + 1:]:
+                sem_desc[other_word] = get_count(other_word, 0) + word_count * other_count
+    
+    # return the dictionary of semantic descriptor vectors
+    return semantic_descs
+
+
+def get_window_weights(window, weighting=None):
+    """ (int, str) -> list
     
+    The function returns the list of the weights of the words at each distance
+    from 0 to window from a word: 1 without weighting, 1 / distance with
+    'harmonic' weighting and (window + 1 - distance) / window with 'linear' weighting.
+    It raises a ValueError if the window is not positive or the weighting is unknown.
+    
+    >>> get_window_weights(2), get_window_weights(2, 'harmonic'), get_window_weights(2, 'linear')
+    ([1, 1, 1], [1, 1.0, 0.5], [1, 1.0, 0.5])
+    >>> get_window_weights(0)
+    Traceback (most recent call last):
+    ValueError: the context window must be at least 1 word
+    """
+    if window < 1:
+        raise ValueError("the context window must be at least 1 word")
+    if weighting is None:
+        return [1] * (window + 1)
+    if weighting == 'harmonic':
+        return [1] + [1 / distance for distance in range(1, window + 1)]
+    if weighting == 'linear':
+        return [1] + [(window + 1 - distance) / window for distance in range(1, window + 1)]
+    raise ValueError("unknown context window weighting: %r" % (weighting,))
+
+
+def get_all_semantic_descriptors_windowed(text, window, weighting=None):
+    """ (list, int, str) -> dict
+    
+    The function takes as input a list of lists representing the words in a text,
+    where each sentence in a text is represented by a sublist of the input list.
+    It returns a dictionary of semantic descriptor vectors where the context of
+    each occurence of a word is made of the words at most window words before
+    or after it in its sentence, instead of the whole sentence, so that the cost
+    of a sentence grows with its length instead of its square.
+    Each context word counts as given by get_window_weights: 1 without weighting,
+    or less the further it is. When no sentence is longer than window + 1 words,
+    the descriptors are the ones of get_all_semantic_descriptors.
+    
+    >>> s = [['all', 'the', 'habits', 'of', 'man', 'are', 'evil'], \
+    ['no', 'animal', 'must', 'ever', 'kill', 'any', 'other', 'animal']]
+    >>> d = get_all_semantic_descriptors_windowed(s, 2)
+    >>> d['evil'], d['animal']['must'], d['animal']['other']
+    ({'man': 1, 'are': 1}, 1, 1)
+    >>> get_all_semantic_descriptors_windowed(s, 7) == get_all_semantic_descriptors(s)
+    True
+    >>> get_all_semantic_descriptors_windowed(s, 2, 'harmonic')['evil']
+    {'man': 0.5, 'are': 1.0}
+    """
+    # initialize variables
+    weights = get_window_weights(window, weighting)
+    semantic_descs = {}
+    
+    # add the words around every occurence of every word of each sentence
+    for sentence in text:
+        length = len(sentence)
+        for index, word in enumerate(sentence):
+            sem_desc = semantic_descs.get(word)
+            
+            # in case this is the first time the word appears in the text
+            if sem_desc is None:
+                sem_desc = semantic_descs[word] = {}
+            
+            # add the words of the window, except the word itself
+            get_count = sem_desc.get
+            for other_index in range(max(0, index - window), min(length, index + window + 1)):
+                other_word = sentence[other_index]
+                if other_word != word:
+                    sem_desc[other_word] = get_count(other_word, 0) + weights[abs(other_index - index)]
+    
+    # return the dictionary of semantic descriptor vectors
+    return semantic_descs
+
+    
+def get_cached_norm(vector):
+    """ (dict) -> float
+    
+    The function takes as input a dictionary representing a vector.
+    It returns the norm recorded in the vector if it is a NormedVector,
+    and computes it with get_vector_norm otherwise.
+    
+    >>> get_cached_norm(NormedVector({'a' : 3, 'b' : 4}))
+    5.0
+    >>> get_cached_norm({'a' : 3, 'b' : 4})
+    5.0
+    """
+    if isinstance(vector, NormedVector):
+        return vector.norm
+    return get_vector_norm(vector)
+
+
+def get_normalized_copy(vector):
+    """ (dict) -> dict
+    
+    The function takes as input a dictionary representing a vector.
+    It returns the normalized copy recorded in the vector if it is a NormedVector
+    which has one, and a new normalized copy of the vector otherwise.
+    The returned dictionary must not be modified.
+    
+    >>> get_normalized_copy({'a' : 3, 'b' : 4}) == {'a' : 0.6, 'b' : 0.8}
+    True
+    >>> v = NormedVector({'a' : 3, 'b' : 4}, normalized=True)
+    >>> get_normalized_copy(v) is v.normalized
+    True
+    """
+    # in case the normalized copy was recorded
+    if isinstance(vector, NormedVector) and vector.normalized is not None:
+        return vector.normalized
+    
+    # otherwise, make a copy of the dictionary and normalize it
+    vector_c = copy_dict(vector)
+    normalize_vector(vector_c)
+    return vector_c
+
+
 def get_cos_sim(first_vector, second_vector):
     """ (dict, dict) -> float
 
@@ -157,13 +367,19 @@ def get_cos_sim(first_vector, second_vector):
     
     >>> get_cos_sim({"a": 1, "b": 1}, {"a": -1, "b": 1})
     0.0
+    
+    >>> get_cos_sim(NormedVector(v1), NormedVector(v2)) == get_cos_sim(v1, v2)
+    True
+    >>> word_ids = {}
+    >>> get_cos_sim(SparseVector.from_dict(v1, word_ids), SparseVector.from_dict(v2, word_ids)) == get_cos_sim(v1, v2)
+    True
     """
     # calculate the dot product
     dot_product = get_dot_product(first_vector, second_vector)
     
-    # calculate each vector's norm
-    first_norm = get_vector_norm(first_vector)
-    second_norm = get_vector_norm(second_vector)
+    # calculate each vector's norm, unless it was recorded
+    first_norm = get_cached_norm(first_vector)
+    second_norm = get_cached_norm(second_vector)
     
     # calculate and return the cosine similarity
     cosine_sim = dot_product / (first_norm * second_norm)
@@ -233,20 +449,151 @@ def get_norm_euc_sim(first_vector, second_vector):
     
     >>> get_norm_euc_sim({}, {})
     -0.0
-    """
-    # make copies of the dictionaries
-    first_vector_c = copy_dict(first_vector)
-    second_vector_c = copy_dict(second_vector)
     
-    # normalized the vectors
-    normalize_vector(first_vector_c)
-    normalize_vector(second_vector_c)
+    >>> v3 = NormedVector(v1, normalized=True)
+    >>> get_norm_euc_sim(v3, NormedVector(v2, normalized=True)) == get_norm_euc_sim(v1, v2)
+    True
+    >>> get_norm_euc_sim(v3, v2) == get_norm_euc_sim(v1, v2)
+    True
+    >>> word_ids = {}
+    >>> v4 = SparseVector.from_dict(v1, word_ids)
+    >>> get_norm_euc_sim(v4, SparseVector.from_dict(v2, word_ids)) == get_norm_euc_sim(v1, v2)
+    True
+    >>> v4 == SparseVector.from_dict(v1, word_ids)
+    True
+    """
+    # get normalized copies of the vectors, unless they were recorded
+    first_vector_c = get_normalized_copy(first_vector)
+    second_vector_c = get_normalized_copy(second_vector)
     
     # calculate and return the similarity
     norm_euc_sim = get_euc_sim(first_vector_c, second_vector_c) 
     return norm_euc_sim
     
 
+def get_fused_sims(first_vector, second_vector):
+    """ (dict, dict) -> tuple
+    
+    The function takes as input two dictionaries representing similarity descriptor vectors.
+    It adds up their dot product and the squared differences of their components
+    and of their normalized components as running sums, in one pass over the two
+    vectors, without copying them, and returns a tuple
+    (cosine similarity, negative euclidean distance similarity,
+    normalized negative euclidean distance similarity).
+    The cosine similarity is None when it cannot be computed.
+    
+    The components are visited in the order used by get_cos_sim, get_euc_sim and
+    get_norm_euc_sim, so the similarities are equal to theirs, for float vectors too.
+    For that, the normalized components are divided by the norms as normalize_vector
+    divides them, so the norms are needed before the pass: they are the ones
+    SparseVectors and NormedVectors keep, and are otherwise added up first
+    over the values of each dictionary.
+    
+    >>> v1 = {"a": 5, "b": 3, "c": 2}
+    >>> v2 = {"b": -4, "c": 5, "d": 5}
+    >>> get_fused_sims(v1, v2) == (get_cos_sim(v1, v2), get_euc_sim(v1, v2), get_norm_euc_sim(v1, v2))
+    True
+    >>> v1 = {"a": 0.1, "b": 0.7, "c": 1 / 3}
+    >>> v2 = {"c": 0.2, "b": 0.3, "d": 2 / 7}
+    >>> get_fused_sims(v1, v2) == (get_cos_sim(v1, v2), get_euc_sim(v1, v2), get_norm_euc_sim(v1, v2))
+    True
+    
+    >>> get_fused_sims({"a": 1, "b": 2, "c": 3}, {})
+    (None, -3.7416573867739413, -1.0)
+    >>> get_fused_sims({"a": 1, "b": 2, "c": 3}, {"a": 1, "b": 2, "c": 3})
+    (1.0, -0.0, -0.0)
+    >>> get_fused_sims({}, {})
+    (None, -0.0, -0.0)
+    >>> get_fused_sims(NormedVector(v1), NormedVector(v2)) == get_fused_sims(v1, v2)
+    True
+    >>> word_ids = {}
+    >>> s1, s2 = SparseVector.from_dict(v1, word_ids), SparseVector.from_dict(v2, word_ids)
+    >>> get_fused_sims(s1, s2) == (get_cos_sim(s1, s2), get_euc_sim(s1, s2), get_norm_euc_sim(s1, s2))
+    True
+    """
+    # in case the vectors are SparseVectors, walk along both of them, squaring the
+    # differences as SparseVector.get_norm squares the values of their vectors
+    if isinstance(second_vector, SparseVector):
+        first_vector = second_vector.get_sparse(first_vector)
+    if isinstance(first_vector, SparseVector):
+        second_vector = first_vector.get_sparse(second_vector)
+        first_norm = first_vector.get_norm()
+        second_norm = second_vector.get_norm()
+        first_scale = first_norm or 1
+        second_scale = second_norm or 1
+        ids, values = first_vector.ids, first_vector.values
+        other_ids, other_values = second_vector.ids, second_vector.values
+        dot_product = 0
+        difference_square = 0
+        normalized_difference_square = 0
+        index = other_index = 0
+        size, other_size = len(ids), len(other_ids)
+        while index < size or other_index < other_size:
+            word_id = ids[index] if index < size else None
+            other_id = other_ids[other_index] if other_index < other_size else None
+            if word_id == other_id:
+                value, other_value = values[index], other_values[other_index]
+                dot_product += value * other_value
+                difference = value - other_value
+                normalized_difference = value / first_scale - other_value / second_scale
+                index += 1
+                other_index += 1
+            elif other_id is None or (word_id is not None and word_id < other_id):
+                difference = values[index]
+                normalized_difference = difference / first_scale
+                index += 1
+            else:
+                difference = other_values[other_index]
+                normalized_difference = difference / second_scale
+                other_index += 1
+            difference_square += difference * difference
+            normalized_difference_square += normalized_difference * normalized_difference
+    
+    # otherwise, compute the norms unless they were recorded, then go through
+    # the first vector and the components only the second one has
+    else:
+        norms = []
+        for vector in (first_vector, second_vector):
+            if isinstance(vector, NormedVector):
+                norms.append(vector.norm)
+            else:
+                sum_of_squares = 0
+                for value in vector.values():
+                    sum_of_squares += (value)**2
+                norms.append(math.sqrt(sum_of_squares))
+        first_norm, second_norm = norms
+        first_scale = first_norm or 1
+        second_scale = second_norm or 1
+        dot_product = 0
+        difference_square = 0
+        normalized_difference_square = 0
+        for key, value in first_vector.items():
+            if key in second_vector:
+                other_value = second_vector[key]
+                dot_product += value * other_value
+                difference_square += (value - other_value)**2
+                normalized_difference_square += (value / first_scale - other_value / second_scale)**2
+            else:
+                difference_square += (value)**2
+                normalized_difference_square += (value / first_scale)**2
+        for key, value in second_vector.items():
+            if key not in first_vector:
+                difference_square += (value)**2
+                normalized_difference_square += (value / second_scale)**2
+    
+    # compute the cosine similarity, in case neither vector is zero
+    cos_sim = None
+    if first_norm * second_norm != 0:
+        cos_sim = dot_product / (first_norm * second_norm)
+    
+    # return the three similarities
+    return cos_sim, -math.sqrt(difference_square), -math.sqrt(normalized_difference_square)
+
+
+# similarity functions computed together by get_fused_sims, in the same order
+FUSED_SIMILARITY_FNS = (get_cos_sim, get_euc_sim, get_norm_euc_sim)
+
+
 
 # TEST MODULE
 if __name__ == "__main__":
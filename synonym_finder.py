@@ -0,0 +1,283 @@
+# synonym-finder
+
+# This module is the command-line entry point of the program:
+#
+#   python synonym_finder.py build FILE... --output descriptors.bin
+#   python synonym_finder.py query WORD CHOICE... --descriptors descriptors.bin
+#   python synonym_finder.py eval QUIZ --descriptors descriptors.bin
+#   python synonym_finder.py plot QUIZ --files FILE...
+#
+# Every subcommand only imports the modules it needs when it runs, so that
+# answering a query does not pay for building descriptors or for matplotlib.
+
+# IMPORT MODULES
+import argparse
+import os
+import sys
+
+
+
+# DEFINE CONSTANTS
+# names of the similarity measures on the command line
+MEASURE_NAMES = ('cos', 'euc', 'norm_euc')
+
+
+
+# DEFINE FUNCTIONS
+def get_similarity_fn(name):
+    """ (str) -> function
+
+    The function returns the similarity function of a measure name.
+
+    >>> get_similarity_fn('norm_euc').__name__
+    'get_norm_euc_sim'
+    """
+    import similarity_measures
+    return getattr(similarity_measures, "get_%s_sim" % name)
+
+
+def get_instrumentation(args):
+    """ (Namespace) -> Instrumentation
+
+    The function returns the Instrumentation asked for on the command line,
+    reporting the progress on the standard error, or None if there is none.
+    """
+    if not getattr(args, 'profile', False) and not getattr(args, 'trace_memory', False):
+        return None
+    from instrumentation import Instrumentation
+    def print_progress(unit, done, total):
+        if total is not None:
+            print("%d/%d %s" % (done, total, unit), file=sys.stderr)
+    return Instrumentation(args.trace_memory, print_progress)
+
+
+def print_instrumentation(instrumentation):
+    """ (Instrumentation) -> NoneType
+
+    The function prints the report of instrumentation on the standard error,
+    if there is one.
+    """
+    if instrumentation is not None:
+        print(instrumentation.format_report(), file=sys.stderr)
+
+
+def build_descriptors(args, instrumentation=None):
+    """ (Namespace, Instrumentation) -> dict
+
+    The function builds the semantic descriptors of the files given on the
+    command line, with the cache and pruning options given there.
+    """
+    from file_processing import build_semantic_descriptors_from_files
+    cache = None
+    if getattr(args, 'cache', None) is not None:
+        from descriptor_cache import DescriptorCache
+        cache = DescriptorCache(args.cache)
+
+    # read the stopwords, separated by white spaces
+    stopwords = None
+    if getattr(args, 'stopwords', None) is not None:
+        fobj = open(args.stopwords, "r", encoding="utf-8")
+        stopwords = fobj.read().lower().split()
+        fobj.close()
+
+    return build_semantic_descriptors_from_files(args.files, cache, getattr(args, 'workers', 1),
+                                                 min_count=getattr(args, 'min_count', 1),
+                                                 max_features=getattr(args, 'max_features', None),
+                                                 stopwords=stopwords,
+                                                 max_contexts=getattr(args, 'max_contexts', None),
+                                                 instrumentation=instrumentation,
+                                                 window=getattr(args, 'window', None),
+                                                 weighting=getattr(args, 'window_weighting', None),
+                                                 max_sentence_length=getattr(args, 'max_sentence_length', None))
+
+
+def load_descriptors(args, instrumentation=None):
+    """ (Namespace, Instrumentation) -> dict
+
+    The function returns the semantic descriptors given on the command line:
+    read from a descriptor file or a pickle file, or built from text files.
+    """
+    if args.descriptors is None:
+        return build_descriptors(args, instrumentation)
+
+    # in case the file is a descriptor file, map it instead of reading it
+    from descriptor_file import MAGIC, open_descriptor_file
+    fobj = open(args.descriptors, "rb")
+    magic = fobj.read(len(MAGIC))
+    fobj.close()
+    if magic == MAGIC:
+        return open_descriptor_file(args.descriptors)
+
+    # otherwise, it is a pickle file
+    import pickle
+    fobj = open(args.descriptors, "rb")
+    try:
+        return pickle.load(fobj)
+    finally:
+        fobj.close()
+
+
+def run_build(args):
+    """ (Namespace) -> int
+
+    The function builds the semantic descriptors of the files and saves them
+    into a descriptor file, or a pickle file if the output ends with .pkl or .pickle.
+    """
+    instrumentation = get_instrumentation(args)
+    descriptors = build_descriptors(args, instrumentation)
+    if os.path.splitext(args.output)[1] in ('.pkl', '.pickle'):
+        import pickle
+        fobj = open(args.output, "wb")
+        try:
+            pickle.dump(descriptors, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            fobj.close()
+    else:
+        from descriptor_file import save_descriptor_file
+        save_descriptor_file(descriptors, args.output)
+    print("%d words saved into %s" % (len(descriptors), args.output))
+    print_instrumentation(instrumentation)
+    return 0
+
+
+def run_query(args):
+    """ (Namespace) -> int
+
+    The function prints the choice most similar to the word.
+    """
+    from synonyms_solver import most_sim_word
+    descriptors = load_descriptors(args)
+    print(most_sim_word(args.word.lower(), [choice.lower() for choice in args.choices], descriptors,
+                        get_similarity_fn(args.measure)))
+    return 0
+
+
+def run_eval(args):
+    """ (Namespace) -> int
+
+    The function prints the percentage of correct answers on the quiz
+    for every measure.
+    """
+    from synonyms_solver import run_sim_test
+    instrumentation = get_instrumentation(args)
+    descriptors = load_descriptors(args, instrumentation)
+    measures = args.measure or list(MEASURE_NAMES)
+    percentages = run_sim_test(args.quiz, descriptors, [get_similarity_fn(name) for name in measures],
+                               instrumentation, args.workers)
+    for name, percentage in zip(measures, percentages):
+        print("%s: %.1f%%" % (name, percentage))
+    print_instrumentation(instrumentation)
+    return 0
+
+
+def run_plot(args):
+    """ (Namespace) -> int
+
+    The function plots the percentage of correct answers on the quiz
+    for every measure into an image.
+    """
+    from synonyms_solver import generate_bar_graph
+    cache = None
+    if args.cache is not None:
+        from descriptor_cache import DescriptorCache
+        cache = DescriptorCache(args.cache)
+    measures = args.measure or list(MEASURE_NAMES)
+    generate_bar_graph([get_similarity_fn(name) for name in measures], args.quiz, cache, args.files, args.output)
+    print("graph saved into %s" % args.output)
+    return 0
+
+
+def get_parser():
+    """ () -> ArgumentParser
+
+    The function returns the parser of the command line.
+    """
+    parser = argparse.ArgumentParser(prog="synonym-finder",
+                                     description="Answer synonym questions from the semantic "
+                                                 "descriptors of texts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # options shared by the commands which build descriptors
+    build_options = argparse.ArgumentParser(add_help=False)
+    build_options.add_argument("--cache", help="directory caching the descriptors of each file")
+    build_options.add_argument("--workers", type=int, default=1, help="number of processes building the descriptors or answering the quiz")
+    build_options.add_argument("--min-count", type=int, default=1)
+    build_options.add_argument("--max-features", type=int)
+    build_options.add_argument("--max-contexts", type=int)
+    build_options.add_argument("--stopwords", help="file of stopwords separated by white spaces")
+    build_options.add_argument("--window", type=int,
+                               help="count the words at most this far from a word instead of its whole sentence")
+    build_options.add_argument("--window-weighting", choices=['harmonic', 'linear'])
+    build_options.add_argument("--max-sentence-length", type=int, help="split longer sentences")
+    build_options.add_argument("--profile", action="store_true",
+                               help="print the time and counters of every stage on the standard error")
+    build_options.add_argument("--trace-memory", action="store_true",
+                               help="also print the peak memory of every stage (slower)")
+
+    # options of the commands which need descriptors
+    source_options = argparse.ArgumentParser(add_help=False, parents=[build_options])
+    source = source_options.add_mutually_exclusive_group(required=True)
+    source.add_argument("--descriptors", help="descriptor file or pickle file written by build")
+    source.add_argument("--files", nargs="+", help="text files to build the descriptors from")
+
+    command = subparsers.add_parser("build", parents=[build_options], help="build and save descriptors")
+    command.add_argument("files", nargs="+")
+    command.add_argument("--output", "-o", required=True,
+                         help="descriptor file, or pickle file if it ends with .pkl or .pickle")
+    command.set_defaults(run=run_build)
+
+    command = subparsers.add_parser("query", parents=[source_options], help="answer one question")
+    command.add_argument("word")
+    command.add_argument("choices", nargs="+")
+    command.add_argument("--measure", choices=MEASURE_NAMES, default="cos")
+    command.set_defaults(run=run_query)
+
+    command = subparsers.add_parser("eval", parents=[source_options], help="answer a quiz file")
+    command.add_argument("quiz")
+    command.add_argument("--measure", choices=MEASURE_NAMES, action="append")
+    command.set_defaults(run=run_eval)
+
+    command = subparsers.add_parser("plot", help="plot the results of every measure on a quiz file")
+    command.add_argument("quiz")
+    command.add_argument("--files", nargs="+", default=['war_and_peace.txt', 'swanns_way.txt'])
+    command.add_argument("--cache", help="directory caching the descriptors of each file")
+    command.add_argument("--measure", choices=MEASURE_NAMES, action="append")
+    command.add_argument("--output", "-o", default="synonyms_test_results.png")
+    command.set_defaults(run=run_plot)
+
+    return parser
+
+
+def main(argv=None):
+    """ (list) -> int
+
+    The function runs the command given by argv (the command line by default)
+    and returns its exit status.
+
+    >>> import tempfile
+    >>> directory = tempfile.mkdtemp()
+    >>> text = os.path.join(directory, 'text.txt')
+    >>> with open(text, 'w') as fobj:
+    ...     _ = fobj.write('The cat is furry. The feline is furry. The dog barks.')
+    >>> output = os.path.join(directory, 'descriptors.bin')
+    >>> main(['build', text, '--output', output]) # doctest: +ELLIPSIS
+    7 words saved into ...descriptors.bin
+    0
+    >>> main(['query', 'feline', 'dog', 'cat', '--descriptors', output])
+    cat
+    0
+    >>> quiz = os.path.join(directory, 'quiz.txt')
+    >>> with open(quiz, 'w') as fobj:
+    ...     _ = fobj.write('feline cat dog cat\\n')
+    >>> main(['eval', quiz, '--files', text, '--measure', 'cos'])
+    cos: 100.0%
+    0
+    """
+    args = get_parser().parse_args(argv)
+    return args.run(args)
+
+
+
+# RUN COMMAND
+if __name__ == "__main__":
+    sys.exit(main())
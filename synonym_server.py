@@ -0,0 +1,506 @@
+# synonym-finder
+
+# This module contains a small HTTP server which loads semantic descriptors once
+# and answers synonym questions sent as JSON, so that other programs do not
+# need to build the descriptors themselves. Questions arriving within a short
+# window are answered together: every distinct (word, choice) pair of the
+# window is scored once with get_fused_sims, whatever the measure asked for.
+#
+#   POST /query  {"word": "...", "choices": ["...", ...], "measure": "cos"}
+#                -> {"answer": "..."}
+#   GET /stats   -> latency percentiles and throughput counters
+#
+# Run it with: python synonym_server.py --files war_and_peace.txt swanns_way.txt
+# and test it with: python -m doctest synonym_server.py
+
+# IMPORT MODULES
+import argparse
+import asyncio
+import collections
+import doctest
+import json
+import math
+import pickle
+import time
+from similarity_measures import FUSED_SIMILARITY_FNS, get_cos_sim, get_euc_sim, get_norm_euc_sim, get_fused_sims
+from descriptor_file import open_descriptor_file
+
+
+
+# DEFINE CONSTANTS
+# names of the similarity measures queries can ask for
+MEASURES = {'cos': get_cos_sim, 'euc': get_euc_sim, 'norm_euc': get_norm_euc_sim}
+
+# reasons given with the HTTP status codes the server uses
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  413: "Payload Too Large", 500: "Internal Server Error"}
+
+# largest body and number of headers a request may have
+MAX_BODY_BYTES = 1 << 20
+MAX_HEADERS = 100
+
+
+
+# DEFINE CLASSES
+class RequestError(ValueError):
+    """ Error raised when a request cannot be read, with the HTTP status
+    code the server answers it with.
+
+    >>> error = RequestError(413, "the body is too large")
+    >>> error.status, str(error)
+    (413, 'the body is too large')
+    """
+
+    def __init__(self, status, message):
+        """ (RequestError, int, str) -> NoneType
+
+        The method records the status code and the message of the error.
+        """
+        ValueError.__init__(self, message)
+        self.status = status
+
+
+class ServerStats:
+    """ Counters of the requests and batches answered by the server, with the
+    latency of the last max_latencies requests.
+
+    >>> stats = ServerStats()
+    >>> for latency in [0.001, 0.002, 0.003, 0.004]:
+    ...     stats.record_request(latency)
+    >>> stats.record_batch(4)
+    >>> summary = stats.get_summary()
+    >>> summary['requests'], summary['batches'], summary['mean_batch_size']
+    (4, 1, 4.0)
+    >>> summary['latency_ms']['p50'], summary['latency_ms']['p99']
+    (2.0, 4.0)
+    """
+
+    def __init__(self, max_latencies=10000):
+        """ (ServerStats, int) -> NoneType
+
+        The method creates empty counters.
+        """
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_questions = 0
+        self.latencies = collections.deque(maxlen=max_latencies)
+
+    def record_request(self, latency, error=False):
+        """ (ServerStats, float, bool) -> NoneType
+
+        The method records a request answered in latency seconds.
+        """
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.latencies.append(latency)
+
+    def record_batch(self, size):
+        """ (ServerStats, int) -> NoneType
+
+        The method records a batch of size questions.
+        """
+        self.batches += 1
+        self.batched_questions += size
+
+    def get_summary(self):
+        """ (ServerStats) -> dict
+
+        The method returns a dictionary of the counters, the throughput since the
+        server started and the percentiles of the recent latencies in milliseconds.
+        """
+        uptime = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+        return {'uptime_seconds': uptime, 'requests': self.requests, 'errors': self.errors,
+                'batches': self.batches,
+                'mean_batch_size': self.batched_questions / self.batches if self.batches else 0.0,
+                'requests_per_second': self.requests / uptime if uptime > 0 else 0.0,
+                'latency_ms': {name: get_percentile(latencies, fraction) * 1000
+                               for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99),
+                                                      ('max', 1.0))}}
+
+
+class QueryBatcher:
+    """ A queue of questions which are answered together once window seconds
+    have passed since the first one arrived, or once max_batch of them are waiting.
+    """
+
+    def __init__(self, semantic_descriptors, stats, window=0.002, max_batch=256):
+        """ (QueryBatcher, dict, ServerStats, float, int) -> NoneType
+
+        The method creates an empty queue answering questions with semantic_descriptors.
+        """
+        self.semantic_descriptors = semantic_descriptors
+        self.stats = stats
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.timer = None
+
+    async def answer(self, word, choices, similarity_fn):
+        """ (QueryBatcher, str, list, function) -> str
+
+        The method adds a question to the queue and returns its answer
+        once its batch has been answered.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(((word, choices, similarity_fn), future))
+
+        # start the window with the first question, or answer a full batch now
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """ (QueryBatcher) -> NoneType
+
+        The method answers every question waiting in the queue. The batch is
+        answered in a thread of the default executor of the event loop, so that
+        the loop keeps accepting connections and reading requests meanwhile.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        # answer the batch in a thread, then wake up the requests waiting for it
+        batch = asyncio.get_running_loop().run_in_executor(None, answer_questions,
+                                                           [question for question, future in pending],
+                                                           self.semantic_descriptors)
+        batch.add_done_callback(lambda batch: self.finish_batch(pending, batch))
+
+    def finish_batch(self, pending, batch):
+        """ (QueryBatcher, list, Future) -> NoneType
+
+        The method gives the answers of a batch, or the error raised while
+        answering it, to the requests waiting for them.
+        """
+        error = batch.exception() if not batch.cancelled() else asyncio.CancelledError()
+        if error is not None:
+            for question, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.stats.record_batch(len(pending))
+        for (question, future), answer in zip(pending, batch.result()):
+            if not future.done():
+                future.set_result(answer)
+
+
+
+# DEFINE FUNCTIONS
+def get_percentile(sorted_values, fraction):
+    """ (list, float) -> float
+
+    The function returns the value below which fraction of the sorted values
+    fall (nearest rank), or 0.0 if there are none.
+
+    >>> get_percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.9)
+    9
+    >>> get_percentile([], 0.5)
+    0.0
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def answer_questions(questions, semantic_descriptors):
+    """ (list, dict) -> list
+
+    The function takes a list of (word, choices, similarity function) questions,
+    where every similarity function is one of FUSED_SIMILARITY_FNS.
+    It returns the answer of each question, the same as most_sim_words gives,
+    scoring every distinct (word, choice) pair of the questions only once.
+
+    >>> c = {'furry' : 3, 'grumpy' : 5, 'nimble' : 4}
+    >>> f = {'furry' : 2, 'nimble' : 5}
+    >>> d = {'furry' : 3, 'bark' : 5, 'loyal' : 8}
+    >>> h = {'race' : 4, 'queen' : 2}
+    >>> sem_descs = {'cat' : c, 'feline' : f, 'dog' : d, 'horse' : h}
+    >>> answer_questions([('feline', ['dog', 'cat', 'horse'], get_cos_sim), \
+    ('feline', ['dog', 'horse'], get_euc_sim), ('unknown', ['dog'], get_cos_sim)], sem_descs)
+    ['cat', 'horse', '']
+    """
+    # score every distinct pair once
+    all_sims = {}
+    for word, choices, similarity_fn in questions:
+        for choice in choices:
+            if (word, choice) in all_sims:
+                continue
+            try:
+                all_sims[word, choice] = get_fused_sims(semantic_descriptors[word],
+                                                        semantic_descriptors[choice])
+            # in case one of the words has no semantic descriptor
+            except KeyError:
+                all_sims[word, choice] = (None, None, None)
+
+    # pick the answer of each question
+    answers = []
+    for word, choices, similarity_fn in questions:
+        position = FUSED_SIMILARITY_FNS.index(similarity_fn)
+        all_sem_sim = []
+        for choice in choices:
+            sem_sim = all_sims[word, choice][position]
+            all_sem_sim.append(float('-inf') if sem_sim is None else sem_sim)
+
+        # the first choice with the largest similarity, as pick_most_sim_choice gives
+        max_sem_sim = max(all_sem_sim, default=float('-inf'))
+        answers.append("" if max_sem_sim == float('-inf') else choices[all_sem_sim.index(max_sem_sim)])
+    return answers
+
+
+def parse_query(body):
+    """ (bytes) -> tuple
+
+    The function takes the body of a query and returns a tuple
+    (word, choices, similarity function).
+    It raises a ValueError if the query is not valid.
+
+    >>> word, choices, similarity_fn = parse_query(b'{"word": "Cat", "choices": ["dog", "feline"]}')
+    >>> word, choices, similarity_fn is get_cos_sim
+    ('cat', ['dog', 'feline'], True)
+    >>> parse_query(b'{"word": "cat", "choices": ["dog"], "measure": "manhattan"}')
+    Traceback (most recent call last):
+    ValueError: unknown measure: 'manhattan'
+    """
+    try:
+        query = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("the body is not valid JSON")
+    if type(query) != dict or type(query.get('word')) != str or type(query.get('choices')) != list \
+            or not all(type(choice) == str for choice in query['choices']):
+        raise ValueError("a query needs a word and a list of choices")
+    measure = query.get('measure', 'cos')
+    if measure not in MEASURES:
+        raise ValueError("unknown measure: %r" % (measure,))
+
+    # words are compared in lowercase, as in the descriptors
+    return query['word'].lower(), [choice.lower() for choice in query['choices']], MEASURES[measure]
+
+
+async def read_http_message(reader, max_body_bytes=MAX_BODY_BYTES):
+    """ (StreamReader, int) -> tuple
+
+    The function reads an HTTP/1.1 message and returns a tuple
+    (start line, dictionary of lowercase headers, body),
+    or None if the connection was closed before a new message.
+    It raises a RequestError with status 400 if the message is malformed, and
+    with status 413 if its body is larger than max_body_bytes, before reading it.
+
+    >>> async def read(data, max_body_bytes=MAX_BODY_BYTES):
+    ...     reader = asyncio.StreamReader()
+    ...     reader.feed_data(data)
+    ...     reader.feed_eof()
+    ...     try:
+    ...         return await read_http_message(reader, max_body_bytes)
+    ...     except RequestError as error:
+    ...         return error.status, str(error)
+    >>> asyncio.run(read(b"POST /query HTTP/1.1\\r\\nContent-Length: 2\\r\\n\\r\\n{}"))
+    ('POST /query HTTP/1.1', {'content-length': '2'}, b'{}')
+    >>> asyncio.run(read(b"POST /query HTTP/1.1\\r\\nContent-Length: two\\r\\n\\r\\n{}"))
+    (400, "invalid Content-Length: 'two'")
+    >>> asyncio.run(read(b"POST /query HTTP/1.1\\r\\nContent-Length: 5\\r\\n\\r\\n", 4))
+    (413, 'the body is larger than 4 bytes')
+    """
+    try:
+        start_line = await reader.readline()
+        if not start_line:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) == MAX_HEADERS:
+                raise RequestError(400, "too many headers")
+            name, colon, value = line.decode("latin-1").partition(":")
+            if not colon:
+                raise RequestError(400, "invalid header: %r" % (line.strip(),))
+            headers[name.strip().lower()] = value.strip()
+    except RequestError:
+        raise
+    # in case a line is longer than the limit of the reader
+    except ValueError:
+        raise RequestError(400, "a line of the message is too long")
+
+    # check the length of the body before reading it
+    length = headers.get('content-length', '0')
+    if not (length.isascii() and length.isdigit()):
+        raise RequestError(400, "invalid Content-Length: %r" % (length,))
+    if int(length) > max_body_bytes:
+        raise RequestError(413, "the body is larger than %d bytes" % max_body_bytes)
+    body = await reader.readexactly(int(length))
+    return start_line.decode("latin-1").strip(), headers, body
+
+
+def write_http_message(writer, start_line, payload, keep_alive=True):
+    """ (StreamWriter, str, object, bool) -> NoneType
+
+    The function writes an HTTP/1.1 message whose body is payload in JSON.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    head = "%s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n" % \
+        (start_line, len(body), "keep-alive" if keep_alive else "close")
+    writer.write(head.encode("latin-1") + body)
+
+
+async def handle_connection(reader, writer, batcher, stats):
+    """ (StreamReader, StreamWriter, QueryBatcher, ServerStats) -> NoneType
+
+    The function answers the requests of one connection until the client closes it.
+    """
+    try:
+        while True:
+            try:
+                message = await read_http_message(reader)
+            # answer a request that cannot be read, then close the connection
+            except RequestError as error:
+                write_http_message(writer, "HTTP/1.1 %d %s" % (error.status, STATUS_REASONS[error.status]),
+                                   {'error': str(error)}, keep_alive=False)
+                await writer.drain()
+                break
+            if message is None:
+                break
+            start_line, headers, body = message
+            start = time.perf_counter()
+            method, path = (start_line.split() + ["", ""])[:2]
+
+            # route the request
+            status = 200
+            if path == "/query" and method == "POST":
+                try:
+                    payload = {'answer': await batcher.answer(*parse_query(body))}
+                except ValueError as error:
+                    status, payload = 400, {'error': str(error)}
+                except Exception as error:
+                    status, payload = 500, {'error': str(error)}
+            elif path == "/stats" and method == "GET":
+                payload = stats.get_summary()
+            elif path in ("/query", "/stats"):
+                status, payload = 405, {'error': "method not allowed"}
+            else:
+                status, payload = 404, {'error': "not found"}
+
+            # answer and record the request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            write_http_message(writer, "HTTP/1.1 %d %s" % (status, STATUS_REASONS[status]), payload, keep_alive)
+            await writer.drain()
+            if path == "/query":
+                stats.record_request(time.perf_counter() - start, status != 200)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(semantic_descriptors, host="127.0.0.1", port=8765, unix_path=None,
+                       window=0.002, max_batch=256):
+    """ (dict, str, int, str, float, int) -> tuple
+
+    The function starts serving semantic_descriptors over TCP on host and port,
+    or over the Unix socket unix_path if it is given.
+    It returns a tuple (server, stats) where server is the asyncio server.
+
+    >>> async def demo():
+    ...     server, stats = await start_server({'cat': {'furry': 1}, 'feline': {'furry': 2}, \
+    'dog': {'bark': 3}}, port=0)
+    ...     reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname())
+    ...     answer = await request_json(reader, writer, "POST", "/query", \
+    {'word': 'feline', 'choices': ['dog', 'cat'], 'measure': 'cos'})
+    ...     status, summary = await request_json(reader, writer, "GET", "/stats")
+    ...     writer.close()
+    ...     await writer.wait_closed()
+    ...     await asyncio.sleep(0.05) # let the server see the connection close
+    ...     server.close()
+    ...     return answer, summary['requests'], summary['batches']
+    >>> asyncio.run(demo())
+    ((200, {'answer': 'cat'}), 1, 1)
+    """
+    stats = ServerStats()
+    batcher = QueryBatcher(semantic_descriptors, stats, window, max_batch)
+    callback = lambda reader, writer: handle_connection(reader, writer, batcher, stats)
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(callback, unix_path)
+    else:
+        server = await asyncio.start_server(callback, host, port)
+    return server, stats
+
+
+async def request_json(reader, writer, method, path, payload=None):
+    """ (StreamReader, StreamWriter, str, str, object) -> tuple
+
+    The function sends an HTTP request on an open connection to the server,
+    with payload in JSON as its body, and returns a tuple (status code,
+    decoded JSON body) of the response, whatever the method.
+    """
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    head = "%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n" % \
+        (method, path, len(body))
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+    start_line, headers, body = await read_http_message(reader)
+    return int(start_line.split()[1]), json.loads(body)
+
+
+def load_semantic_descriptors(files=None, descriptor_file=None, pickle_file=None):
+    """ (list, str, str) -> dict
+
+    The function returns the semantic descriptors built from files with their
+    norms recorded, or read from a descriptor file or from a pickle file.
+    """
+    if descriptor_file is not None:
+        return open_descriptor_file(descriptor_file)
+    if pickle_file is not None:
+        fobj = open(pickle_file, "rb")
+        try:
+            return pickle.load(fobj)
+        finally:
+            fobj.close()
+
+    # the build machinery is only loaded when the descriptors are built here
+    from file_processing import build_semantic_descriptors_from_files
+    return build_semantic_descriptors_from_files(files, record_norms=True)
+
+
+async def serve(semantic_descriptors, host, port, unix_path, window, max_batch):
+    """ (dict, str, int, str, float, int) -> NoneType
+
+    The function serves semantic_descriptors until it is interrupted.
+    """
+    server, stats = await start_server(semantic_descriptors, host, port, unix_path, window, max_batch)
+    print("serving on %s" % (unix_path or "http://%s:%d" % server.sockets[0].getsockname()[:2]), flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+
+# RUN SERVER
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer synonym questions over HTTP.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--files", nargs="+", help="text files to build the descriptors from")
+    source.add_argument("--descriptor-file", help="descriptor file written by save_descriptor_file")
+    source.add_argument("--pickle", help="pickled dictionary of semantic descriptors")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="serve on this Unix socket instead of TCP")
+    parser.add_argument("--window-ms", type=float, default=2.0,
+                        help="how long the first question of a batch waits for others")
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args()
+
+    descriptors = load_semantic_descriptors(args.files, args.descriptor_file, args.pickle)
+    try:
+        asyncio.run(serve(descriptors, args.host, args.port, args.unix, args.window_ms / 1000, args.max_batch))
+    except KeyboardInterrupt:
+        pass
@@ -4,19 +4,38 @@
 
 # IMPORT MODULES
 from file_processing import *
-import matplotlib.pyplot as plt
 import doctest
+import math
+import sys
 
 
 
 # DEFINE FUNCTIONS
-def most_sim_word(word, choices, semantic_descriptors, similarity_fn):
-    """ (str, list, dict, function) -> str
+def is_dense_embeddings(semantic_descriptors):
+    """ (object) -> bool
+    
+    The function returns True if semantic_descriptors is a DenseEmbeddings.
+    dense_embeddings, which needs NumPy, is never imported here: embeddings
+    can only exist once it was imported by whoever made them.
+    
+    >>> is_dense_embeddings({'cat' : {'furry' : 3}})
+    False
+    """
+    module = sys.modules.get('dense_embeddings')
+    return module is not None and isinstance(semantic_descriptors, module.DenseEmbeddings)
+
+
+def most_sim_word(word, choices, semantic_descriptors, similarity_fn, similarity_cache=None):
+    """ (str, list, dict, function, SimilarityCache) -> str
     
     The function returns the element of choices which has the largest
     semantic similarity to word, with the semantic similarity computed
     using the data in semantic_descriptors and the similarity function
     similarity_fn.
+    If a SimilarityCache is given, the similarities are looked up in it
+    and only computed when it does not have them.
+    If semantic_descriptors is a DenseEmbeddings, the choice is picked by
+    dense_most_sim_word, without the cache.
 
     >>> choices = ['dog', 'cat', 'horse']
     >>> c = {'furry' : 3, 'grumpy' : 5, 'nimble' : 4}
@@ -71,12 +90,37 @@ def most_sim_word(word, choices, semantic_descriptors, similarity_fn):
     >>> sem_descs = {'a' : {}, 'b' : {}, 'c' : {}}
     >>> most_sim_word('c', choices, sem_descs, get_cos_sim) # all has sim of -inf
     ''
+    
+    >>> from similarity_cache import SimilarityCache
+    >>> cache = SimilarityCache()
+    >>> sem_descs = {'cat' : {'furry' : 3, 'grumpy' : 5, 'nimble' : 4}, 'feline' : {'furry' : 2, 'nimble' : 5}, \
+    'dog' : {'furry' : 3, 'bark' : 5, 'loyal' : 8}, 'horse' : {'race' : 4, 'queen' : 2}}
+    >>> most_sim_word('feline', ['dog', 'cat', 'horse'], sem_descs, get_cos_sim, cache)
+    'cat'
+    >>> most_sim_word('cat', ['feline', 'dog'], sem_descs, get_cos_sim, cache)
+    'feline'
+    >>> cache.get_stats()
+    {'hits': 1, 'misses': 4, 'evictions': 0, 'entries': 4}
+    
+    >>> from dense_embeddings import project_descriptors
+    >>> embeddings = project_descriptors(sem_descs)
+    >>> most_sim_word('feline', ['dog', 'cat', 'horse'], embeddings, get_cos_sim, cache)
+    'cat'
     """
+    # in case the descriptors are dense vectors
+    if is_dense_embeddings(semantic_descriptors):
+        from dense_embeddings import dense_most_sim_word
+        return dense_most_sim_word(word, choices, semantic_descriptors, similarity_fn)
+    
     # initialize a variable to store all the semantic similarities
     all_sem_sim = []
     
     # compute the semantic similarity of each choice to word
     for choice in choices:
+        # in case the similarities are cached
+        if similarity_cache is not None:
+            all_sem_sim.append(similarity_cache.get_similarity(word, choice, semantic_descriptors, similarity_fn))
+            continue
         try:
             sem_sim = similarity_fn(semantic_descriptors[word], semantic_descriptors[choice])
             # add the semantic similarity to the list of all semantic similarities
@@ -99,12 +143,229 @@ def most_sim_word(word, choices, semantic_descriptors, similarity_fn):
     return choices[max_index]
     
 
-def run_sim_test(filename, semantic_descriptors, similarity_fn):
-    """ (str, dict, function) -> float
+def pick_most_sim_choice(choices, all_sem_sim):
+    """ (list, list) -> str
+    
+    The function takes a list of choices and their semantic similarities.
+    It returns the first choice with the largest similarity, or an empty
+    string if no similarity could be computed (all of them are -inf).
+    
+    >>> pick_most_sim_choice(['a', 'b', 'c'], [0.5, 0.7, 0.7])
+    'b'
+    >>> pick_most_sim_choice(['a', 'b'], [float('-inf'), float('-inf')])
+    ''
+    """
+    # determine the largest semantic similarity to word
+    max_sem_sim = max(all_sem_sim)
+    if max_sem_sim == float('-inf'):
+        return ""
+    
+    # return the choice at the index of its first occurence
+    return choices[all_sem_sim.index(max_sem_sim)]
+
+
+def most_sim_words(word, choices, semantic_descriptors, similarity_fns):
+    """ (str, list, dict, list) -> list
+    
+    The function returns a list holding, for each similarity function of
+    similarity_fns, the element of choices most_sim_word would return with it.
+    When every function is one of FUSED_SIMILARITY_FNS, each pair of vectors
+    is visited once with get_fused_sims to compute all the similarities.
+    
+    >>> choices = ['fruit', 'color', 'gender', 'autumn']
+    >>> f = {'orange' : 3, 'avocado' : 2, 'sweet' : 2, 'green' : 1}
+    >>> c = {'orange' : 2, 'red' : 5, 'dark' : 1, 'blue' : 6, 'yellow' : 1}
+    >>> g = {'male' : 4, 'neutral' : 1, 'female' : 2, 'she' : 4, 'they' : 3, 'he' : 3}
+    >>> a = {'fall' : 2, 'leaves' : 4, 'red' : 3, 'green' : 1}
+    >>> r = {'red' : 2, 'orange' : 2, 'yellow' : 1, 'green' : 4, 'blue' : 1, 'indigo' : 3, 'violet' : 1}
+    >>> sem_descs = {'fruit' : f, 'color' : c, 'gender' : g, 'autumn' : a, 'rainbow' : r}
+    >>> fns = [get_cos_sim, get_euc_sim, get_norm_euc_sim]
+    >>> most_sim_words('rainbow', choices, sem_descs, fns)
+    ['color', 'fruit', 'color']
+    >>> [most_sim_word('rainbow', choices, sem_descs, fn) for fn in fns]
+    ['color', 'fruit', 'color']
+    >>> most_sim_words('nothing', choices, sem_descs, fns)
+    ['', '', '']
+    
+    >>> import random
+    >>> generator = random.Random(0)
+    >>> vocabulary = ['w%d' % index for index in range(30)]
+    >>> text = [[generator.choice(vocabulary) for index in range(12)] for sentence in range(200)]
+    >>> sem_descs = get_all_semantic_descriptors_windowed(text, 3, 'harmonic')
+    >>> all(most_sim_words(word, vocabulary, sem_descs, fns) ==
+    ...     [most_sim_word(word, vocabulary, sem_descs, fn) for fn in fns] for word in vocabulary)
+    True
+    """
+    # in case some functions cannot be fused or the descriptors are dense vectors,
+    # call each function separately
+    if any(fn not in FUSED_SIMILARITY_FNS for fn in similarity_fns) or is_dense_embeddings(semantic_descriptors):
+        return [most_sim_word(word, choices, semantic_descriptors, fn) for fn in similarity_fns]
+    
+    # compute all the similarities of each choice to word at once
+    positions = [FUSED_SIMILARITY_FNS.index(fn) for fn in similarity_fns]
+    all_sem_sims = [[] for fn in similarity_fns]
+    for choice in choices:
+        try:
+            sims = get_fused_sims(semantic_descriptors[word], semantic_descriptors[choice])
+        # in case one of the words has no semantic descriptor
+        except KeyError:
+            sims = (None, None, None)
+        for index, position in enumerate(positions):
+            sem_sim = sims[position]
+            all_sem_sims[index].append(float('-inf') if sem_sim is None else sem_sim)
+    
+    # return the choice picked with each similarity function
+    return [pick_most_sim_choice(choices, all_sem_sim) for all_sem_sim in all_sem_sims]
+
+
+def answer_quiz_lines(lines, semantic_descriptors, similarity_fns, many_fns, similarity_cache=None):
+    """ (iterable, dict, list, bool, SimilarityCache) -> generator
+    
+    The function takes the lines of a quiz file and yields, for every line,
+    a tuple (words, answers) holding the words of the line and the list of the
+    answers given with each similarity function of similarity_fns: by
+    most_sim_words if many_fns is True, and by most_sim_word otherwise.
+    If a SimilarityCache is given, every answer is given by most_sim_word with it.
+    
+    >>> sem_descs = {'cat' : {'fur' : 1}, 'feline' : {'fur' : 1}, 'dog' : {'bark' : 1}}
+    >>> list(answer_quiz_lines(['feline cat dog cat\\n'], sem_descs, [get_cos_sim], False))
+    [(['feline', 'cat', 'dog', 'cat'], ['cat'])]
+    """
+    for line in lines:
+        words = line.split()
+        if similarity_cache is not None:
+            answers = [most_sim_word(words[0], words[2:], semantic_descriptors, similarity_fn, similarity_cache)
+                       for similarity_fn in similarity_fns]
+        elif many_fns:
+            answers = most_sim_words(words[0], words[2:], semantic_descriptors, similarity_fns)
+        else:
+            answers = [most_sim_word(words[0], words[2:], semantic_descriptors, similarity_fns[0])]
+        yield words, answers
+
+
+def init_quiz_worker(quiz_state):
+    """ (dict) -> NoneType
+    
+    The function stores quiz_state, holding the lines, the semantic descriptors,
+    the similarity functions and the cache of answer_quiz_in_parallel, in the
+    worker process it runs in. It is the initializer of those worker processes,
+    so the state is only ever stored in them, never in the process answering
+    the quiz.
+    """
+    global worker_quiz_state
+    worker_quiz_state = quiz_state
+
+
+def answer_quiz_range(task):
+    """ (tuple) -> list
+    
+    The function takes a (start, end) range of the lines stored by init_quiz_worker.
+    It returns the list of answers of every line of the range, as given by
+    answer_quiz_lines. It runs in the worker processes of answer_quiz_in_parallel.
+    """
+    start, end = task
+    state = worker_quiz_state
+    return [answers for words, answers in answer_quiz_lines(state['lines'][start:end], state['semantic_descriptors'],
+                                                             state['similarity_fns'], state['many_fns'],
+                                                             state['similarity_cache'])]
+
+
+def answer_quiz_in_parallel(lines, semantic_descriptors, similarity_fns, many_fns, workers, chunk_questions=None,
+                            similarity_cache=None):
+    """ (list, dict, list, bool, int, int, SimilarityCache) -> generator
+    
+    The function yields the same tuples as answer_quiz_lines, in the same order,
+    but answers the lines chunk_questions at a time in a pool of worker processes.
+    The lines, the descriptors and the functions are handed to the workers as
+    the arguments of their initializer, which forked processes inherit without
+    pickling, so they read them through copy-on-write memory and only the
+    ranges of lines and the answers are sent between processes.
+    Where processes cannot be forked safely, because the platform has no fork
+    or because other threads are running, the lines are answered in this process.
+    Each worker uses its own copy of similarity_cache, so the cache of this
+    process is not filled.
+    
+    >>> sem_descs = {'cat' : {'fur' : 1}, 'feline' : {'fur' : 1}, 'dog' : {'bark' : 1}}
+    >>> lines = ['feline cat dog cat\\n', 'cat feline dog feline\\n', 'dog dog cat feline\\n'] * 10
+    >>> fns = [get_cos_sim, get_euc_sim]
+    >>> list(answer_quiz_in_parallel(lines, sem_descs, fns, True, 2, 4)) == \
+    list(answer_quiz_lines(lines, sem_descs, fns, True))
+    True
+    """
+    # in case processes cannot be forked, or a thread could hold a lock while forking
+    import multiprocessing
+    import threading
+    if 'fork' not in multiprocessing.get_all_start_methods() or threading.active_count() > 1:
+        yield from answer_quiz_lines(lines, semantic_descriptors, similarity_fns, many_fns, similarity_cache)
+        return
+    
+    # split the lines into chunks, several per worker to balance their work
+    if chunk_questions is None:
+        chunk_questions = max(1, math.ceil(len(lines) / (workers * 8)))
+    tasks = [(start, min(start + chunk_questions, len(lines))) for start in range(0, len(lines), chunk_questions)]
+    
+    # hand the state to the workers, then answer the chunks in order
+    from concurrent.futures import ProcessPoolExecutor
+    quiz_state = {'lines': lines, 'semantic_descriptors': semantic_descriptors, 'similarity_fns': similarity_fns,
+                  'many_fns': many_fns, 'similarity_cache': similarity_cache}
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                   initializer=init_quiz_worker, initargs=(quiz_state,))
+    try:
+        for (start, end), chunk_answers in zip(tasks, executor.map(answer_quiz_range, tasks)):
+            for line, answers in zip(lines[start:end], chunk_answers):
+                yield line.split(), answers
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def run_sim_test(filename, semantic_descriptors, similarity_fn, instrumentation=None, workers=1,
+                 return_answers=False, similarity_cache=None):
+    """ (str, dict, function, Instrumentation, int, bool, SimilarityCache) -> float
     
     The function returns the percentage (between 0.0 and 100.0) of question on which
     most_sim_word guesses the answer correctly using the semantic descriptors
     stored in semantic_descriptors and the similarity function similarity_fn.
+    similarity_fn can also be a list of similarity functions, in which case all
+    of them are evaluated in a single sweep with most_sim_words and a list of
+    percentages is returned.
+    If an Instrumentation is given, the time taken to answer the questions is
+    added to it as the 'answer' stage, with the number of questions, choices
+    and correct answers as counters, and its progress callback is called
+    after each question.
+    If workers is more than 1, the questions are answered by that many processes
+    with answer_quiz_in_parallel, which gives the same answers.
+    If return_answers is True, a tuple (percentage, answers) is returned instead,
+    answers being the list of the answers to each question in the order of the
+    file (a list of answers per question when similarity_fn is a list).
+    If a SimilarityCache is given, the questions are answered by most_sim_word
+    with it, so that the similarities computed for one quiz file are reused
+    for the next ones.
+    semantic_descriptors can also be a DenseEmbeddings, whose questions are
+    answered as run_sim_test_dense answers them.
+    
+    >>> import tempfile
+    >>> quiz = os.path.join(tempfile.mkdtemp(), 'quiz.txt')
+    >>> with open(quiz, 'w') as fobj:
+    ...     _ = fobj.write('feline cat dog cat\\ncat feline dog feline\\ndog cat dog feline\\n' * 10)
+    >>> sem_descs = {'cat' : {'fur' : 1}, 'feline' : {'fur' : 1}, 'dog' : {'bark' : 1}}
+    >>> run_sim_test(quiz, sem_descs, get_cos_sim, return_answers=True)[1][:3]
+    ['cat', 'feline', 'dog']
+    >>> run_sim_test(quiz, sem_descs, get_cos_sim, workers=2, return_answers=True) == \
+    run_sim_test(quiz, sem_descs, get_cos_sim, return_answers=True)
+    True
+    >>> run_sim_test(quiz, sem_descs, [get_cos_sim, get_euc_sim], workers=2)
+    [66.66666666666666, 66.66666666666666]
+    >>> from similarity_cache import SimilarityCache
+    >>> cache = SimilarityCache()
+    >>> run_sim_test(quiz, sem_descs, [get_cos_sim, get_euc_sim], similarity_cache=cache)
+    [66.66666666666666, 66.66666666666666]
+    >>> cache.get_stats()
+    {'hits': 112, 'misses': 8, 'evictions': 0, 'entries': 8}
+    >>> from dense_embeddings import project_descriptors, run_sim_test_dense
+    >>> embeddings = project_descriptors(sem_descs)
+    >>> run_sim_test(quiz, embeddings, get_cos_sim, return_answers=True) == \
+    run_sim_test_dense(quiz, embeddings, get_cos_sim)
+    True
     
     >>> descriptors = build_semantic_descriptors_from_files(['test.txt'])
     >>> run_sim_test('test.txt', descriptors, get_cos_sim)
@@ -121,53 +382,84 @@ def run_sim_test(filename, semantic_descriptors, similarity_fn):
     67.5
     >>> run_sim_test('test.txt', descriptors, get_euc_sim)
     35.0
+    >>> run_sim_test('test.txt', descriptors, [get_cos_sim, get_euc_sim, get_norm_euc_sim])
+    [67.5, 35.0, 67.5]
     """
     # open file
     fobj= open(filename,"r", encoding= "UTF-8")
     
+    # in case several similarity functions are evaluated at once
+    many_fns = type(similarity_fn) in (list, tuple)
+    similarity_fns = list(similarity_fn) if many_fns else [similarity_fn]
+    
     # initialize counter variables
-    correct_answers = 0
+    correct_answers = [0] * len(similarity_fns)
     num_of_lines = 0
+    num_of_choices = 0
+    all_answers = []
     
-    # compute the answer for every line/question based on the similarity function
-    for line in fobj:
-        words = line.split()
-        answer = most_sim_word(words[0], words[2:], semantic_descriptors, similarity_fn)
-        
-        # update counter in case the answer is correct
-        if answer == words[1]:
-            correct_answers += 1
-        
-        # update the number of questions answered
-        num_of_lines += 1
+    # answer the questions in this process, or in a pool of processes
+    if workers > 1:
+        questions = answer_quiz_in_parallel(fobj.readlines(), semantic_descriptors, similarity_fns, many_fns,
+                                            workers, similarity_cache=similarity_cache)
+    else:
+        questions = answer_quiz_lines(fobj, semantic_descriptors, similarity_fns, many_fns, similarity_cache)
+    
+    # compute the answer for every line/question based on the similarity functions
+    with get_stage(instrumentation, 'answer'):
+        for words, answers in questions:
+            # keep the answers in case they are returned
+            if return_answers:
+                all_answers.append(answers if many_fns else answers[0])
+            
+            # update counters in case the answers are correct
+            for index in range(len(answers)):
+                if answers[index] == words[1]:
+                    correct_answers[index] += 1
+            
+            # update the number of questions answered
+            num_of_lines += 1
+            num_of_choices += len(words) - 2
+            if instrumentation is not None:
+                instrumentation.report_progress('questions', num_of_lines)
         
     # close file
     fobj.close()
     
-    # compute and return the percentage of correct answers
-    percentage = (correct_answers/num_of_lines) * 100
-    return percentage
+    # count the questions answered
+    if instrumentation is not None:
+        instrumentation.count('questions', num_of_lines)
+        instrumentation.count('choices', num_of_choices)
+        instrumentation.count('correct_answers', sum(correct_answers))
+    
+    # compute and return the percentages of correct answers
+    percentages = [(correct/num_of_lines) * 100 for correct in correct_answers]
+    result = percentages if many_fns else percentages[0]
+    if return_answers:
+        return result, all_answers
+    return result
 
 
-def generate_bar_graph(similarity_fn, filename):
-    """ (list, str) -> NoneType
+def generate_bar_graph(similarity_fn, filename, cache=None, files=('war_and_peace.txt', 'swanns_way.txt'),
+                       output="synonyms_test_results.png"):
+    """ (list, str, DescriptorCache, list, str) -> NoneType
     
     The function generates a bar graph (using matplotlib) where the performance
     of each function on the given file test is plotted.
-    The graph is saved in a file named synonyms_test_results.png
+    The graph is saved in a file named synonyms_test_results.png, or output.
+    The semantic descriptors are built from the two novels, or from files.
+    If a DescriptorCache is given, the descriptors of the files
+    are loaded from it instead of being computed again.
     
     """
-    # initialize an empty list to store each function's score
-    performances = []
+    # matplotlib is slow to import, so it is only imported to plot
+    import matplotlib.pyplot as plt
     
-    # generate the semantic descriptor vectors from the two novels
-    descriptors = build_semantic_descriptors_from_files(['war_and_peace.txt', 'swanns_way.txt'])
+    # generate the semantic descriptor vectors from the novels
+    descriptors = build_semantic_descriptors_from_files(list(files), cache)
     
-    # evaluate the performance given by each similarity function
-    for sim_fn in similarity_fn:
-        performance = run_sim_test(filename, descriptors, sim_fn)
-        # append the score to the list
-        performances.append(performance)
+    # evaluate the performance given by every similarity function in one sweep
+    performances = run_sim_test(filename, descriptors, similarity_fn)
     
     # convert the function names into strings
     for index in range(len(similarity_fn)):
@@ -181,7 +473,7 @@ def generate_bar_graph(similarity_fn, filename):
     plt.ylabel("Score (%)", fontsize = 10)
     
     # save the graph
-    plt.savefig("synonyms_test_results.png")
+    plt.savefig(output)
 
 
 
@@ -0,0 +1,228 @@
+# synonym-finder
+
+# This module contains functions to generate synthetic corpora and quiz files,
+# so that the program can be tested and benchmarked without the novels.
+# Words are drawn from a Zipf distribution over a made-up vocabulary. Every
+# word belongs to a topic, and every sentence is about one topic whose words
+# it uses more often, so that words of the same topic share their contexts.
+# Some words have a synonym: a new word which replaces them half of the time,
+# so that both appear in the same contexts and a quiz can ask for it.
+
+# IMPORT MODULES
+import doctest
+import itertools
+import math
+import os
+import random
+import tempfile
+
+
+
+# DEFINE CONSTANTS
+# syllables the made-up words are built from
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "pe", "du", "ga", "ho", "ri", "zu", "be", "fa"]
+
+# distributions the length of the sentences can follow
+LENGTH_DISTRIBUTIONS = ('poisson', 'uniform', 'geometric')
+
+
+
+# DEFINE CLASSES
+class SyntheticLanguage:
+    """ A made-up vocabulary whose words are drawn with Zipf frequencies,
+    where the frequency of the word of rank r is proportional to 1 / r ** zipf.
+    Every word belongs to one of topics topics, and each word of a sentence
+    is drawn from the words of the topic of the sentence with probability
+    topic_weight (keeping their relative frequencies). The words of middle frequency at ranks 20, 30, 40... are each given
+    a synonym, up to the given number of them (synonyms maps them to it).
+
+    >>> language = SyntheticLanguage(vocabulary=100, zipf=1.0, synonyms=3, seed=1)
+    >>> len(language.words), len(language.synonyms)
+    (100, 3)
+    >>> language.words[:4]
+    ['ka', 'lo', 'mi', 'ne']
+    >>> sorted(language.synonyms.items())[0]
+    ('kabe', 'tata')
+    """
+
+    def __init__(self, vocabulary=5000, zipf=1.1, synonyms=100, topics=50, topic_weight=0.5, seed=0):
+        """ (SyntheticLanguage, int, float, int, int, float, int) -> NoneType
+
+        The method creates a language of vocabulary words.
+        It raises a ValueError if the vocabulary is too small for the synonyms.
+        """
+        if 20 + 10 * (synonyms - 1) >= vocabulary and synonyms > 0:
+            raise ValueError("the vocabulary is too small for %d synonyms" % synonyms)
+
+        # make up the words, the most frequent ones being the shortest
+        self.words = get_synthetic_words(vocabulary + synonyms)
+        synonym_words = self.words[vocabulary:]
+        self.words = self.words[:vocabulary]
+        self.zipf = zipf
+        self.topic_weight = topic_weight
+        self.seed = seed
+
+        # compute the cumulative frequencies of the words
+        weights = [1 / (rank ** zipf) for rank in range(1, vocabulary + 1)]
+        self.cumulative_weights = list(itertools.accumulate(weights))
+
+        # put every word in a topic, and compute the frequencies within each topic
+        generator = random.Random(seed)
+        self.topics = [generator.randrange(topics) for word in self.words]
+        self.topic_words = [[] for topic in range(topics)]
+        topic_weights = [[] for topic in range(topics)]
+        for word, topic, weight in zip(self.words, self.topics, weights):
+            self.topic_words[topic].append(word)
+            topic_weights[topic].append(weight)
+        self.topic_cumulative_weights = [list(itertools.accumulate(weights)) for weights in topic_weights]
+
+        # give a synonym to words of middle frequency
+        self.synonyms = {}
+        for index in range(synonyms):
+            self.synonyms[self.words[20 + 10 * index]] = synonym_words[index]
+
+    def get_sentence_words(self, generator, length):
+        """ (SyntheticLanguage, Random, int) -> list
+
+        The method draws the words of a sentence of the given length.
+        """
+        # pick the topic of the sentence among the topics which have words
+        topic = generator.randrange(len(self.topic_words))
+        while not self.topic_words[topic]:
+            topic = generator.randrange(len(self.topic_words))
+
+        # draw words of the topic or of the whole vocabulary
+        words = generator.choices(self.words, cum_weights=self.cumulative_weights, k=length)
+        topic_words = generator.choices(self.topic_words[topic], cum_weights=self.topic_cumulative_weights[topic],
+                                        k=length)
+        for index in range(length):
+            if generator.random() < self.topic_weight:
+                words[index] = topic_words[index]
+
+        # replace the words which have a synonym half of the time
+        for index, word in enumerate(words):
+            if word in self.synonyms and generator.random() < 0.5:
+                words[index] = self.synonyms[word]
+        return words
+
+
+
+# DEFINE FUNCTIONS
+def get_synthetic_words(count):
+    """ (int) -> list
+
+    The function returns count distinct made-up words built from SYLLABLES,
+    shortest first.
+
+    >>> get_synthetic_words(3), get_synthetic_words(18)[-2:]
+    (['ka', 'lo', 'mi'], ['kaka', 'kalo'])
+    """
+    words = []
+    for length in itertools.count(1):
+        for syllables in itertools.product(SYLLABLES, repeat=length):
+            if len(words) == count:
+                return words
+            words.append("".join(syllables))
+
+
+def get_sentence_length(generator, mean, distribution):
+    """ (Random, float, str) -> int
+
+    The function draws the length of a sentence, at least 1, from a distribution
+    of the given mean: 'poisson', 'uniform' (between 1 and 2 * mean - 1)
+    or 'geometric'.
+    It raises a ValueError if the distribution is unknown.
+
+    >>> generator = random.Random(0)
+    >>> lengths = [get_sentence_length(generator, 10, 'uniform') for index in range(1000)]
+    >>> min(lengths), max(lengths)
+    (1, 19)
+    """
+    if distribution == 'poisson':
+        # count the events of a Poisson process until the mean is used up (Knuth)
+        limit = math.exp(-mean)
+        length = 0
+        product = generator.random()
+        while product > limit:
+            length += 1
+            product *= generator.random()
+        return max(1, length)
+    if distribution == 'uniform':
+        return generator.randint(1, max(1, round(2 * mean - 1)))
+    if distribution == 'geometric':
+        return max(1, math.ceil(math.log(1 - generator.random()) / math.log(1 - 1 / mean)))
+    raise ValueError("unknown sentence length distribution: %r" % (distribution,))
+
+
+def generate_corpus(filename, language, sentences=10000, length_mean=15, length_distribution='poisson',
+                    seed=0):
+    """ (str, SyntheticLanguage, int, float, str, int) -> NoneType
+
+    The function writes a text file of sentences made of the words of language.
+    Sentences start with a capital letter and end with '.', '!' or '?',
+    and some words are followed by a comma, so that the text goes through
+    every step of the tokenizer.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> filename = os.path.join(directory, 'corpus.txt')
+    >>> language = SyntheticLanguage(vocabulary=100, synonyms=3)
+    >>> generate_corpus(filename, language, sentences=5, length_mean=4)
+    >>> open(filename).read().count('.') + open(filename).read().count('!') + open(filename).read().count('?')
+    5
+    """
+    generator = random.Random(seed)
+    fobj = open(filename, "w", encoding="utf-8")
+    try:
+        for index in range(sentences):
+            length = get_sentence_length(generator, length_mean, length_distribution)
+            words = language.get_sentence_words(generator, length)
+
+            # punctuate the sentence
+            words[0] = words[0].capitalize()
+            for position in range(len(words) - 1):
+                if generator.random() < 0.05:
+                    words[position] += ","
+            ending = generator.choice(".!?") if generator.random() < 0.2 else "."
+            separator = "\n" if generator.random() < 0.1 else " "
+            fobj.write(" ".join(words) + ending + separator)
+    finally:
+        fobj.close()
+
+
+def generate_quiz(filename, language, choices=4, seed=0):
+    """ (str, SyntheticLanguage, int, int) -> NoneType
+
+    The function writes a quiz file with one question per synonym of language:
+    the word, its synonym, then choices choices (the synonym and words of
+    similar frequency from other topics) in a random order.
+
+    >>> directory = tempfile.mkdtemp()
+    >>> filename = os.path.join(directory, 'quiz.txt')
+    >>> generate_quiz(filename, SyntheticLanguage(vocabulary=100, synonyms=3))
+    >>> lines = open(filename).read().splitlines()
+    >>> len(lines), [len(line.split()) for line in lines]
+    (3, [6, 6, 6])
+    >>> all(line.split()[1] in line.split()[2:] for line in lines)
+    True
+    """
+    generator = random.Random(seed)
+    ranks = {word: rank for rank, word in enumerate(language.words)}
+    fobj = open(filename, "w", encoding="utf-8")
+    try:
+        for word, synonym in language.synonyms.items():
+            # pick wrong choices among the words ranked close to the word
+            rank = ranks[word]
+            neighbours = [other for other in language.words[max(0, rank - 20) : rank + 20]
+                          if other != word and other not in language.synonyms
+                          and language.topics[ranks[other]] != language.topics[rank]]
+            question_choices = generator.sample(neighbours, choices - 1) + [synonym]
+            generator.shuffle(question_choices)
+            fobj.write(" ".join([word, synonym] + question_choices) + "\n")
+    finally:
+        fobj.close()
+
+
+
+# TEST MODULE
+if __name__ == "__main__":
+    doctest.testmod()
@@ -5,6 +5,314 @@
 # IMPORT MODULES
 import math
 import doctest
+from array import array
+from bisect import bisect_left
+
+
+
+# DEFINE CLASSES
+class NormedVector(dict):
+    """ A dictionary representing a vector which also records its sum of squares
+    (square), its norm (norm) and, if requested, a normalized copy of itself
+    (normalized, None otherwise). The recorded values are computed once when
+    the vector is created, so the vector must not be modified afterwards.
+
+    >>> v = NormedVector({'a' : 3, 'b' : 4})
+    >>> v == {'a' : 3, 'b' : 4}
+    True
+    >>> v.square, v.norm, v.normalized
+    (25, 5.0, None)
+    >>> v = NormedVector({}, normalized=True)
+    >>> v.norm, v.normalized
+    (0.0, {})
+    """
+
+    def __init__(self, vector, normalized=False):
+        """ (NormedVector, dict, bool) -> NoneType
+
+        The method creates a copy of vector and records its norm,
+        and a normalized copy of it if normalized is True.
+        """
+        dict.__init__(self, vector)
+
+        # record the sum of squares and the norm, as get_vector_norm computes them
+        sum_of_squares = 0
+        for key in self:
+            sum_of_squares += (self[key])**2
+        self.square = sum_of_squares
+        self.norm = math.sqrt(sum_of_squares)
+
+        # record the normalized copy
+        self.normalized = None
+        if normalized:
+            self.normalized = dict(self)
+            normalize_vector(self.normalized)
+
+    def __reduce__(self):
+        return (NormedVector, (dict(self), self.normalized is not None))
+
+
+class SparseVector:
+    """ A vector stored as two arrays: the ids of its non-zero components in
+    increasing order (ids, of typecode 'I') and their values (values, of typecode
+    'q' for counts or 'd' for floats). It takes 12 bytes per component,
+    where a dictionary takes about 100. Words are turned into ids by a dictionary
+    shared by all the vectors (word_ids, see from_dict). The norm is computed once
+    and kept in norm until the vector changes (None until then).
+
+    The functions of this module accept SparseVectors instead of dictionaries.
+    A dictionary given along with a SparseVector is looked up or converted with
+    the word ids of the SparseVector, which must come from from_dict, and a
+    SparseVector added to a dictionary is read through items.
+
+    >>> word_ids = {}
+    >>> v1 = SparseVector.from_dict({'b' : 3, 'a' : 4}, word_ids)
+    >>> v2 = SparseVector.from_dict({'a' : 1, 'c' : 2}, word_ids)
+    >>> v1, word_ids
+    (SparseVector([0, 1], [3, 4]), {'b': 0, 'a': 1, 'c': 2})
+    >>> v1.get_dot_product(v2), v1.get_norm()
+    (4, 5.0)
+    >>> v1.get_sum(v2, -1).to_dict(list(word_ids)) == {'b' : 3, 'a' : 3, 'c' : -2}
+    True
+    >>> v1.get_dot_product({'a' : 2, 'd' : 5}), get_dot_product({'a' : 2}, v1)
+    (8, 8)
+    >>> v1.get_sum({'c' : 1, 'd' : 1}).to_dict(list(word_ids)) == {'b' : 3, 'a' : 4, 'c' : 1, 'd' : 1}
+    True
+    >>> SparseVector([0], [1]).get_dot_product({'a' : 1})
+    Traceback (most recent call last):
+    TypeError: a dictionary can only be used with a SparseVector made by from_dict
+    """
+
+    __slots__ = ('ids', 'values', 'norm', 'word_ids')
+
+    def __init__(self, ids=(), values=(), typecode='q', word_ids=None):
+        """ (SparseVector, iterable, iterable, str, dict) -> NoneType
+
+        The method creates a vector from the ids of its components,
+        which must be distinct and in increasing order, and their non-zero values.
+        word_ids maps words to ids, if it is known.
+        """
+        self.ids = array('I', ids)
+        self.values = array(typecode, values)
+        self.norm = None
+        self.word_ids = word_ids
+
+    @classmethod
+    def from_dict(cls, vector, word_ids):
+        """ (type, dict, dict) -> SparseVector
+
+        The method returns the SparseVector of a dictionary representing a vector.
+        word_ids maps words to ids, and the words it does not have yet are added
+        to it with the next ids. The values are stored as 64-bit integers if they
+        all are integers, and as floats otherwise.
+
+        >>> SparseVector.from_dict({'x' : 0.5, 'y' : 0}, {'y' : 0})
+        SparseVector([1], [0.5])
+        """
+        components = sorted((word_ids.setdefault(word, len(word_ids)), value)
+                            for word, value in vector.items() if value != 0)
+        typecode = 'q' if all(type(value) == int for word_id, value in components) else 'd'
+        return cls([word_id for word_id, value in components], [value for word_id, value in components],
+                   typecode, word_ids)
+
+    def to_dict(self, words):
+        """ (SparseVector, list) -> dict
+
+        The method returns the dictionary representing the vector,
+        where words maps ids to words.
+        """
+        return {words[word_id]: value for word_id, value in zip(self.ids, self.values)}
+
+    def copy(self):
+        """ (SparseVector) -> SparseVector
+
+        The method returns a copy of the vector.
+        """
+        copy = SparseVector((), (), self.values.typecode, self.word_ids)
+        copy.ids = array('I', self.ids)
+        copy.values = array(self.values.typecode, self.values)
+        copy.norm = self.norm
+        return copy
+
+    def get_sparse(self, vector):
+        """ (SparseVector, dict) -> SparseVector
+
+        The method returns vector itself if it is a SparseVector, and otherwise
+        the SparseVector of the dictionary vector, with the word ids of this vector.
+        It raises a TypeError if this vector has no word ids.
+        """
+        if isinstance(vector, SparseVector):
+            return vector
+        return SparseVector.from_dict(vector, self.get_word_ids())
+
+    def items(self):
+        """ (SparseVector) -> list
+
+        The method returns the list of the (word, value) pairs of the vector,
+        in the order of their ids, as the items of its dictionary would be.
+        The words are found by going through the word ids once, so it is meant
+        for adding the vector to a dictionary, not for inner loops.
+        It raises a TypeError if the vector was not made by from_dict.
+
+        >>> word_ids = {}
+        >>> SparseVector.from_dict({'b' : 2, 'a' : 1}, word_ids).items()
+        [('b', 2), ('a', 1)]
+        """
+        word_ids = self.get_word_ids()
+        values = dict(zip(self.ids, self.values))
+        return [(word, values[word_id]) for word, word_id in word_ids.items() if word_id in values]
+
+    def get_word_ids(self):
+        """ (SparseVector) -> dict
+
+        The method returns the dictionary mapping words to the ids of the vector.
+        It raises a TypeError if the vector was not made by from_dict.
+        """
+        if self.word_ids is None:
+            raise TypeError("a dictionary can only be used with a SparseVector made by from_dict")
+        return self.word_ids
+
+    def get_norm(self):
+        """ (SparseVector) -> float
+
+        The method returns the norm of the vector, computing it only once.
+        """
+        if self.norm is None:
+            self.norm = math.sqrt(sum(value * value for value in self.values))
+        return self.norm
+
+    def get_dot_product(self, other):
+        """ (SparseVector, SparseVector) -> float
+
+        The method returns the dot product of the two vectors. The ids are joined
+        in one pass over both vectors, or with binary searches in the longer one
+        when it is much longer than the other. If other is a dictionary, the ids
+        of its words are looked up in the vector.
+
+        >>> v = SparseVector(range(0, 1000, 2), [1] * 500)
+        >>> v.get_dot_product(SparseVector([2, 3, 998], [5, 7, 9])), v.get_dot_product(SparseVector())
+        (14, 0)
+        """
+        # in case the other vector is a dictionary, look its words up
+        if not isinstance(other, SparseVector):
+            word_ids = self.get_word_ids()
+            ids, values = self.ids, self.values
+            dot_product = 0
+            for word, value in other.items():
+                word_id = word_ids.get(word)
+                if word_id is not None:
+                    position = bisect_left(ids, word_id)
+                    if position < len(ids) and ids[position] == word_id:
+                        dot_product += values[position] * value
+            return dot_product
+        
+        ids, values = self.ids, self.values
+        other_ids, other_values = other.ids, other.values
+        if len(ids) > len(other_ids):
+            ids, values, other_ids, other_values = other_ids, other_values, ids, values
+        dot_product = 0
+
+        # in case the longer vector is much longer, look its ids up
+        if len(ids) * 16 < len(other_ids):
+            position = 0
+            size = len(other_ids)
+            for word_id, value in zip(ids, values):
+                position = bisect_left(other_ids, word_id, position)
+                if position == size:
+                    break
+                if other_ids[position] == word_id:
+                    dot_product += value * other_values[position]
+            return dot_product
+
+        # otherwise, walk along both vectors
+        index = other_index = 0
+        size, other_size = len(ids), len(other_ids)
+        while index < size and other_index < other_size:
+            word_id = ids[index]
+            other_id = other_ids[other_index]
+            if word_id == other_id:
+                dot_product += values[index] * other_values[other_index]
+                index += 1
+                other_index += 1
+            elif word_id < other_id:
+                index += 1
+            else:
+                other_index += 1
+        return dot_product
+
+    def get_sum(self, other, sign=1):
+        """ (SparseVector, SparseVector, int) -> SparseVector
+
+        The method returns a new vector, the sum of the vector and sign times
+        the other one, without the components which add up to 0.
+        If other is a dictionary, it is converted with get_sparse first.
+
+        >>> SparseVector([1, 3], [2, 5]).get_sum(SparseVector([0, 3], [1.5, 5], 'd'), -1)
+        SparseVector([0, 1], [-1.5, 2.0])
+        """
+        other = self.get_sparse(other)
+        ids, values = self.ids, self.values
+        other_ids, other_values = other.ids, other.values
+        typecode = 'd' if 'd' in (values.typecode, other_values.typecode) else 'q'
+        result = SparseVector((), (), typecode, self.word_ids or other.word_ids)
+        result_ids, result_values = result.ids, result.values
+
+        # walk along both vectors, keeping the non-zero components in order
+        index = other_index = 0
+        size, other_size = len(ids), len(other_ids)
+        while index < size and other_index < other_size:
+            word_id = ids[index]
+            other_id = other_ids[other_index]
+            if word_id == other_id:
+                value = values[index] + sign * other_values[other_index]
+                if value != 0:
+                    result_ids.append(word_id)
+                    result_values.append(value)
+                index += 1
+                other_index += 1
+            elif word_id < other_id:
+                result_ids.append(word_id)
+                result_values.append(values[index])
+                index += 1
+            else:
+                result_ids.append(other_id)
+                result_values.append(sign * other_values[other_index])
+                other_index += 1
+
+        # add the components left in either vector
+        result_ids.extend(ids[index:])
+        result_values.fromlist(values[index:].tolist())
+        result_ids.extend(other_ids[other_index:])
+        result_values.fromlist([sign * value for value in other_values[other_index:]])
+        return result
+
+    def add(self, other):
+        """ (SparseVector, SparseVector) -> NoneType
+
+        The method adds the other vector to the vector.
+        """
+        result = self.get_sum(other)
+        self.ids, self.values, self.norm = result.ids, result.values, None
+
+    def normalize(self):
+        """ (SparseVector) -> NoneType
+
+        The method divides the values of the vector by its norm, turning them into
+        floats, unless the norm is 0.
+        """
+        norm = self.get_norm()
+        if norm != 0:
+            self.values = array('d', [value / norm for value in self.values])
+            self.norm = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __eq__(self, other):
+        return isinstance(other, SparseVector) and self.ids == other.ids and self.values == other.values
+
+    def __repr__(self):
+        return "SparseVector(%r, %r)" % (self.ids.tolist(), self.values.tolist())
 
 
 
@@ -40,13 +348,19 @@ def copy_dict(dictionary):
     >>> id(a) == id(b)
     False
     """
+    # in case the dictionary is a SparseVector
+    if isinstance(dictionary, SparseVector):
+        return dictionary.copy()
+    
     # initialize a new dictionary
     copy = {}
     
     # add every key-value pair into the new dictionary
     for key in dictionary:
         # in case the value are mutable as well
-        if type(dictionary[key]) in (dict, list):
+        if isinstance(dictionary[key], SparseVector):
+            copy[key] = dictionary[key].copy()
+        elif type(dictionary[key]) in (dict, list):
             copy[key] = {}
             for subkey in dictionary[key]:
                 copy[key][subkey] = dictionary[key][subkey]
@@ -109,19 +423,29 @@ def add_vectors(first_vector, second_vector):
     True
     >>> v2 == {}
     True
+    
+    >>> v1 = {'a' : 1, 'b' : 2}
+    >>> add_vectors(v1, SparseVector.from_dict({'b' : -2, 'c' : 5}, {}))
+    >>> v1 == {'a' : 1, 'c' : 5}
+    True
     """
+    # in case the vectors are SparseVectors
+    if isinstance(first_vector, SparseVector):
+        first_vector.add(second_vector)
+        return
+    
     # add each vector component from the second vector to the first 
-    for key in second_vector:
+    for key, value in second_vector.items():
         # in case the first vector already has such key
         if key in first_vector:
-            first_vector[key] += second_vector[key]
+            first_vector[key] += value
             # delete key-value pair if its value is 0
             if first_vector[key] == 0:
                 del first_vector[key]
                 
         # in case the first vector has no such key
         else:
-            first_vector[key] = second_vector[key]
+            first_vector[key] = value
 
 
 def sub_vectors(first_vector, second_vector):
@@ -171,6 +495,12 @@ def sub_vectors(first_vector, second_vector):
     >>> d2 == {}
     True
     """
+    # in case the vectors are SparseVectors
+    if isinstance(first_vector, SparseVector):
+        return first_vector.get_sum(second_vector, -1)
+    if isinstance(second_vector, SparseVector):
+        return second_vector.get_sparse(first_vector).get_sum(second_vector, -1)
+    
     # initialize the vector to be returned
     result_vector = copy_dict(first_vector)
     
@@ -191,13 +521,34 @@ def sub_vectors(first_vector, second_vector):
     return result_vector
     
 
-def merge_dicts_of_vectors(first_dict, second_dict):
-    """ (dict, dict) -> NoneType
+def copy_vector(vector):
+    """ (dict) -> dict
+
+    The function returns a copy of a vector: a dictionary, or a SparseVector
+    if the vector is one.
+
+    >>> v = {'a' : 1}
+    >>> copy_vector(v) == v, copy_vector(v) is v
+    (True, False)
+    """
+    if isinstance(vector, SparseVector):
+        return vector.copy()
+    return dict(vector)
+
+
+def merge_dicts_of_vectors(first_dict, second_dict, consume=False):
+    """ (dict, dict, bool) -> NoneType
 
     The function takes two dictionaries containing values
     which are dictionaries representing vectors.
     It merges the first dictionary with the second one.
-    It modifies only the first input dictionary.   
+    It modifies only the first input dictionary: the vectors it takes from the
+    second one are copied, so that merging more vectors into the first
+    dictionary later never changes the second one.
+    If consume is True, the second dictionary is given up instead: its vectors
+    are moved into the first dictionary without being copied, and the second
+    dictionary is emptied. Either way, the vectors of the first dictionary keep
+    the order of their keys, the new keys coming after them.
     
     >>> d1 = {'a' : {'apple': 2}, 'p' : {'pear': 1, 'plum': 3}} 
     >>> d2 = {'p' : {'papaya' : 6}}
@@ -249,27 +600,143 @@ def merge_dicts_of_vectors(first_dict, second_dict):
     True
     >>> d2 == {1 : {}, 2 : {'a' : 1}}
     True
+    >>> merge_dicts_of_vectors(d1, {3 : {'b' : 1}})
+    >>> d1[2]['a'] += 1
+    >>> d2 == {1 : {}, 2 : {'a' : 1}}
+    True
+    
+    >>> d1 = {'a' : {'x' : 1}}
+    >>> d2 = {'a' : {'x' : 1, 'y' : 2}, 'b' : {'z' : 3}}
+    >>> vector = d2['b']
+    >>> merge_dicts_of_vectors(d1, d2, consume=True)
+    >>> d1 == {'a' : {'x' : 2, 'y' : 2}, 'b' : {'z' : 3}}, d1['b'] is vector, d2
+    (True, True, {})
+    >>> list(d1['a'])
+    ['x', 'y']
+    
+    >>> word_ids = {}
+    >>> d1 = {'a' : {'x' : 1}, 'b' : SparseVector.from_dict({'x' : 1}, word_ids)}
+    >>> d2 = {'a' : SparseVector.from_dict({'y' : 2}, word_ids), 'b' : {'y' : 3}}
+    >>> merge_dicts_of_vectors(d1, d2)
+    >>> d1['a'] == {'x' : 1, 'y' : 2}, d1['b'].to_dict(list(word_ids)) == {'x' : 1, 'y' : 3}
+    (True, True)
     """
     # add each key-value pair from the second dictionary into the first
+    for key, vector in second_dict.items():
+        first_vector = first_dict.get(key)
+        
+        # in case the first dictionary does not have such key
+        if first_vector is None:
+            first_dict[key] = vector if consume else copy_vector(vector)
+            continue
+        
+        # in case the vectors are SparseVectors
+        if isinstance(first_vector, SparseVector):
+            first_vector.add(vector)
+            continue
+        
+        # otherwise, the value of each sub-key becomes the sum of the two vectors
+        get_value = first_vector.get
+        for sub_key, value in vector.items():
+            first_vector[sub_key] = get_value(sub_key, 0) + value
+    
+    # in case the second dictionary was given up
+    if consume:
+        second_dict.clear()
+
+
+def merge_many_dicts_of_vectors(dicts, consume=False):
+    """ (iterable, bool) -> dict
+
+    The function takes dictionaries of vectors and returns a dictionary
+    mapping every key to the sum of its vectors. The other dictionaries are
+    merged into the first one in turn, so the keys are in the same order as
+    if they were merged one after the other with merge_dicts_of_vectors.
+    If consume is False, the inputs are not modified and the result shares
+    no vector with them. If consume is True, the inputs are given up as in
+    merge_dicts_of_vectors: the first one becomes the result, and the
+    other ones are emptied.
+
+    >>> parts = [{'a' : {'x' : 1}}, {'a' : {'y' : 1}, 'b' : {'x' : 2}}, {'b' : {'x' : 1}}]
+    >>> merged = merge_many_dicts_of_vectors(parts)
+    >>> merged == {'a' : {'x' : 1, 'y' : 1}, 'b' : {'x' : 3}}
+    True
+    >>> merged['a']['x'] += 10
+    >>> parts == [{'a' : {'x' : 1}}, {'a' : {'y' : 1}, 'b' : {'x' : 2}}, {'b' : {'x' : 1}}]
+    True
+    >>> list(merged)
+    ['a', 'b']
+    >>> merge_many_dicts_of_vectors(parts, consume=True) is parts[0], parts[1], parts[2]
+    (True, {}, {})
+    >>> merge_many_dicts_of_vectors([])
+    {}
+    """
+    dicts = list(dicts)
+    if not dicts:
+        return {}
+    
+    # start from the first dictionary
+    if consume:
+        merged = dicts[0]
+    else:
+        merged = {key: copy_vector(vector) for key, vector in dicts[0].items()}
+    
+    # merge the other ones into it
+    for other_dict in dicts[1:]:
+        merge_dicts_of_vectors(merged, other_dict, consume)
+    
+    # return the merged dictionary
+    return merged
+    
+   
+def sub_dicts_of_vectors(first_dict, second_dict):
+    """ (dict, dict) -> NoneType
+    
+    The function takes two dictionaries containing values
+    which are dictionaries representing vectors.
+    It substracts the vectors of the second dictionary from the vectors
+    of the first one, deleting the components which become 0 as sub_vectors does.
+    Keys whose vector becomes empty are kept.
+    It modifies only the first input dictionary.
+    
+    >>> d1 = {'a' : {'apple': 2}, 'p' : {'pear': 1, 'plum': 3}}
+    >>> d2 = {'a' : {'apple': 2}, 'p' : {'plum' : 1}}
+    >>> sub_dicts_of_vectors(d1, d2)
+    >>> d1 == {'a' : {}, 'p' : {'pear': 1, 'plum': 2}}
+    True
+    >>> d2 == {'a' : {'apple': 2}, 'p' : {'plum' : 1}}
+    True
+    
+    >>> d1 = {}
+    >>> sub_dicts_of_vectors(d1, {'b' : {'bean' : 1}})
+    >>> d1 == {'b' : {'bean' : -1}}
+    True
+    """
+    # substract each vector of the second dictionary from the first one
     for key in second_dict:
         
-        # in case the first dictionary already has such key
-        if key in first_dict:
+        # in case the first dictionary has no such key
+        if key not in first_dict:
+            first_dict[key] = sub_vectors({}, second_dict[key])
+            continue
+        
+        # in case the vector is a SparseVector
+        vector = first_dict[key]
+        if isinstance(vector, SparseVector):
+            first_dict[key] = vector.get_sum(second_dict[key], -1)
+            continue
+        
+        for sub_key, value in second_dict[key].items():
+            # the value becomes the difference of the two vectors
+            difference = vector.get(sub_key, 0) - value
             
-            for sub_key, value in second_dict[key].items():
-                # in case the first dictionary already has such sub-key
-                # the value becomes the sum of the two vectors
-                if sub_key in first_dict[key]:
-                    first_dict[key][sub_key] += value
-                # otherwise, add the sub-key-value pair to it
-                else:
-                    first_dict[key][sub_key] = value
-                    
-        # in case the first dictionary does not have such key   
-        else:
-            first_dict[key] = second_dict[key]
+            # delete the sub-key if its value is 0
+            if difference == 0:
+                vector.pop(sub_key, None)
+            else:
+                vector[sub_key] = difference
     
-   
+
 def get_dot_product(first_vector, second_vector):
     """ (dict, dict) -> dict 
 
@@ -296,6 +763,16 @@ def get_dot_product(first_vector, second_vector):
     >>> get_dot_product(v7, v8)
     -12
     """
+    # in case the vectors are SparseVectors
+    if isinstance(first_vector, SparseVector):
+        return first_vector.get_dot_product(second_vector)
+    if isinstance(second_vector, SparseVector):
+        return second_vector.get_dot_product(first_vector)
+    
+    # in case the first vector computes its own dot products, as the rows of a SemanticSpace do
+    if hasattr(first_vector, 'get_dot_product'):
+        return first_vector.get_dot_product(second_vector)
+    
     # initialize dot product variable
     dot_product = 0
     
@@ -328,6 +805,14 @@ def get_vector_norm(vector):
     >>> get_vector_norm(v3)
     0.0
     """
+    # in case the vector is a SparseVector, its norm is computed once
+    if isinstance(vector, SparseVector):
+        return vector.get_norm()
+    
+    # in case the vector computes its own norm, as the rows of a SemanticSpace do on their arrays
+    if hasattr(vector, 'get_norm'):
+        return vector.get_norm()
+    
     # compute the sum of squares
     sum_of_squares = 0
     for key in vector:
@@ -361,6 +846,11 @@ def normalize_vector(vector):
     >>> v3 == {}
     True
     """
+    # in case the vector is a SparseVector
+    if isinstance(vector, SparseVector):
+        vector.normalize()
+        return
+    
     # compute the vector's norm
     norm = get_vector_norm(vector)
     
@@ -372,8 +862,49 @@ def normalize_vector(vector):
     # in case the norm is 0   
     except ZeroDivisionError:
         return
-    
-    
+
+
+def record_vector_norms(semantic_descriptors, normalized=False):
+    """ (dict, bool) -> NoneType
+
+    The function takes as input a dictionary of semantic descriptor vectors.
+    It replaces every vector by a NormedVector recording its norm, and also
+    a normalized copy of it if normalized is True.
+    It modifies the input dictionary. The vectors must not be modified afterwards.
+
+    >>> d = {'a' : {'b' : 3, 'c' : 4}, 'b' : {'a' : 3}}
+    >>> record_vector_norms(d, normalized=True)
+    >>> d['a'].norm
+    5.0
+    >>> d['a'].normalized == {'b' : 0.6, 'c' : 0.8}
+    True
+    >>> d == {'a' : {'b' : 3, 'c' : 4}, 'b' : {'a' : 3}}
+    True
+    """
+    for key in semantic_descriptors:
+        semantic_descriptors[key] = NormedVector(semantic_descriptors[key], normalized)
+
+
+def get_sparse_descriptors(semantic_descriptors):
+    """ (dict) -> tuple
+
+    The function takes as input a dictionary of semantic descriptor vectors.
+    It returns a tuple (sparse descriptors, words): a new dictionary mapping
+    the same words to SparseVectors, and the list of words whose index is their id.
+
+    >>> sparse, words = get_sparse_descriptors({'a' : {'b' : 3, 'c' : 4}, 'b' : {'a' : 3}})
+    >>> sparse['a'], words
+    (SparseVector([1, 2], [3, 4]), ['a', 'b', 'c'])
+    >>> sparse['b'].to_dict(words)
+    {'a': 3}
+    """
+    # give the words of the dictionary the first ids, then the other context words
+    word_ids = {word: word_id for word_id, word in enumerate(semantic_descriptors)}
+    sparse_descriptors = {word: SparseVector.from_dict(vector, word_ids)
+                          for word, vector in semantic_descriptors.items()}
+    return sparse_descriptors, list(word_ids)
+
+
 
 # TEST MODULE
 if __name__ == "__main__":